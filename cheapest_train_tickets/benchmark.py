@@ -0,0 +1,468 @@
+"""
+Benchmarks for the cheapest train tickets query backends.
+
+Usage: python cheapest_train_tickets/benchmark.py [network.csv] [queries]
+
+Compares:
+- the dict-of-dicts and CSR graphs on memory and single-source latency;
+- the point-to-point search modes on single-query latency;
+- ALT against plain Dijkstra on settled stations;
+- the contraction hierarchy on preprocessing and query time;
+- incremental tree repair against recomputation;
+- Yen's k cheapest routes for growing k;
+- cold start from the binary snapshot against CSV parsing;
+- the hop-limited Pareto search.
+"""
+
+import os
+import sys
+import random
+import tempfile
+import time
+import tracemalloc
+import typing
+
+from main import (
+    CSRGraph,
+    CheapestTrainTickets,
+    ContractionHierarchy,
+    Landmarks,
+    ShortestPathTreeCache,
+    alt_search,
+    csr_dijkstra,
+    dijkstra,
+    get_graph,
+    load_snapshot,
+    pareto_search,
+    yen_k_shortest_paths,
+)
+
+
+DEFAULT_NETWORK = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "tasks", "Task 1_4", "task1_4_railway_network.csv"
+)
+
+
+def measure_memory(build: typing.Callable) -> typing.Tuple[object, int]:
+    """
+    Return the result of build() and the peak number of bytes
+    allocated while building it.
+    """
+
+    tracemalloc.start()
+    result = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak
+
+
+def time_queries(search: typing.Callable, sources: list) -> float:
+    """
+    Return the mean latency in milliseconds of search(source).
+    """
+
+    start_time = time.perf_counter()
+    for source in sources:
+        search(source)
+    end_time = time.perf_counter()
+    return (end_time - start_time) * 1000 / len(sources)
+
+
+def benchmark_graph_backends(file_name: str, queries: int = 100) -> dict:
+    """
+    Compare memory and query latency of the dict and CSR backends.
+    """
+
+    graph, dict_memory = measure_memory(lambda: get_graph(file_name))
+    csr, csr_memory = measure_memory(lambda: CSRGraph.from_graph(graph))
+    sources = random.Random(0).choices(list(graph), k=queries)
+
+    return {
+        "stations": len(graph),
+        "edges": len(csr.targets) // 2,
+        "dict": {
+            "memory_bytes": dict_memory,
+            "query_ms": time_queries(
+                lambda s: dijkstra(graph, s), sources
+            ),
+        },
+        "csr": {
+            "memory_bytes": csr_memory,
+            "query_ms": time_queries(
+                lambda s: csr_dijkstra(csr, csr.index[s]), sources
+            ),
+        },
+    }
+
+
+def benchmark_point_to_point(file_name: str, queries: int = 100) -> dict:
+    """
+    Compare the mean latency of each point-to-point search mode
+    on every backend over the same random (s, t) pairs.
+
+    Each backend is prepared before it is timed, so landmark tables,
+    the hierarchy and the fare matrix are not counted as query time.
+    The alt, ch and matrix backends ignore the mode, so they are
+    timed once, under "any".
+    """
+
+    results = {}
+    for backend in CheapestTrainTickets.backends:
+        ctt = CheapestTrainTickets(file_name, backend)
+
+        # Every mode replays the same pairs, so cached trees would
+        # answer repeated origins instead of the mode being timed.
+        ctt.tree_cache.max_entries = 0
+        ctt.prepare()
+        stations = list(ctt.graph_store.get())
+        rng = random.Random(0)
+        pairs = [
+            (rng.choice(stations), rng.choice(stations))
+            for _ in range(queries)
+        ]
+        modes = CheapestTrainTickets.modes \
+            if backend in ("dict", "csr") else ("any",)
+        results[backend] = {
+            mode: time_queries(
+                lambda pair: ctt.get_shortest_path(
+                    *pair, "early_exit" if mode == "any" else mode
+                ),
+                pairs
+            )
+            for mode in modes
+        }
+    return results
+
+
+def benchmark_landmarks(
+    file_name: str, queries: int = 100, count: int = 8
+) -> dict:
+    """
+    Compare the mean number of settled stations and latency of
+    early-exit Dijkstra and ALT for each landmark strategy.
+    """
+
+    graph = get_graph(file_name)
+    stations = list(graph)
+    rng = random.Random(0)
+    pairs = [
+        (rng.choice(stations), rng.choice(stations))
+        for _ in range(queries)
+    ]
+
+    def mean_settled(search: typing.Callable) -> float:
+        settled = 0
+        for s, t in pairs:
+            stats = {}
+            search(s, t, stats)
+            settled += stats["settled"]
+        return settled / len(pairs)
+
+    results = {
+        "dijkstra": {
+            "settled": mean_settled(
+                lambda s, t, stats: dijkstra(graph, s, t, stats)
+            ),
+            "query_ms": time_queries(
+                lambda pair: dijkstra(graph, *pair), pairs
+            ),
+        }
+    }
+
+    for strategy in Landmarks.strategies:
+        start_time = time.perf_counter()
+        landmarks = Landmarks.from_graph(graph, count, strategy)
+        end_time = time.perf_counter()
+        results[f"alt_{strategy}"] = {
+            "precompute_ms": (end_time - start_time) * 1000,
+            "settled": mean_settled(
+                lambda s, t, stats: alt_search(graph, landmarks, s, t, stats)
+            ),
+            "query_ms": time_queries(
+                lambda pair: alt_search(graph, landmarks, *pair), pairs
+            ),
+        }
+    return results
+
+
+def benchmark_hierarchy(file_name: str, queries: int = 100) -> dict:
+    """
+    Report the contraction hierarchy preprocessing time, shortcut
+    count and query latency next to early-exit Dijkstra.
+    """
+
+    graph = get_graph(file_name)
+    stations = list(graph)
+    rng = random.Random(0)
+    pairs = [
+        (rng.choice(stations), rng.choice(stations))
+        for _ in range(queries)
+    ]
+
+    start_time = time.perf_counter()
+    hierarchy = ContractionHierarchy.from_graph(graph)
+    end_time = time.perf_counter()
+
+    settled = 0
+    for s, t in pairs:
+        stats = {}
+        hierarchy.query(s, t, stats)
+        settled += stats["settled"]
+
+    return {
+        "preprocess_ms": (end_time - start_time) * 1000,
+        "edges": sum(len(edges) for edges in graph.values()) // 2,
+        "hierarchy_edges": sum(len(edges) for edges in hierarchy.upward),
+        "settled": settled / len(pairs),
+        "query_ms": time_queries(
+            lambda pair: hierarchy.query(*pair), pairs
+        ),
+        "dijkstra_query_ms": time_queries(
+            lambda pair: dijkstra(graph, *pair), pairs
+        ),
+    }
+
+
+def benchmark_repair(
+    file_name: str, changes: int = 100, origins: int = 10
+) -> dict:
+    """
+    Apply random fare drops, new links and fare rises to the network
+    and compare repairing cached trees with rebuilding them.
+    """
+
+    graph = get_graph(file_name)
+    stations = list(graph)
+    rng = random.Random(0)
+    cache = ShortestPathTreeCache(max_entries=origins)
+    for origin in rng.sample(stations, min(origins, len(stations))):
+        cache.put(origin, dijkstra(graph, origin))
+
+    repair_time = 0
+    recompute_time = 0
+    updated = 0
+    for _ in range(changes):
+        u = rng.choice(stations)
+        if graph[u] and rng.random() < 0.5:
+            v = rng.choice(list(graph[u]))
+            old_weight = graph[u][v]
+            new_weight = old_weight + rng.randint(1, 20)
+        else:
+            v = rng.choice(stations)
+            if u == v:
+                continue
+            old_weight = graph[u].get(v)
+            new_weight = rng.randint(1, old_weight or 30)
+        graph[u][v] = new_weight
+        graph[v][u] = new_weight
+
+        start_time = time.perf_counter()
+        updated += cache.repair(graph, u, v, old_weight, new_weight)
+        repair_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for origin in cache.trees:
+            dijkstra(graph, origin)
+        recompute_time += time.perf_counter() - start_time
+
+    return {
+        "changes": changes,
+        "trees": len(cache),
+        "updated_per_change": updated / changes,
+        "repair_ms": repair_time * 1000 / changes,
+        "recompute_ms": recompute_time * 1000 / changes,
+    }
+
+
+def benchmark_alternative_routes(
+    file_name: str, ks: tuple = (1, 2, 5, 10, 20), queries: int = 20
+) -> dict:
+    """
+    Report the mean latency and spur searches run or skipped by
+    Yen's algorithm for each k, next to one early-exit Dijkstra.
+    """
+
+    graph = get_graph(file_name)
+    stations = list(graph)
+    rng = random.Random(0)
+    pairs = [
+        (rng.choice(stations), rng.choice(stations))
+        for _ in range(queries)
+    ]
+
+    results = {
+        "dijkstra_ms": time_queries(
+            lambda pair: dijkstra(graph, *pair), pairs
+        )
+    }
+    for k in ks:
+        searches = 0
+        skipped = 0
+        start_time = time.perf_counter()
+        for s, t in pairs:
+            stats = {}
+            yen_k_shortest_paths(graph, s, t, k, stats)
+            searches += stats.get("spur_searches", 0)
+            skipped += stats.get("spur_skipped", 0)
+        end_time = time.perf_counter()
+
+        results[k] = {
+            "query_ms": (end_time - start_time) * 1000 / len(pairs),
+            "spur_searches": searches / len(pairs),
+            "spur_skipped": skipped / len(pairs),
+        }
+    return results
+
+
+def benchmark_startup(file_name: str, repeats: int = 20) -> dict:
+    """
+    Compare the mean time to load the network by parsing the CSV
+    with opening its binary snapshot (checksum check included).
+    """
+
+    def mean_ms(load: typing.Callable) -> float:
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            load()
+        return (time.perf_counter() - start_time) * 1000 / repeats
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_file = os.path.join(directory, "network.snapshot")
+        start_time = time.perf_counter()
+        load_snapshot(file_name, snapshot_file).close()
+        build_time = time.perf_counter() - start_time
+
+        def open_snapshot():
+            load_snapshot(file_name, snapshot_file).close()
+
+        return {
+            "snapshot_bytes": os.path.getsize(snapshot_file),
+            "snapshot_build_ms": build_time * 1000,
+            "csv_dict_ms": mean_ms(lambda: get_graph(file_name)),
+            "csv_csr_ms": mean_ms(
+                lambda: CSRGraph.from_graph(get_graph(file_name))
+            ),
+            "snapshot_csr_ms": mean_ms(open_snapshot),
+        }
+
+
+def benchmark_pareto(
+    file_name: str, budgets: tuple = (None, 40, 20, 10), queries: int = 100
+) -> dict:
+    """
+    Report the mean latency, settled labels and front size of the
+    hop-limited Pareto search for each hop budget.
+    """
+
+    graph = get_graph(file_name)
+    stations = list(graph)
+    rng = random.Random(0)
+    pairs = [
+        (rng.choice(stations), rng.choice(stations))
+        for _ in range(queries)
+    ]
+
+    results = {}
+    for max_hops in budgets:
+        settled = 0
+        routes = 0
+        start_time = time.perf_counter()
+        for s, t in pairs:
+            stats = {}
+            routes += len(pareto_search(graph, s, t, max_hops, stats))
+            settled += stats.get("settled", 0)
+        end_time = time.perf_counter()
+
+        results[max_hops] = {
+            "query_ms": (end_time - start_time) * 1000 / len(pairs),
+            "settled": settled / len(pairs),
+            "front_size": routes / len(pairs),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    network = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NETWORK
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    results = benchmark_graph_backends(network, query_count)
+    print(
+        f"{results['stations']} stations, {results['edges']} edges, "
+        f"{query_count} single-source queries"
+    )
+    print("Backend | Memory (KiB) | Query (ms)")
+    for backend in ("dict", "csr"):
+        print(
+            backend,
+            round(results[backend]["memory_bytes"] / 1024, 1),
+            round(results[backend]["query_ms"], 3)
+        )
+
+    print("\nBackend | Mode | Point-to-point query (ms)")
+    for backend, modes in benchmark_point_to_point(
+        network, query_count
+    ).items():
+        for mode, latency in modes.items():
+            print(backend, mode, round(latency, 3))
+
+    print("\nSearch | Settled stations | Query (ms)")
+    for search, result in benchmark_landmarks(network, query_count).items():
+        print(
+            search,
+            round(result["settled"], 1),
+            round(result["query_ms"], 3)
+        )
+
+    results = benchmark_hierarchy(network, query_count)
+    print(
+        f"\nContraction hierarchy: {round(results['preprocess_ms'], 1)} ms "
+        f"preprocessing, {results['hierarchy_edges']} edges "
+        f"(from {results['edges']}), {round(results['settled'], 1)} "
+        f"settled per query"
+    )
+    print(
+        f"Query (ms): ch {round(results['query_ms'], 3)}, "
+        f"dijkstra {round(results['dijkstra_query_ms'], 3)}"
+    )
+
+    results = benchmark_repair(network, query_count)
+    print(
+        f"\nTree repair over {results['trees']} cached trees: "
+        f"{round(results['updated_per_change'], 1)} stations updated "
+        f"per change, {round(results['repair_ms'], 3)} ms repair vs "
+        f"{round(results['recompute_ms'], 3)} ms recompute"
+    )
+
+    results = benchmark_alternative_routes(network)
+    print(
+        f"\nk | Query (ms) | Spur searches | Spur searches skipped "
+        f"(one Dijkstra: {round(results.pop('dijkstra_ms'), 3)} ms)"
+    )
+    for k, result in results.items():
+        print(
+            k,
+            round(result["query_ms"], 3),
+            round(result["spur_searches"], 1),
+            round(result["spur_skipped"], 1)
+        )
+
+    results = benchmark_startup(network)
+    print(
+        f"\nStartup (ms): csv -> dict {round(results['csv_dict_ms'], 3)}, "
+        f"csv -> csr {round(results['csv_csr_ms'], 3)}, "
+        f"snapshot -> csr {round(results['snapshot_csr_ms'], 3)} "
+        f"({results['snapshot_bytes']} bytes, built in "
+        f"{round(results['snapshot_build_ms'], 3)} ms)"
+    )
+
+    print("\nHop budget | Query (ms) | Settled labels | Front size")
+    for max_hops, result in benchmark_pareto(
+        network, queries=query_count
+    ).items():
+        print(
+            max_hops,
+            round(result["query_ms"], 3),
+            round(result["settled"], 1),
+            round(result["front_size"], 2)
+        )
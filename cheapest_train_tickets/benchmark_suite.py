@@ -0,0 +1,256 @@
+"""
+Routing benchmark suite over every CheapestTrainTickets backend.
+
+Usage: python cheapest_train_tickets/benchmark_suite.py
+       [--queries N] [--seed S] [--output report.json] NETWORK [NETWORK ...]
+
+Each NETWORK is either a CSV file or a generated network given as
+topology:stations, e.g. grid:1000 or scale_free:100000. Every backend
+answers the same seeded query set on every network, and preprocessing
+time, peak memory (of the process and the workers it starts), query
+latency and settled stations are written to a JSON report. Backends
+whose preprocessing grows too fast for a network are skipped and
+recorded as such.
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import typing
+
+from main import (
+    CheapestTrainTickets,
+    alt_search,
+    csr_dijkstra,
+    dijkstra,
+    get_graph,
+)
+from benchmark import time_queries
+from generate_network import GENERATORS, write_network
+
+# The memory sampler of the counting benchmarks is shared. Its
+# directory goes last on the path, so "main" is still this one.
+sys.path.append(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "search_with_parallelism"
+))
+from memory_sampler import get_peak_rss, MemorySampler  # noqa: E402
+
+
+# Largest network, in stations, each backend is run on.
+STATION_LIMITS = {
+    "dict": None,
+    "csr": None,
+    "alt": None,
+    "ch": 50000,
+    "matrix": 3000,
+}
+
+
+def get_settled(ctt: CheapestTrainTickets, s: str, t: str) -> int:
+    """
+    Return the number of stations the backend settles for s to t.
+    """
+
+    stats = {"settled": 0}
+    if ctt.backend == "dict":
+        dijkstra(ctt.graph_store.get(), s, t, stats)
+    elif ctt.backend == "csr":
+        csr = ctt.graph_store.get_csr()
+        csr_dijkstra(csr, csr.index[s], csr.index[t], stats)
+    elif ctt.backend == "alt":
+        alt_search(ctt.graph_store.get(), ctt.get_landmarks(), s, t, stats)
+    elif ctt.backend == "ch":
+        ctt.get_hierarchy().query(s, t, stats)
+    return stats["settled"]
+
+
+def create_backend(
+    file_name: str, backend: str, directory: str
+) -> CheapestTrainTickets:
+    """
+    Return an uncached instance whose generated files go to directory.
+    """
+
+    ctt = CheapestTrainTickets(file_name, backend)
+    ctt.tree_cache.max_entries = 0
+    ctt.graph_store.snapshot_file = os.path.join(directory, "network.snapshot")
+    ctt.matrix_file = os.path.join(directory, "network_fares.bin")
+    ctt.landmark_file = os.path.join(directory, "network_landmarks.json")
+    ctt.hierarchy_file = os.path.join(directory, "network_hierarchy.json")
+    return ctt
+
+
+def close_backend(ctt: CheapestTrainTickets):
+    """
+    Release the memory maps an instance holds on its generated files,
+    so that their directory can be removed (required on Windows).
+    """
+
+    if ctt.fare_matrix is not None:
+        ctt.fare_matrix.close()
+        ctt.fare_matrix = None
+    if ctt.graph_store.csr is not None:
+        ctt.graph_store.csr.close()
+
+
+def _measure_prepare(
+    file_name: str,
+    backend: str,
+    directory: str,
+    queue: multiprocessing.Queue
+):
+    """
+    Run one backend's preprocessing, then report the peak RSS of this
+    process, which counts the pages of the fare matrix and snapshot
+    it touched, and the peak summed PSS of the pool workers it
+    started (None without /proc).
+    """
+
+    ctt = create_backend(file_name, backend, directory)
+    sampler = MemorySampler() if os.path.isdir("/proc") else None
+    if sampler is not None:
+        sampler.start()
+    try:
+        ctt.prepare()
+    finally:
+        children_peak = sampler.stop() if sampler is not None else None
+        close_backend(ctt)
+    queue.put({
+        "peak_rss_kb": get_peak_rss(),
+        "children_peak_kb": children_peak,
+    })
+
+
+def benchmark_backend(
+    file_name: str, backend: str, pairs: typing.List[tuple], directory: str
+) -> dict:
+    """
+    Time the preprocessing and queries of one backend, then measure
+    the peak memory of a second, fresh preprocessing run.
+
+    The second run is in a freshly spawned process, so its peak RSS
+    does not include memory inherited from this one. Each run gets its
+    own empty sub-directory of directory, so neither loads a snapshot
+    or fare matrix written by an earlier run. Memory is in kilobytes.
+    """
+
+    ctt = create_backend(
+        file_name, backend, tempfile.mkdtemp(dir=directory)
+    )
+    try:
+        start_time = time.perf_counter()
+        ctt.prepare()
+        preprocess_time = time.perf_counter() - start_time
+
+        query_ms = time_queries(
+            lambda pair: ctt.get_shortest_path(*pair), pairs
+        )
+        settled = sum(get_settled(ctt, s, t) for s, t in pairs) / len(pairs)
+    finally:
+        close_backend(ctt)
+
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_measure_prepare,
+        args=(file_name, backend, tempfile.mkdtemp(dir=directory), queue)
+    )
+    process.start()
+    memory = queue.get()
+    process.join()
+
+    return {
+        "preprocess_seconds": preprocess_time,
+        **memory,
+        "query_ms": query_ms,
+        "settled": settled,
+    }
+
+
+def resolve_network(network: str, directory: str) -> str:
+    """
+    Return the CSV file of a network argument, generating it first
+    when it is given as topology:stations.
+    """
+
+    if os.path.exists(network) or ":" not in network:
+        return network
+
+    topology, stations = network.split(":", 1)
+    if topology not in GENERATORS:
+        raise ValueError(f"Unknown topology: {topology}")
+    file_name = os.path.join(directory, f"{topology}_{stations}.csv")
+    write_network(topology, int(stations), file_name)
+    return file_name
+
+
+def run_suite(
+    networks: typing.List[str], queries: int = 100, seed: int = 0
+) -> dict:
+    """
+    Benchmark every backend on every network with a fixed query set.
+    """
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "queries": queries,
+        "seed": seed,
+        "networks": [],
+    }
+
+    for network in networks:
+        with tempfile.TemporaryDirectory() as directory:
+            file_name = resolve_network(network, directory)
+            graph = get_graph(file_name)
+            stations = list(graph)
+            rng = random.Random(seed)
+            pairs = [
+                (rng.choice(stations), rng.choice(stations))
+                for _ in range(queries)
+            ]
+            result = {
+                "network": network,
+                "stations": len(graph),
+                "edges": sum(len(edges) for edges in graph.values()) // 2,
+                "backends": {},
+            }
+            del graph
+
+            for backend in CheapestTrainTickets.backends:
+                limit = STATION_LIMITS.get(backend)
+                if limit is not None and len(stations) > limit:
+                    result["backends"][backend] = {
+                        "skipped": f"more than {limit} stations"
+                    }
+                    continue
+
+                result["backends"][backend] = benchmark_backend(
+                    file_name, backend, pairs, directory
+                )
+                print(
+                    f"[BENCHMARK] {network} {backend}: "
+                    f"{result['backends'][backend]}"
+                )
+
+            report["networks"].append(result)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("networks", nargs="+")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="routing_benchmark.json")
+    args = parser.parse_args()
+
+    suite_report = run_suite(args.networks, args.queries, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(suite_report, file, indent=4)
+    print(f"[RESULT] Wrote benchmark report to {args.output}.")
@@ -0,0 +1,145 @@
+"""
+Synthetic railway network generator.
+
+Usage: python cheapest_train_tickets/generate_network.py
+       <grid|geometric|scale_free> <stations> <output.csv> [seed]
+
+Writes undirected networks in the same source,target,weight format as
+task1_4_railway_network.csv, so every CheapestTrainTickets backend can
+be benchmarked well beyond the size of the UK map.
+"""
+
+import math
+import random
+import sys
+import typing
+
+
+def get_station_name(i: int) -> str:
+    """
+    Return the name of the i-th generated station.
+    """
+
+    return f"Station {i}"
+
+
+def generate_grid(
+    stations: int, rng: random.Random
+) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    """
+    Yield the edges of a square grid, each station linked to its
+    right and lower neighbours, with random fares.
+    """
+
+    side = math.ceil(math.sqrt(stations))
+    for i in range(stations):
+        column = i % side
+        if column + 1 < side and i + 1 < stations:
+            yield i, i + 1, rng.randint(1, 50)
+        if i + side < stations:
+            yield i, i + side, rng.randint(1, 50)
+
+
+def generate_geometric(
+    stations: int, rng: random.Random
+) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    """
+    Yield the edges of a random geometric graph: stations are placed
+    uniformly in the unit square and linked when closer than a radius
+    chosen to make the network almost surely connected. Fares grow
+    with distance.
+    """
+
+    radius = math.sqrt(
+        1.2 * math.log(max(stations, 2)) / (math.pi * stations)
+    )
+    cells = {}
+    points = []
+    for i in range(stations):
+        x, y = rng.random(), rng.random()
+        points.append((x, y))
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(i)
+
+    # Only stations in neighbouring cells can be within the radius.
+    for i, (x, y) in enumerate(points):
+        cell_x, cell_y = int(x / radius), int(y / radius)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cell_x + dx, cell_y + dy), ()):
+                    if j <= i:
+                        continue
+                    distance = math.dist(points[i], points[j])
+                    if distance < radius:
+                        yield i, j, 1 + round(distance / radius * 49)
+
+
+def generate_scale_free(
+    stations: int, rng: random.Random, links: int = 2
+) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    """
+    Yield the edges of a Barabasi-Albert scale-free graph, where each
+    new station links to existing ones with probability proportional
+    to their degree, giving a few large hubs.
+    """
+
+    # Every edge endpoint is listed once, so a uniform pick from
+    # this list is a degree-proportional pick of a station.
+    endpoints = []
+    for i in range(1, min(links + 1, stations)):
+        yield 0, i, rng.randint(1, 50)
+        endpoints.extend((0, i))
+
+    for i in range(links + 1, stations):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(endpoints))
+        for target in targets:
+            yield i, target, rng.randint(1, 50)
+            endpoints.extend((i, target))
+
+
+GENERATORS = {
+    "grid": generate_grid,
+    "geometric": generate_geometric,
+    "scale_free": generate_scale_free,
+}
+
+
+def write_network(
+    topology: str, stations: int, file_name: str, seed: int = 0
+) -> int:
+    """
+    Generate a network and write it to file_name. Like the original
+    data, the file has no trailing newline. Returns the edge count.
+    """
+
+    if topology not in GENERATORS:
+        raise ValueError(f"Unknown topology: {topology}")
+
+    rng = random.Random(seed)
+    generate = GENERATORS[topology]
+    edges = 0
+    with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
+        for source, target, weight in generate(stations, rng):
+            if edges:
+                csvfile.write("\n")
+            csvfile.write(
+                f"{get_station_name(source)},"
+                f"{get_station_name(target)},{weight}"
+            )
+            edges += 1
+    return edges
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+
+    edge_count = write_network(
+        sys.argv[1],
+        int(sys.argv[2]),
+        sys.argv[3],
+        int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    )
+    print(f"[RESULT] Wrote {edge_count} edges to {sys.argv[3]}.")
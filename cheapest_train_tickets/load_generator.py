@@ -0,0 +1,147 @@
+"""
+Load generator for the fare query service in server.py.
+
+Usage: python cheapest_train_tickets/load_generator.py [--network CSV]
+       [--host HOST] [--port PORT] [--requests N] [--concurrency C]
+
+Opens C keep-alive connections, sends N random /route queries between
+stations of the network and reports throughput and p50/p99 latency.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+import typing
+
+from urllib.parse import urlencode
+
+from main import get_graph
+from server import DEFAULT_NETWORK
+
+
+def get_percentile(values: typing.List[float], percentile: float) -> float:
+    """
+    Return the nearest-rank percentile of a sorted list.
+    """
+
+    if not values:
+        return float('nan')
+    rank = math.ceil(percentile / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+async def run_client(
+    host: str,
+    port: int,
+    pairs: typing.List[tuple],
+    latencies: typing.List[float],
+    statuses: dict
+):
+    """
+    Send each query over one keep-alive connection, recording the
+    latency and status code of every response. Queries left when the
+    server closes the connection are counted under "closed".
+    """
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i, (s, t) in enumerate(pairs):
+            query = urlencode({"from": s, "to": t})
+            start_time = time.perf_counter()
+            writer.write(
+                f"GET /route?{query} HTTP/1.1\r\nHost: {host}\r\n\r\n"
+                .encode('latin-1')
+            )
+            await writer.drain()
+
+            status_line = (await reader.readline()).split()
+            if len(status_line) < 2:
+                statuses["closed"] = (
+                    statuses.get("closed", 0) + len(pairs) - i
+                )
+                break
+            status = int(status_line[1])
+            content_length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode('latin-1').partition(":")
+                if name.lower() == "content-length":
+                    content_length = int(value)
+            await reader.readexactly(content_length)
+
+            latencies.append(time.perf_counter() - start_time)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def generate_load(
+    host: str,
+    port: int,
+    stations: typing.List[str],
+    requests: int,
+    concurrency: int,
+    seed: int = 0
+) -> dict:
+    """
+    Spread random queries over concurrent clients and summarise
+    the latency distribution and requests per second.
+    """
+
+    rng = random.Random(seed)
+    pairs = [
+        (rng.choice(stations), rng.choice(stations))
+        for _ in range(requests)
+    ]
+    latencies = []
+    statuses = {}
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(
+        run_client(host, port, pairs[i::concurrency], latencies, statuses)
+        for i in range(concurrency)
+    ))
+    elapsed_time = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "seconds": elapsed_time,
+        "requests_per_second": len(latencies) / elapsed_time,
+        "p50_ms": get_percentile(latencies, 50) * 1000,
+        "p99_ms": get_percentile(latencies, 99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--network", default=DEFAULT_NETWORK)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    results = asyncio.run(generate_load(
+        args.host,
+        args.port,
+        list(get_graph(args.network)),
+        args.requests,
+        args.concurrency
+    ))
+    print(
+        f"[RESULT] {results['requests']} requests in "
+        f"{round(results['seconds'], 3)} seconds "
+        f"({round(results['requests_per_second'], 1)} req/s), "
+        f"statuses {results['statuses']}"
+    )
+    print(
+        f"[RESULT] p50 {round(results['p50_ms'], 3)} ms, "
+        f"p99 {round(results['p99_ms'], 3)} ms"
+    )
@@ -11,32 +11,1885 @@ the route.
 
 import os
 import csv
+import hashlib
+import heapq
+import itertools
+import json
+import mmap
+import multiprocessing
+import random
+import struct
+import sys
+import tempfile
 import typing
 import time
 
+from array import array
+from collections import OrderedDict
+
 
 def get_graph(file_name) -> typing.List[typing.List]:
     """
-    Return a graph, G, of source S, target and weights.
+    Return a graph, G, of source S, target and weights.
+    """
+
+    graph = {}
+    with open(file_name, 'r', newline='', encoding='utf-8') as csvfile:
+        csv_reader = csv.reader(csvfile)
+
+        # Read the file and convert the columns into
+        # dictionary of s, t and cost (weight).
+        # according to the algorithm.
+        for row in csv_reader:
+            source, target, weight = row
+            weight = int(weight)
+            if source not in graph:
+                graph[source] = {}
+            if target not in graph:
+                graph[target] = {}
+            graph[source][target] = weight
+            graph[target][source] = weight
+    return graph
+
+
+def get_file_checksum(file_name: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in blocks.
+    """
+
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_json(file_name: str, data: dict):
+    """
+    Write data to a JSON file through a temporary file moved into
+    place, so an interrupted run never leaves a truncated file behind.
+    """
+
+    handle, temporary_file = tempfile.mkstemp(
+        suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name))
+    )
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temporary_file, file_name)
+    except BaseException:
+        os.remove(temporary_file)
+        raise
+
+
+def dijkstra(
+    graph: dict, s: str, t: str = None, stats: dict = None
+) -> typing.Tuple[dict, dict]:
+    """
+    Binary heap implementation of Dijkstra's algorithm.
+
+    Returns a map of the shortest distance to every reachable station
+    and a map of predecessors, so the route to any station can be
+    walked back to the source. Runs in O((V + E) log V).
+
+    If a target t is given the search stops as soon as t is settled,
+    so only the distances of settled stations are final. The number
+    of settled stations is written to stats["settled"] if given.
+    """
+
+    if s not in graph:
+        raise KeyError(s)
+
+    distances = {s: 0}
+    predecessors = {s: None}
+    visited = set()
+    heap = [(0, s)]
+
+    while heap:
+        distance, node = heapq.heappop(heap)
+
+        # Stale heap entries are skipped rather than decreased in place.
+        if node in visited:
+            continue
+        visited.add(node)
+
+        if node == t:
+            break
+
+        for next_node, weight in graph[node].items():
+            next_distance = distance + weight
+            if next_distance < distances.get(next_node, float('inf')):
+                distances[next_node] = next_distance
+                predecessors[next_node] = node
+                heapq.heappush(heap, (next_distance, next_node))
+
+    if stats is not None:
+        stats["settled"] = len(visited)
+    return distances, predecessors
+
+
+def get_path(predecessors: dict, s: str, t: str) -> typing.List[str]:
+    """
+    Walk the predecessor map back from t to s and return the
+    ordered list of stations, or an empty list if t is unreachable.
+    """
+
+    if t not in predecessors:
+        return []
+
+    path = []
+    node = t
+    while node is not None:
+        path.append(node)
+        node = predecessors[node]
+    path.reverse()
+
+    if path[0] != s:
+        return []
+    return path
+
+
+class CSRGraph:
+    """
+    Compact integer-indexed form of the railway network.
+
+    Station names are interned to integer ids and the adjacency lists
+    are stored as compressed sparse rows: the neighbours of station i
+    are targets[offsets[i]:offsets[i + 1]] with matching weights.
+
+    The buffers are either arrays or int32 memoryviews over a
+    memory-mapped snapshot file, see save and load.
+    """
+
+    magic = b"CTGS"
+    header = struct.Struct("<4sIII32s")
+
+    def __init__(
+        self,
+        names: typing.List[str],
+        offsets: array,
+        targets: array,
+        weights: array,
+        checksum: str = None
+    ):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+        # Hex checksum of the source CSV and, when loaded from a
+        # snapshot, the memory map the buffers point into. The header
+        # holds the checksum as its 32 raw bytes.
+        self.checksum = checksum
+        self.buffer = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getstate__(self) -> dict:
+        # Memory-mapped buffers cannot be pickled for pool workers,
+        # so they are copied into arrays.
+        state = self.__dict__.copy()
+        for key in ("offsets", "targets", "weights"):
+            if not isinstance(state[key], array):
+                buffer = array('i')
+                buffer.frombytes(state[key].tobytes())
+                state[key] = buffer
+        state["buffer"] = None
+        return state
+
+    @classmethod
+    def from_graph(cls, graph: dict) -> "CSRGraph":
+        """
+        Build the CSR form from a dict-of-dicts graph.
+        """
+
+        names = list(graph)
+        index = {name: i for i, name in enumerate(names)}
+        offsets = array('i', [0])
+        targets = array('i')
+        weights = array('i')
+
+        for name in names:
+            for next_node, weight in graph[name].items():
+                targets.append(index[next_node])
+                weights.append(weight)
+            offsets.append(len(targets))
+
+        return cls(names, offsets, targets, weights)
+
+    @classmethod
+    def load(cls, file_name: str) -> "CSRGraph":
+        """
+        Open a snapshot written by save() without copying the
+        adjacency buffers: they are views into the memory map.
+        """
+
+        with open(file_name, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, _, count, edges, checksum = cls.header.unpack_from(buffer)
+        if magic != cls.magic:
+            buffer.close()
+            raise ValueError(f"Not a graph snapshot file: {file_name}")
+
+        offset = cls.header.size
+        (names_size,) = struct.unpack_from("<I", buffer, offset)
+        offset += 4
+        names = bytes(
+            buffer[offset:offset + names_size]
+        ).decode('utf-8').split("\n") if count else []
+        offset += names_size + (-(offset + names_size) % 4)
+
+        if offset + (count + 1 + 2 * edges) * 4 > len(buffer):
+            buffer.close()
+            raise ValueError(f"Truncated graph snapshot file: {file_name}")
+
+        view = memoryview(buffer)
+        sections = []
+        for length in (count + 1, edges, edges):
+            sections.append(view[offset:offset + length * 4].cast('i'))
+            offset += length * 4
+
+        csr = cls(names, *sections, checksum.hex())
+        csr.buffer = buffer
+        return csr
+
+    def save(self, file_name: str, checksum: str = ""):
+        """
+        Write the station table and CSR buffers to a binary snapshot
+        tagged with the checksum of the source CSV.
+
+        The snapshot is written to a temporary file and moved into
+        place, so a process that has the old one memory-mapped keeps
+        reading it instead of seeing it truncated underneath.
+        """
+
+        names = "\n".join(self.names).encode('utf-8')
+        handle, temporary_file = tempfile.mkstemp(
+            suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name))
+        )
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(self.header.pack(
+                    self.magic, 1, len(self.names), len(self.targets),
+                    bytes.fromhex(checksum).ljust(32, b"\0")
+                ))
+                file.write(struct.pack("<I", len(names)))
+                file.write(names)
+                file.write(b"\0" * (-file.tell() % 4))
+                for buffer in (self.offsets, self.targets, self.weights):
+                    file.write(bytes(buffer))
+            os.replace(temporary_file, file_name)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    def close(self):
+        """
+        Release the memory map of a loaded snapshot, if any.
+        """
+
+        if self.buffer is not None:
+            for key in ("offsets", "targets", "weights"):
+                getattr(self, key).release()
+            self.buffer.close()
+            self.buffer = None
+
+    def to_graph(self) -> dict:
+        """
+        Expand the CSR form back into a dict-of-dicts graph.
+        """
+
+        names, offsets = self.names, self.offsets
+        targets, weights = self.targets, self.weights
+        graph = {}
+        for i, name in enumerate(names):
+            start, end = offsets[i], offsets[i + 1]
+            graph[name] = {
+                names[next_node]: weight
+                for next_node, weight in zip(
+                    targets[start:end], weights[start:end]
+                )
+            }
+        return graph
+
+    def neighbours(self, node: int) -> typing.Iterator[typing.Tuple]:
+        """
+        Yield (neighbour id, weight) pairs of a station id.
+        """
+
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+
+def read_snapshot(
+    file_name: str, snapshot_file: str, checksum: str = None
+) -> typing.Optional[CSRGraph]:
+    """
+    Return the CSR graph of a CSV file from its binary snapshot, or
+    None if the snapshot is missing, unreadable or its checksum no
+    longer matches the CSV.
+    """
+
+    if not os.path.exists(snapshot_file):
+        return None
+    if checksum is None:
+        checksum = get_file_checksum(file_name)
+
+    try:
+        csr = CSRGraph.load(snapshot_file)
+    except (OSError, ValueError, struct.error):
+        return None
+    if csr.checksum != checksum:
+        csr.close()
+        return None
+    return csr
+
+
+def load_snapshot(file_name: str, snapshot_file: str) -> CSRGraph:
+    """
+    Return the CSR graph of a CSV file from its binary snapshot,
+    rebuilding the snapshot first if it is missing or stale.
+
+    Writing the snapshot is best-effort: if its directory is not
+    writable the graph is still returned, built from the CSV.
+    """
+
+    checksum = get_file_checksum(file_name)
+    csr = read_snapshot(file_name, snapshot_file, checksum)
+    if csr is not None:
+        return csr
+
+    csr = CSRGraph.from_graph(get_graph(file_name))
+    csr.checksum = checksum
+    try:
+        csr.save(snapshot_file, checksum)
+    except OSError:
+        pass
+    return csr
+
+
+def csr_dijkstra(
+    csr: CSRGraph, s: int, t: int = None, stats: dict = None
+) -> typing.Tuple[list, array]:
+    """
+    Dijkstra's algorithm over a CSRGraph.
+
+    Returns a list of distances indexed by station id (inf where
+    unreachable) and an array of predecessor ids (-1 for none).
+    Like dijkstra, it stops early once the target t is settled and
+    reports the settled count through stats.
+    """
+
+    offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+    distances = [float('inf')] * len(csr)
+    predecessors = array('i', [-1]) * len(csr)
+    visited = bytearray(len(csr))
+    distances[s] = 0
+    heap = [(0, s)]
+
+    settled = 0
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if visited[node]:
+            continue
+        visited[node] = 1
+        settled += 1
+
+        if node == t:
+            break
+
+        for i in range(offsets[node], offsets[node + 1]):
+            next_node = targets[i]
+            next_distance = distance + weights[i]
+            if next_distance < distances[next_node]:
+                distances[next_node] = next_distance
+                predecessors[next_node] = node
+                heapq.heappush(heap, (next_distance, next_node))
+
+    if stats is not None:
+        stats["settled"] = settled
+    return distances, predecessors
+
+
+def get_csr_path(predecessors: array, s: int, t: int) -> typing.List[int]:
+    """
+    Walk a CSR predecessor array back from t to s and return
+    the ordered list of station ids, or an empty list.
+    """
+
+    path = [t]
+    while path[-1] != s:
+        node = predecessors[path[-1]]
+        if node == -1:
+            return []
+        path.append(node)
+    path.reverse()
+    return path
+
+
+def bidirectional_dijkstra(
+    neighbours: typing.Callable, s, t, stats: dict = None
+) -> typing.Tuple[float, list]:
+    """
+    Point-to-point Dijkstra that searches forwards from s and
+    backwards from t at the same time, stopping once the two
+    frontiers can no longer improve the best meeting point.
+
+    neighbours(node) yields (neighbour, weight) pairs, so the same
+    search runs over the dict and CSR backends. The railway network
+    is undirected, so the backward search reuses the same adjacency.
+    Returns the cost and the ordered path, or (inf, []).
+    """
+
+    if s == t:
+        if stats is not None:
+            stats["settled"] = 0
+        return 0, [s]
+
+    distances = ({s: 0}, {t: 0})
+    predecessors = ({s: None}, {t: None})
+    visited = (set(), set())
+    heaps = ([(0, s)], [(0, t)])
+    best = float('inf')
+    meeting_node = None
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        # Grow whichever frontier is currently smaller.
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        other = 1 - side
+        distance, node = heapq.heappop(heaps[side])
+        if node in visited[side]:
+            continue
+        visited[side].add(node)
+
+        for next_node, weight in neighbours(node):
+            next_distance = distance + weight
+            if next_distance < distances[side].get(next_node, float('inf')):
+                distances[side][next_node] = next_distance
+                predecessors[side][next_node] = node
+                heapq.heappush(heaps[side], (next_distance, next_node))
+
+            if next_node in distances[other]:
+                total = (
+                    distances[side][next_node] +
+                    distances[other][next_node]
+                )
+                if total < best:
+                    best = total
+                    meeting_node = next_node
+
+    if stats is not None:
+        stats["settled"] = len(visited[0]) + len(visited[1])
+
+    if meeting_node is None:
+        return float('inf'), []
+
+    path = []
+    node = meeting_node
+    while node is not None:
+        path.append(node)
+        node = predecessors[0][node]
+    path.reverse()
+
+    node = predecessors[1][meeting_node]
+    while node is not None:
+        path.append(node)
+        node = predecessors[1][node]
+
+    return best, path
+
+
+def restricted_dijkstra(
+    graph: dict,
+    s: str,
+    t: str,
+    blocked_nodes: typing.Set[str],
+    blocked_edges: typing.Set[tuple],
+    to_target: dict = None,
+    next_hops: dict = None
+) -> typing.Tuple[float, list]:
+    """
+    Early-exit Dijkstra from s to t that may not pass through any
+    blocked station or along any blocked (source, target) edge.
+    Returns the cost and the ordered path, or (inf, []).
+
+    Given the unrestricted distances to t and the next hop towards t
+    from a search rooted at t, this is A* with those distances as the
+    heuristic. Blocking only lengthens routes, so the heuristic stays
+    consistent, and once a settled station's own route to t is clear
+    of every block, that route completes the cheapest path.
+    """
+
+    if to_target is not None and s not in to_target:
+        return float('inf'), []
+
+    def estimate(node) -> float:
+        return to_target[node] if to_target is not None else 0
+
+    # Whether each station's route to t is clear, memoised along the
+    # tree so every station is walked at most once per search.
+    clear = {t: True}
+
+    def is_clear(node) -> bool:
+        chain = []
+        while node not in clear:
+            next_node = next_hops[node]
+            if next_node in blocked_nodes or \
+                    (node, next_node) in blocked_edges:
+                clear[node] = False
+                break
+            chain.append(node)
+            node = next_node
+        for chain_node in chain:
+            clear[chain_node] = clear[node]
+        return clear[node]
+
+    distances = {s: 0}
+    predecessors = {s: None}
+    visited = set()
+    heap = [(estimate(s), s)]
+
+    while heap:
+        _, node = heapq.heappop(heap)
+        if node in visited:
+            continue
+        visited.add(node)
+        distance = distances[node]
+
+        if node == t:
+            return distance, get_path(predecessors, s, t)
+
+        if next_hops is not None and is_clear(node):
+            path = get_path(predecessors, s, node)
+            route = path[:]
+            while route[-1] != t:
+                route.append(next_hops[route[-1]])
+
+            # With zero-cost legs the route to t could loop back.
+            if len(set(route)) == len(route):
+                return distance + to_target[node], route
+
+        for next_node, weight in graph[node].items():
+            if next_node in blocked_nodes or \
+                    (node, next_node) in blocked_edges:
+                continue
+            if to_target is not None and next_node not in to_target:
+                continue
+            next_distance = distance + weight
+            if next_distance < distances.get(next_node, float('inf')):
+                distances[next_node] = next_distance
+                predecessors[next_node] = node
+                heapq.heappush(
+                    heap, (next_distance + estimate(next_node), next_node)
+                )
+
+    return float('inf'), []
+
+
+def yen_k_shortest_paths(
+    graph: dict, s: str, t: str, k: int, stats: dict = None
+) -> typing.List[typing.Tuple[float, list]]:
+    """
+    Yen's algorithm for the k cheapest loopless routes from s to t,
+    cheapest first.
+
+    Each accepted route is split at every station into a root path,
+    whose cost is read from the route's running total, and a spur
+    search to t that avoids the root and the edges already used by
+    accepted routes sharing that root. The last spur path found for
+    each root is kept: while it avoids every blocked edge the
+    candidate it produced is still queued, so the search is skipped.
+
+    One Dijkstra rooted at t is shared by every spur search as an
+    exact A* heuristic, and its tree gives the cheapest path itself.
+    Spur searches are also lazy: each root is queued under a lower
+    bound, the root cost plus the cheapest unblocked leg and the
+    distance on to t, and only searched once that bound is the
+    cheapest entry left, so roots that cannot reach the top k are
+    never searched.
+    """
+
+    if s not in graph:
+        raise KeyError(s)
+    if t not in graph or k <= 0:
+        return []
+
+    # The network is undirected, so distances from t are distances
+    # to t, and each predecessor is the next hop towards t.
+    to_target, next_hops = dijkstra(graph, t)
+    if s not in to_target:
+        return []
+
+    path = [s]
+    while path[-1] != t:
+        path.append(next_hops[path[-1]])
+
+    accepted = []
+    seen = {tuple(path)}
+    spur_paths = {}
+    pending = set()
+    searches = 0
+    skipped = 0
+
+    # Entries are (cost, is_root, order, path or (root, root cost)),
+    # so a route is accepted before a root bound of the same cost.
+    candidates = [(to_target[s], 0, 0, path)]
+    order = itertools.count(1)
+
+    # The edges leaving each root along accepted routes that share it.
+    blocked = {}
+
+    while candidates and len(accepted) < k:
+        cost, is_root, _, item = heapq.heappop(candidates)
+
+        if is_root:
+            root, root_cost = item
+            pending.discard(root)
+            searches += 1
+            spur_cost, spur_path = restricted_dijkstra(
+                graph, root[-1], t, set(root[:-1]), blocked[root],
+                to_target, next_hops
+            )
+            spur_paths[root] = spur_path
+            candidate = list(root[:-1]) + spur_path
+            if spur_path and tuple(candidate) not in seen:
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates, (
+                    root_cost + spur_cost, 0, next(order), candidate
+                ))
+            continue
+
+        accepted.append((cost, item))
+        if len(accepted) == k:
+            break
+
+        roots = [tuple(item[:i + 1]) for i in range(len(item) - 1)]
+        for i, root in enumerate(roots):
+            blocked.setdefault(root, set()).add((item[i], item[i + 1]))
+
+        root_cost = 0
+        for i, root in enumerate(roots):
+            if i > 0:
+                root_cost += graph[item[i - 1]][item[i]]
+            if root in pending:
+                continue
+
+            blocked_edges = blocked[root]
+            cached = spur_paths.get(root)
+            if cached is not None and not any(
+                edge in blocked_edges for edge in zip(cached, cached[1:])
+            ):
+                skipped += 1
+                continue
+
+            blocked_nodes = set(root[:-1])
+            bound = min((
+                weight + to_target[next_node]
+                for next_node, weight in graph[root[-1]].items()
+                if next_node in to_target and
+                next_node not in blocked_nodes and
+                (root[-1], next_node) not in blocked_edges
+            ), default=None)
+            if bound is None:
+                spur_paths[root] = []
+                continue
+
+            pending.add(root)
+            heapq.heappush(candidates, (
+                root_cost + bound, 1, next(order), (root, root_cost)
+            ))
+
+    if stats is not None:
+        stats["spur_searches"] = searches
+        stats["spur_skipped"] = skipped + len(pending)
+    return accepted
+
+
+def pareto_search(
+    graph: dict, s: str, t: str, max_hops: int = None, stats: dict = None
+) -> typing.List[typing.Tuple[int, int, list]]:
+    """
+    Label-setting search for the Pareto front of (cost, hops) routes
+    from s to t using at most max_hops legs.
+
+    Labels are settled in (cost, hops) order, so a label is only
+    kept if it uses fewer legs than every label already settled at
+    its station; anything else is dominated. Labels that cannot reach
+    t within the hop budget, or use no fewer legs than a route already
+    found to t, are pruned before they are queued. Returns
+    (cost, hops, path) tuples, cheapest first.
+    """
+
+    if s not in graph:
+        raise KeyError(s)
+    if t not in graph:
+        return []
+    if max_hops is None:
+        max_hops = len(graph)
+
+    # Fewest legs from every station to t, for pruning.
+    hops_to_target = {t: 0}
+    frontier = [t]
+    while frontier:
+        next_frontier = []
+        for node in frontier:
+            for next_node in graph[node]:
+                if next_node not in hops_to_target:
+                    hops_to_target[next_node] = hops_to_target[node] + 1
+                    next_frontier.append(next_node)
+        frontier = next_frontier
+
+    if hops_to_target.get(s, float('inf')) > max_hops:
+        return []
+
+    # A label is (cost, hops, node, parent label).
+    best_hops = {}
+    front = []
+    counter = 0
+    heap = [(0, 0, counter, (0, 0, s, None))]
+    settled = 0
+
+    while heap:
+        _, _, _, label = heapq.heappop(heap)
+        cost, hops, node, _ = label
+        if hops >= best_hops.get(node, float('inf')):
+            continue
+        best_hops[node] = hops
+        settled += 1
+
+        if node == t:
+            front.append(label)
+            if hops == hops_to_target[s]:
+                break
+            continue
+
+        limit = min(max_hops, best_hops.get(t, float('inf')) - 1)
+        for next_node, weight in graph[node].items():
+            next_hops = hops + 1
+            if (
+                next_hops + hops_to_target.get(next_node, float('inf'))
+                > limit or
+                next_hops >= best_hops.get(next_node, float('inf'))
+            ):
+                continue
+            counter += 1
+            heapq.heappush(heap, (
+                cost + weight, next_hops, counter,
+                (cost + weight, next_hops, next_node, label)
+            ))
+
+    if stats is not None:
+        stats["settled"] = settled
+
+    routes = []
+    for label in front:
+        path = []
+        step = label
+        while step is not None:
+            path.append(step[2])
+            step = step[3]
+        path.reverse()
+        routes.append((label[0], label[1], path))
+    return routes
+
+
+class Landmarks:
+    """
+    Precomputed exact distances from a handful of landmark stations,
+    used as A* lower bounds (ALT: A*, landmarks, triangle inequality).
+
+    For any landmark L the triangle inequality gives
+    d(v, t) >= |d(L, t) - d(L, v)|, so the largest such difference
+    over all landmarks is an admissible heuristic.
+    """
+
+    strategies = ("farthest", "degree", "random")
+
+    def __init__(
+        self,
+        landmarks: typing.List[str],
+        distances: typing.List[dict],
+        strategy="farthest",
+        signature: list = None
+    ):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.strategy = strategy if isinstance(strategy, str) \
+            else list(strategy)
+
+        # File signature of the network the tables were built from.
+        self.signature = signature
+
+    @classmethod
+    def from_graph(
+        cls, graph: dict, count: int = 8, strategy="farthest", seed: int = 0
+    ) -> "Landmarks":
+        """
+        Select landmarks and compute their distance tables.
+
+        The strategy is "farthest" (each landmark is the station
+        farthest from those already chosen), "degree" (the busiest
+        interchanges), "random", or an explicit list of station names.
+        """
+
+        stations = list(graph)
+        count = min(count, len(stations))
+        rng = random.Random(seed)
+
+        if not isinstance(strategy, str):
+            landmarks = list(strategy)
+        elif strategy == "degree":
+            landmarks = sorted(
+                stations, key=lambda node: len(graph[node]), reverse=True
+            )[:count]
+        elif strategy == "random":
+            landmarks = rng.sample(stations, count)
+        elif strategy == "farthest":
+            landmarks = []
+            distances = []
+            nearest = dict.fromkeys(stations, float('inf'))
+            start, _ = dijkstra(graph, rng.choice(stations))
+            candidate = max(stations, key=lambda node: start.get(node, -1))
+
+            while len(landmarks) < count:
+                landmarks.append(candidate)
+                table, _ = dijkstra(graph, candidate)
+                distances.append(table)
+                for node in stations:
+                    distance = table.get(node, float('inf'))
+                    if distance < nearest[node]:
+                        nearest[node] = distance
+
+                # Unreachable stations rank first, so every
+                # component of the network gets a landmark.
+                candidate = max(
+                    (node for node in stations if node not in landmarks),
+                    key=nearest.get,
+                    default=None
+                )
+                if candidate is None:
+                    break
+
+            return cls(landmarks, distances, strategy)
+        else:
+            raise ValueError(f"Unknown landmark strategy: {strategy}")
+
+        distances = [dijkstra(graph, landmark)[0] for landmark in landmarks]
+        return cls(landmarks, distances, strategy)
+
+    @classmethod
+    def load(cls, file_name: str) -> "Landmarks":
+        """
+        Load landmark tables saved with save().
+        """
+
+        with open(file_name, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        return cls(
+            data["landmarks"],
+            data["distances"],
+            data["strategy"],
+            data["signature"]
+        )
+
+    def save(self, file_name: str):
+        """
+        Write the landmark tables to a JSON file.
+        """
+
+        save_json(file_name, {
+            "landmarks": self.landmarks,
+            "strategy": self.strategy,
+            "signature": self.signature,
+            "distances": self.distances,
+        })
+
+    def get_heuristic(self, t: str) -> typing.Callable:
+        """
+        Return h(v), a lower bound on the cost from v to t.
+        """
+
+        bounds = [
+            (table, table.get(t)) for table in self.distances
+        ]
+
+        def heuristic(node: str) -> float:
+            bound = 0
+            for table, to_target in bounds:
+                from_landmark = table.get(node)
+                if from_landmark is None or to_target is None:
+                    # Reached from a landmark on one side only means
+                    # node and t lie in different components.
+                    if (from_landmark is None) != (to_target is None):
+                        return float('inf')
+                    continue
+
+                difference = abs(to_target - from_landmark)
+                if difference > bound:
+                    bound = difference
+            return bound
+
+        return heuristic
+
+
+def alt_search(
+    graph: dict, landmarks: Landmarks, s: str, t: str, stats: dict = None
+) -> typing.Tuple[float, list]:
+    """
+    A* search from s to t guided by landmark lower bounds.
+
+    The heuristic is consistent, so every station is settled at most
+    once and the search stops as soon as t is settled. Returns the
+    cost and the ordered path, or (inf, []).
+    """
+
+    if s not in graph:
+        raise KeyError(s)
+
+    heuristic = landmarks.get_heuristic(t)
+    distances = {s: 0}
+    predecessors = {s: None}
+    visited = set()
+    heap = [(heuristic(s), 0, s)]
+
+    while heap:
+        _, distance, node = heapq.heappop(heap)
+        if node in visited:
+            continue
+        visited.add(node)
+
+        if node == t:
+            break
+
+        for next_node, weight in graph[node].items():
+            next_distance = distance + weight
+            if next_distance < distances.get(next_node, float('inf')):
+                estimate = heuristic(next_node)
+                if estimate == float('inf'):
+                    continue
+                distances[next_node] = next_distance
+                predecessors[next_node] = node
+                heapq.heappush(
+                    heap, (next_distance + estimate, next_distance, next_node)
+                )
+
+    if stats is not None:
+        stats["settled"] = len(visited)
+
+    if t not in visited:
+        return float('inf'), []
+    return distances[t], get_path(predecessors, s, t)
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy over the railway network.
+
+    Stations are contracted one at a time in order of importance and a
+    shortcut edge is added between two neighbours whenever the route
+    through the contracted station is the only shortest one. A query
+    is then a bidirectional search that only climbs towards more
+    important stations, which settles very few nodes.
+    """
+
+    def __init__(
+        self,
+        names: typing.List[str],
+        rank: typing.List[int],
+        upward: typing.List[dict],
+        signature: list = None
+    ):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.rank = rank
+
+        # upward[v] maps each higher ranked neighbour u of v to
+        # (weight, middle), where middle is the station a shortcut
+        # bypasses or -1 for an original edge.
+        self.upward = upward
+        self.signature = signature
+
+    @staticmethod
+    def _witness_search(
+        adjacency: typing.List[dict],
+        source: int,
+        excluded: int,
+        limit: int,
+        targets: dict,
+        settle_limit: int
+    ) -> dict:
+        """
+        Dijkstra from source that avoids the excluded station and
+        stops past the weight limit, once every target is settled
+        or after settle_limit stations.
+        """
+
+        distances = {source: 0}
+        visited = set()
+        heap = [(0, source)]
+        remaining = len(targets)
+
+        while heap and len(visited) < settle_limit:
+            distance, node = heapq.heappop(heap)
+            if distance > limit:
+                break
+            if node in visited:
+                continue
+            visited.add(node)
+
+            if node in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+
+            for next_node, (weight, _) in adjacency[node].items():
+                if next_node == excluded:
+                    continue
+                next_distance = distance + weight
+                if next_distance < distances.get(next_node, float('inf')):
+                    distances[next_node] = next_distance
+                    heapq.heappush(heap, (next_distance, next_node))
+
+        return distances
+
+    @classmethod
+    def from_graph(
+        cls, graph: dict, settle_limit: int = 64
+    ) -> "ContractionHierarchy":
+        """
+        Contract every station of the graph.
+
+        Stations are ordered lazily by edge difference (shortcuts
+        added minus edges removed) plus the number of neighbours
+        already contracted, which spreads contraction evenly.
+        """
+
+        names = list(graph)
+        index = {name: i for i, name in enumerate(names)}
+        adjacency = [
+            {index[next_node]: (weight, -1)
+             for next_node, weight in graph[name].items()}
+            for name in names
+        ]
+        contracted_neighbours = [0] * len(names)
+        rank = [0] * len(names)
+        upward = [None] * len(names)
+
+        def get_shortcuts(node: int) -> list:
+            neighbours = [
+                (next_node, weight)
+                for next_node, (weight, _) in adjacency[node].items()
+            ]
+            shortcuts = []
+            for i, (source, source_weight) in enumerate(neighbours):
+                targets = {
+                    target: source_weight + target_weight
+                    for target, target_weight in neighbours[i + 1:]
+                }
+                if not targets:
+                    continue
+
+                witness = cls._witness_search(
+                    adjacency, source, node, max(targets.values()),
+                    targets, settle_limit
+                )
+                for target, weight in targets.items():
+                    if witness.get(target, float('inf')) > weight:
+                        shortcuts.append((source, target, weight))
+            return shortcuts
+
+        def get_priority(node: int) -> typing.Tuple[int, list]:
+            shortcuts = get_shortcuts(node)
+            priority = len(shortcuts) - len(adjacency[node]) + \
+                contracted_neighbours[node]
+            return priority, shortcuts
+
+        heap = [(get_priority(node)[0], node) for node in range(len(names))]
+        heapq.heapify(heap)
+        order = 0
+
+        while heap:
+            _, node = heapq.heappop(heap)
+
+            # Lazy update: re-queue the station if its priority has
+            # grown past the next candidate since it was queued.
+            priority, shortcuts = get_priority(node)
+            if heap and priority > heap[0][0]:
+                heapq.heappush(heap, (priority, node))
+                continue
+
+            upward[node] = adjacency[node]
+            for next_node in adjacency[node]:
+                del adjacency[next_node][node]
+                contracted_neighbours[next_node] += 1
+
+            for source, target, weight in shortcuts:
+                if weight < adjacency[source].get(
+                    target, (float('inf'), -1)
+                )[0]:
+                    adjacency[source][target] = (weight, node)
+                    adjacency[target][source] = (weight, node)
+
+            adjacency[node] = {}
+            rank[node] = order
+            order += 1
+
+        return cls(names, rank, upward)
+
+    @classmethod
+    def load(cls, file_name: str) -> "ContractionHierarchy":
+        """
+        Load a hierarchy saved with save().
+        """
+
+        with open(file_name, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        upward = [
+            {next_node: (weight, middle)
+             for next_node, weight, middle in edges}
+            for edges in data["upward"]
+        ]
+        return cls(data["names"], data["rank"], upward, data["signature"])
+
+    def save(self, file_name: str):
+        """
+        Write the hierarchy to a JSON file.
+        """
+
+        save_json(file_name, {
+            "signature": self.signature,
+            "names": self.names,
+            "rank": self.rank,
+            "upward": [
+                [[next_node, weight, middle]
+                 for next_node, (weight, middle) in edges.items()]
+                for edges in self.upward
+            ],
+        })
+
+    def unpack(self, source: int, target: int) -> typing.List[int]:
+        """
+        Expand the edge source-target, which may be a shortcut,
+        into the original stations it passes through.
+        """
+
+        path = [source]
+        stack = [(source, target)]
+        while stack:
+            u, v = stack.pop()
+            lower, higher = (u, v) if self.rank[u] < self.rank[v] else (v, u)
+            _, middle = self.upward[lower][higher]
+            if middle == -1:
+                path.append(v)
+                continue
+            stack.append((middle, v))
+            stack.append((u, middle))
+        return path
+
+    def query(
+        self, s: str, t: str, stats: dict = None
+    ) -> typing.Tuple[float, list]:
+        """
+        Bidirectional upward search from s and t. Returns the cost
+        and the unpacked ordered list of stations, or (inf, []).
+        """
+
+        source, target = self.index[s], self.index.get(t)
+        if target is None:
+            return float('inf'), []
+        if source == target:
+            return 0, [s]
+
+        distances = ({source: 0}, {target: 0})
+        predecessors = ({source: None}, {target: None})
+        heaps = ([(0, source)], [(0, target)])
+        best = float('inf')
+        meeting_node = None
+        settled = 0
+        side = 1
+
+        while heaps[0] or heaps[1]:
+            side = 1 - side if heaps[1 - side] else side
+            distance, node = heapq.heappop(heaps[side])
+            if distance > distances[side][node]:
+                continue
+
+            # Nothing further up this side can beat the best route.
+            if distance >= best:
+                heaps[side].clear()
+                continue
+            settled += 1
+
+            if node in distances[1 - side]:
+                total = distance + distances[1 - side][node]
+                if total < best:
+                    best = total
+                    meeting_node = node
+
+            for next_node, (weight, _) in self.upward[node].items():
+                next_distance = distance + weight
+                if next_distance < distances[side].get(
+                    next_node, float('inf')
+                ):
+                    distances[side][next_node] = next_distance
+                    predecessors[side][next_node] = node
+                    heapq.heappush(heaps[side], (next_distance, next_node))
+
+        if stats is not None:
+            stats["settled"] = settled
+
+        if meeting_node is None:
+            return float('inf'), []
+
+        forward = [meeting_node]
+        while predecessors[0][forward[-1]] is not None:
+            forward.append(predecessors[0][forward[-1]])
+        forward.reverse()
+
+        backward = [meeting_node]
+        while predecessors[1][backward[-1]] is not None:
+            backward.append(predecessors[1][backward[-1]])
+
+        hops = forward + backward[1:]
+        path = [source]
+        for u, v in zip(hops, hops[1:]):
+            path.extend(self.unpack(u, v)[1:])
+        return best, [self.names[i] for i in path]
+
+
+_worker_csr = None
+
+
+def _init_csr_worker(csr: CSRGraph):
+    """
+    Keep one copy of the graph in each pool worker.
+    """
+
+    global _worker_csr
+    _worker_csr = csr
+
+
+def _get_matrix_rows(source: int) -> typing.Tuple[int, bytes, bytes]:
+    """
+    Return the fare row and next-hop row of one source station.
+    """
+
+    distances, predecessors = csr_dijkstra(_worker_csr, source)
+    fares = array('i', [-1]) * len(distances)
+    next_hops = array('i', [-1]) * len(distances)
+    next_hops[source] = source
+
+    for target, distance in enumerate(distances):
+        if distance == float('inf'):
+            continue
+        fares[target] = distance
+
+        # Walk up the tree until a station with a known first hop,
+        # then fill in every station passed on the way.
+        chain = []
+        node = target
+        while next_hops[node] == -1 and predecessors[node] != source:
+            chain.append(node)
+            node = predecessors[node]
+        hop = node if next_hops[node] == -1 else next_hops[node]
+        next_hops[node] = hop
+        for node in chain:
+            next_hops[node] = hop
+
+    return source, fares.tobytes(), next_hops.tobytes()
+
+
+def _get_batch_routes(
+    job: typing.Tuple[int, typing.List[int]]
+) -> typing.Tuple[int, list]:
+    """
+    Build one shortest path tree and return the cost and path of
+    every requested target in it.
+    """
+
+    source, targets = job
+    distances, predecessors = csr_dijkstra(_worker_csr, source)
+    return source, [
+        (target, distances[target],
+         get_csr_path(predecessors, source, target))
+        for target in targets
+    ]
+
+
+class FareMatrix:
+    """
+    Memory-mapped all-pairs fare and next-hop matrices.
+
+    The file holds a header, the station names and two V x V int32
+    matrices: the cheapest fare from s to t (-1 if unreachable) and
+    the first station after s on that route. A lookup is an array
+    read and a route is a walk along next hops, with no graph search.
+    """
+
+    magic = b"CTFM"
+    header = struct.Struct("<4sIIqq")
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        with open(file_name, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.buffer) < self.header.size + 4:
+            self.buffer.close()
+            raise ValueError(f"Truncated fare matrix file: {file_name}")
+
+        magic, _, count, mtime, size = self.header.unpack_from(self.buffer)
+        if magic != self.magic:
+            self.buffer.close()
+            raise ValueError(f"Not a fare matrix file: {file_name}")
+        self.signature = [mtime, size]
+
+        # Set for a matrix of a graph changed in memory only, whose
+        # file is deleted on close.
+        self.temporary = False
+
+        offset = self.header.size
+        (names_size,) = struct.unpack_from("<I", self.buffer, offset)
+        offset += 4
+        matrix_offset = self.get_matrix_offset(names_size)
+        matrix_size = count * count * 4
+        if len(self.buffer) != matrix_offset + 2 * matrix_size:
+            self.buffer.close()
+            raise ValueError(f"Truncated fare matrix file: {file_name}")
+
+        self.names = bytes(
+            self.buffer[offset:offset + names_size]
+        ).decode('utf-8').split("\n") if count else []
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        offset = matrix_offset
+        view = memoryview(self.buffer)
+        self.fares = view[offset:offset + matrix_size].cast('i')
+        self.next_hops = view[
+            offset + matrix_size:offset + 2 * matrix_size
+        ].cast('i')
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def get_matrix_offset(cls, names_size: int) -> int:
+        """
+        Return the 4-byte aligned offset of the fare matrix.
+        """
+
+        offset = cls.header.size + 4 + names_size
+        return offset + (-offset % 4)
+
+    @classmethod
+    def precompute(
+        cls,
+        csr: CSRGraph,
+        file_name: str,
+        signature: typing.Tuple[int, int] = (0, 0),
+        processes: int = None
+    ):
+        """
+        Run the single-source engine from every station across a
+        process pool and write both matrices to file_name.
+
+        The matrices are filled in a temporary file that is moved into
+        place only once complete, so another process never opens a
+        matrix whose header matches but whose rows are still missing.
+        """
+
+        count = len(csr)
+        names = "\n".join(csr.names).encode('utf-8')
+        offset = cls.get_matrix_offset(len(names))
+        matrix_size = count * count * 4
+
+        handle, temporary_file = tempfile.mkstemp(
+            suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name))
+        )
+        try:
+            with os.fdopen(handle, 'w+b') as file:
+                file.write(cls.header.pack(cls.magic, 1, count, *signature))
+                file.write(struct.pack("<I", len(names)))
+                file.write(names)
+                file.truncate(offset + 2 * matrix_size)
+
+                if count:
+                    buffer = mmap.mmap(file.fileno(), 0)
+                    with multiprocessing.Pool(
+                        processes,
+                        initializer=_init_csr_worker,
+                        initargs=(csr,)
+                    ) as pool:
+                        for source, fares, next_hops in pool.imap_unordered(
+                            _get_matrix_rows, range(count),
+                            chunksize=max(1, count // 64)
+                        ):
+                            row = offset + source * count * 4
+                            buffer[row:row + count * 4] = fares
+                            row += matrix_size
+                            buffer[row:row + count * 4] = next_hops
+                    buffer.flush()
+                    buffer.close()
+            os.replace(temporary_file, file_name)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    def query(self, s: str, t: str) -> typing.Tuple[float, list]:
+        """
+        Return the cheapest cost from s to t and the ordered list
+        of stations on that route, or (inf, []).
+        """
+
+        source, target = self.index[s], self.index.get(t)
+        if target is None:
+            return float('inf'), []
+
+        count = len(self.names)
+        fare = self.fares[source * count + target]
+        if fare == -1:
+            return float('inf'), []
+
+        path = [source]
+        while path[-1] != target:
+            path.append(self.next_hops[path[-1] * count + target])
+        return fare, [self.names[i] for i in path]
+
+    def close(self):
+        """
+        Release the memory map, and delete the file if temporary.
+        """
+
+        self.fares.release()
+        self.next_hops.release()
+        self.buffer.close()
+        if self.temporary:
+            os.remove(self.file_name)
+
+
+def repair_tree_decrease(
+    graph: dict, tree: typing.Tuple[dict, dict], u: str, v: str
+) -> int:
     """
+    Repair a shortest path tree after the edge u-v was added or its
+    weight dropped, where graph already holds the new weight.
 
-    graph = {}
-    with open(file_name, 'r', newline='', encoding='utf-8') as csvfile:
-        csv_reader = csv.reader(csvfile)
+    Only stations whose distance improves are touched: the search is
+    seeded from the two endpoints and stops propagating as soon as a
+    relaxation no longer improves a distance. Returns the number of
+    stations updated.
+    """
 
-        # Read the file and convert the columns into
-        # dictionary of s, t and cost (weight).
-        # according to the algorithm.
-        for row in csv_reader:
-            source, target, weight = row
-            weight = int(weight)
-            if source not in graph:
-                graph[source] = {}
-            if target not in graph:
-                graph[target] = {}
-            graph[source][target] = weight
-            graph[target][source] = weight
-    return graph
+    distances, predecessors = tree
+    heap = []
+    for source, target in ((u, v), (v, u)):
+        if source not in distances:
+            continue
+        distance = distances[source] + graph[source][target]
+        if distance < distances.get(target, float('inf')):
+            distances[target] = distance
+            predecessors[target] = source
+            heap.append((distance, target))
+    heapq.heapify(heap)
+
+    updated = 0
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        updated += 1
+
+        for next_node, weight in graph[node].items():
+            next_distance = distance + weight
+            if next_distance < distances.get(next_node, float('inf')):
+                distances[next_node] = next_distance
+                predecessors[next_node] = node
+                heapq.heappush(heap, (next_distance, next_node))
+
+    return updated
+
+
+def repair_tree_increase(
+    graph: dict, tree: typing.Tuple[dict, dict], u: str, v: str
+) -> int:
+    """
+    Repair a shortest path tree after the edge u-v became more
+    expensive or was removed, where graph already reflects it.
+
+    If u-v is not a tree edge nothing changes. Otherwise only the
+    subtree hanging below it is invalidated and re-settled from its
+    unaffected neighbours. Returns the number of stations updated.
+    """
+
+    distances, predecessors = tree
+    if predecessors.get(v) == u:
+        root = v
+    elif predecessors.get(u) == v:
+        root = u
+    else:
+        return 0
+
+    children = {}
+    for node, parent in predecessors.items():
+        if parent is not None:
+            children.setdefault(parent, []).append(node)
+
+    affected = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        affected.add(node)
+        stack.extend(children.get(node, ()))
+
+    for node in affected:
+        del distances[node]
+        del predecessors[node]
+
+    # Seed every affected station with its best unaffected neighbour.
+    heap = []
+    for node in affected:
+        for next_node, weight in graph[node].items():
+            if next_node not in affected and next_node in distances:
+                distance = distances[next_node] + weight
+                if distance < distances.get(node, float('inf')):
+                    distances[node] = distance
+                    predecessors[node] = next_node
+        if node in distances:
+            heap.append((distances[node], node))
+    heapq.heapify(heap)
+
+    visited = set()
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if node in visited or distance > distances[node]:
+            continue
+        visited.add(node)
+
+        for next_node, weight in graph[node].items():
+            if next_node not in affected:
+                continue
+            next_distance = distance + weight
+            if next_distance < distances.get(next_node, float('inf')):
+                distances[next_node] = next_distance
+                predecessors[next_node] = node
+                heapq.heappush(heap, (next_distance, next_node))
+
+    return len(affected)
+
+
+class ShortestPathTreeCache:
+    """
+    Bounded LRU cache of shortest path trees keyed by origin station.
+
+    Entries are evicted least recently used first once either
+    max_entries or the estimated max_bytes is exceeded. The cache is
+    tied to a graph version and empties itself when that changes.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.trees = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, origin: str) -> bool:
+        return origin in self.trees
+
+    def __len__(self):
+        return len(self.trees)
+
+    @staticmethod
+    def get_tree_size(tree: typing.Tuple[dict, dict]) -> int:
+        """
+        Estimate the bytes held by a tree's two maps. Station names
+        are shared with the graph, so only the tables are counted.
+        """
+
+        return sum(sys.getsizeof(table) for table in tree)
+
+    def check_version(self, version: int):
+        """
+        Drop every tree if the graph has changed since they were built.
+        """
+
+        if version != self.version:
+            self.invalidate()
+            self.version = version
+
+    def invalidate(self):
+        """
+        Remove every cached tree.
+        """
+
+        self.trees.clear()
+        self.sizes.clear()
+        self.total_bytes = 0
+
+    def get(self, origin: str) -> typing.Optional[tuple]:
+        """
+        Return the cached tree of an origin, or None on a miss.
+        """
+
+        tree = self.trees.get(origin)
+        if tree is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.trees.move_to_end(origin)
+        return tree
+
+    def put(self, origin: str, tree: typing.Tuple[dict, dict]):
+        """
+        Cache a tree, evicting the least recently used trees
+        until the cache is back within its limits.
+        """
+
+        if self.max_entries <= 0:
+            return
+
+        if origin in self.trees:
+            self.total_bytes -= self.sizes[origin]
+        self.trees[origin] = tree
+        self.trees.move_to_end(origin)
+        self.sizes[origin] = self.get_tree_size(tree)
+        self.total_bytes += self.sizes[origin]
+
+        while len(self.trees) > 1 and (
+            len(self.trees) > self.max_entries or
+            self.total_bytes > self.max_bytes
+        ):
+            evicted, _ = self.trees.popitem(last=False)
+            self.total_bytes -= self.sizes.pop(evicted)
+            self.evictions += 1
+
+    def repair(
+        self,
+        graph: dict,
+        source: str,
+        target: str,
+        old_weight: typing.Optional[int],
+        new_weight: typing.Optional[int]
+    ) -> int:
+        """
+        Repair every cached tree after the weight of the edge
+        source-target changed from old_weight to new_weight, where
+        None means the edge did not or no longer exists. Returns the
+        total number of stations updated.
+        """
+
+        if old_weight == new_weight:
+            return 0
+
+        updated = 0
+        for origin, tree in self.trees.items():
+            if new_weight is not None and (
+                old_weight is None or new_weight < old_weight
+            ):
+                updated += repair_tree_decrease(graph, tree, source, target)
+            else:
+                updated += repair_tree_increase(graph, tree, source, target)
+
+            size = self.get_tree_size(tree)
+            self.total_bytes += size - self.sizes[origin]
+            self.sizes[origin] = size
+        return updated
+
+    def get_stats(self) -> dict:
+        """
+        Return the hit, miss and eviction counters.
+        """
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.trees),
+            "bytes": self.total_bytes,
+        }
+
+
+class GraphStore:
+    """
+    Keep the railway graph resident in memory across queries.
+
+    The CSV is parsed once and only reloaded when its modification
+    time or size changes. Routes appended through the store are merged
+    into the resident graph without a reload. With a snapshot_file the
+    graph is loaded from its binary snapshot instead of the CSV while
+    the snapshot is up to date; get_csr (re)writes it when it is not.
+    """
+
+    def __init__(self, file_name: str, snapshot_file: str = None):
+        self.file_name = file_name
+        self.snapshot_file = snapshot_file
+        self.graph = None
+        self.signature = None
+        self.csr = None
+        self.csr_version = None
+
+        # Bumped on every change so derived data can tell it is stale.
+        self.version = 0
+
+        # The version at which the resident graph last matched the
+        # CSV. Derived files tagged with the CSV signature (snapshot,
+        # landmarks, hierarchy, fare matrix) describe that graph only.
+        self.file_version = 0
+
+        # Called as listener(source, target, old_weight, new_weight)
+        # after each incremental edge change.
+        self.listeners = []
+
+    def get_signature(self) -> typing.Tuple[int, int]:
+        """
+        Return the modification time and size of the CSV file.
+        """
+
+        stat = os.stat(self.file_name)
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """
+        Drop the resident graph if the file has changed on disk.
+        """
+
+        signature = self.get_signature()
+        if signature != self.signature:
+            self.graph = None
+            if self.csr is not None:
+                self.csr.close()
+            self.csr = None
+            self.signature = signature
+            self.version += 1
+            self.file_version = self.version
+
+    def is_saved(self) -> bool:
+        """
+        Return whether the resident graph still matches the CSV, i.e.
+        no edge was changed in memory only since it was loaded, so
+        files derived from the CSV can be trusted and written.
+        """
+
+        self.refresh()
+        return self.version == self.file_version
+
+    def get(self) -> dict:
+        """
+        Return the resident graph, reloading it only if
+        the file has changed on disk.
+        """
+
+        self.refresh()
+        if self.graph is None:
+            # An existing, up to date snapshot is read, but a missing
+            # one is not built here: the dict backends never need it.
+            if self.csr is None and self.snapshot_file:
+                self.csr = read_snapshot(self.file_name, self.snapshot_file)
+                self.csr_version = self.version
+            if self.csr is not None and self.csr_version == self.version:
+                self.graph = self.csr.to_graph()
+            else:
+                self.graph = get_graph(self.file_name)
+        return self.graph
+
+    def get_csr(self) -> CSRGraph:
+        """
+        Return the CSR form of the resident graph, rebuilding it
+        only when the graph has changed since it was last built.
+        On a cold start it is opened from the snapshot if one is set.
+        """
+
+        self.refresh()
+        if self.csr is None or self.csr_version != self.version:
+            stale = self.csr
+            if self.graph is None and self.snapshot_file:
+                self.csr = load_snapshot(self.file_name, self.snapshot_file)
+            else:
+                self.csr = CSRGraph.from_graph(self.get())
+            self.csr_version = self.version
+
+            # A stale snapshot map would otherwise stay open.
+            if stale is not None and stale is not self.csr:
+                stale.close()
+        return self.csr
+
+    def add_edge(self, source: str, target: str, weight: int):
+        """
+        Merge a single undirected edge into the resident graph,
+        with the same last-row-wins rule as get_graph.
+        Returns the previous weight of the edge, or None.
+        """
+
+        graph = self.get()
+        weight = int(weight)
+        if source not in graph:
+            graph[source] = {}
+        if target not in graph:
+            graph[target] = {}
+
+        old_weight = graph[source].get(target)
+        graph[source][target] = weight
+        graph[target][source] = weight
+        self.version += 1
+
+        for listener in self.listeners:
+            listener(source, target, old_weight, weight)
+        return old_weight
+
+    def remove_edge(self, source: str, target: str):
+        """
+        Remove an edge from the resident graph only; the CSV is not
+        rewritten. Returns the removed weight, or None.
+        """
+
+        graph = self.get()
+        old_weight = graph.get(source, {}).pop(target, None)
+        if old_weight is None:
+            return None
+        if target != source:
+            del graph[target][source]
+        self.version += 1
+
+        for listener in self.listeners:
+            listener(source, target, old_weight, None)
+        return old_weight
+
+    def append_rows(self, rows: typing.List[tuple]):
+        """
+        Append rows to the CSV file and merge them into the
+        resident graph without re-parsing the file.
+        """
+
+        self.get()
+        saved = self.version == self.file_version
+        with open(
+            self.file_name, 'a', newline='', encoding='utf-8'
+        ) as csvfile:
+            for source, target, weight in rows:
+                csvfile.write(f"\n{source},{target},{weight}")
+
+        # Our own write must not look like an external change.
+        self.signature = self.get_signature()
+
+        for source, target, weight in rows:
+            self.add_edge(source, target, weight)
+
+        # The rows are now in the file as well, so a graph that
+        # matched the file before still does.
+        if saved:
+            self.file_version = self.version
 
 
 class CheapestTrainTickets:
@@ -48,11 +1901,48 @@ class CheapestTrainTickets:
     price, start or end points, and more.
     """
 
-    def __init__(self):
+    backends = ("dict", "csr", "alt", "ch", "matrix")
+    modes = ("full", "early_exit", "bidirectional")
+
+    def __init__(self, file_name: str = None, backend: str = "dict"):
         current_directory = os.path.dirname(os.path.abspath(__name__))
         self.current_directory = current_directory + "\\"
         self.task_directory = self.current_directory + "\\tasks\\Task 1_4\\"
 
+        if file_name is None:
+            file_name = self.task_directory + "task1_4_railway_network.csv"
+        self.graph_store = GraphStore(
+            file_name, os.path.splitext(file_name)[0] + ".snapshot"
+        )
+
+        if backend not in self.backends:
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+
+        # Shortest path trees of recent origins, see get_shortest_tree.
+        # Edge changes made through the store repair them in place.
+        self.tree_cache = ShortestPathTreeCache()
+        self.graph_store.listeners.append(self.repair_trees)
+
+        # Configuration of the ALT backend, see get_landmarks.
+        self.landmark_count = 8
+        self.landmark_strategy = "farthest"
+        self.landmark_file = \
+            os.path.splitext(file_name)[0] + "_landmarks.json"
+        self.landmarks = None
+        self.landmarks_version = None
+
+        # Configuration of the contraction hierarchy backend.
+        self.hierarchy_file = \
+            os.path.splitext(file_name)[0] + "_hierarchy.json"
+        self.hierarchy = None
+        self.hierarchy_version = None
+
+        # Configuration of the precomputed fare matrix backend.
+        self.matrix_file = os.path.splitext(file_name)[0] + "_fares.bin"
+        self.fare_matrix = None
+        self.fare_matrix_version = None
+
     def __str__(self):
         s = input("[SEARCH] Enter your Departure Location: ")
         t = input("[SEARCH] Enter your Destination Location: ")
@@ -64,6 +1954,194 @@ class CheapestTrainTickets:
             end_time - start_time
         )
 
+    def get_landmarks(self) -> Landmarks:
+        """
+        Return the landmark tables for the resident network.
+
+        The tables are loaded from landmark_file, by default next to
+        the CSV, when it matches the current network and configuration.
+        Otherwise they are recomputed and saved, unless landmark_file
+        is None. After an edge change made in memory only the file
+        describes another graph, so it is neither loaded nor
+        overwritten.
+        """
+
+        graph = self.graph_store.get()
+        saved = self.graph_store.is_saved()
+        if (
+            self.landmarks is not None and
+            self.landmarks_version == self.graph_store.version
+        ):
+            return self.landmarks
+
+        signature = list(self.graph_store.signature)
+        strategy = self.landmark_strategy
+        if isinstance(strategy, str):
+            count = min(self.landmark_count, len(graph))
+        else:
+            strategy = list(strategy)
+            count = len(strategy)
+
+        landmarks = None
+        if saved and self.landmark_file and \
+                os.path.exists(self.landmark_file):
+            # A damaged file is recomputed like a stale one.
+            try:
+                landmarks = Landmarks.load(self.landmark_file)
+            except (ValueError, KeyError):
+                landmarks = None
+            if landmarks is not None and (
+                landmarks.signature != signature or
+                landmarks.strategy != strategy or
+                len(landmarks.landmarks) != count
+            ):
+                landmarks = None
+
+        if landmarks is None:
+            landmarks = Landmarks.from_graph(
+                graph, self.landmark_count, self.landmark_strategy
+            )
+            landmarks.signature = signature
+            if saved and self.landmark_file:
+                landmarks.save(self.landmark_file)
+
+        self.landmarks = landmarks
+        self.landmarks_version = self.graph_store.version
+        return landmarks
+
+    def get_hierarchy(self) -> ContractionHierarchy:
+        """
+        Return the contraction hierarchy of the resident network,
+        loading hierarchy_file (by default next to the CSV) when it
+        matches the network and rebuilding and saving it otherwise,
+        unless hierarchy_file is None. As with the landmarks, the file
+        is ignored after an in-memory edge change.
+        """
+
+        graph = self.graph_store.get()
+        saved = self.graph_store.is_saved()
+        if (
+            self.hierarchy is not None and
+            self.hierarchy_version == self.graph_store.version
+        ):
+            return self.hierarchy
+
+        signature = list(self.graph_store.signature)
+        hierarchy = None
+        if saved and self.hierarchy_file and \
+                os.path.exists(self.hierarchy_file):
+            # A damaged file is rebuilt like a stale one.
+            try:
+                hierarchy = ContractionHierarchy.load(self.hierarchy_file)
+            except (ValueError, KeyError):
+                hierarchy = None
+            if hierarchy is not None and hierarchy.signature != signature:
+                hierarchy = None
+
+        if hierarchy is None:
+            hierarchy = ContractionHierarchy.from_graph(graph)
+            hierarchy.signature = signature
+            if saved and self.hierarchy_file:
+                hierarchy.save(self.hierarchy_file)
+
+        self.hierarchy = hierarchy
+        self.hierarchy_version = self.graph_store.version
+        return hierarchy
+
+    def get_fare_matrix(self) -> FareMatrix:
+        """
+        Return the memory-mapped fare matrix of the resident network,
+        precomputing matrix_file first if it is missing or stale.
+
+        After an edge change made in memory only, matrix_file (which
+        describes the CSV) is neither used nor overwritten; the matrix
+        of the changed graph goes to a temporary file instead, removed
+        when it is replaced.
+        """
+
+        saved = self.graph_store.is_saved()
+        if (
+            self.fare_matrix is not None and
+            self.fare_matrix_version == self.graph_store.version
+        ):
+            return self.fare_matrix
+
+        if self.fare_matrix is not None:
+            self.fare_matrix.close()
+            self.fare_matrix = None
+
+        signature = list(self.graph_store.signature)
+        fare_matrix = None
+        if saved and os.path.exists(self.matrix_file):
+            # A damaged file is rebuilt like a stale one.
+            try:
+                fare_matrix = FareMatrix(self.matrix_file)
+            except ValueError:
+                fare_matrix = None
+            if fare_matrix is not None and \
+                    fare_matrix.signature != signature:
+                fare_matrix.close()
+                fare_matrix = None
+
+        if fare_matrix is None and saved:
+            FareMatrix.precompute(
+                self.graph_store.get_csr(), self.matrix_file, signature
+            )
+            fare_matrix = FareMatrix(self.matrix_file)
+        elif fare_matrix is None:
+            handle, file_name = tempfile.mkstemp(
+                suffix="_fares.bin",
+                dir=os.path.dirname(os.path.abspath(self.matrix_file))
+            )
+            os.close(handle)
+            FareMatrix.precompute(self.graph_store.get_csr(), file_name)
+            fare_matrix = FareMatrix(file_name)
+            fare_matrix.temporary = True
+
+        self.fare_matrix = fare_matrix
+        self.fare_matrix_version = self.graph_store.version
+        return fare_matrix
+
+    def prepare(self):
+        """
+        Load the network and run the backend's preprocessing (landmark
+        tables, hierarchy or fare matrix), so that the first query
+        does not pay for it.
+        """
+
+        # The csr backend opens (or writes) the snapshot first, so the
+        # resident graph is then expanded from it.
+        if self.backend == "csr":
+            self.graph_store.get_csr()
+        self.graph_store.get()
+        if self.backend == "alt":
+            self.get_landmarks()
+        elif self.backend == "ch":
+            self.get_hierarchy()
+        elif self.backend == "matrix":
+            self.get_fare_matrix()
+
+    def repair_trees(
+        self,
+        source: str,
+        target: str,
+        old_weight: typing.Optional[int],
+        new_weight: typing.Optional[int]
+    ):
+        """
+        Repair the cached trees after an incremental edge change
+        instead of discarding them. Trees that were already stale
+        are left for check_version to drop.
+        """
+
+        if self.tree_cache.version != self.graph_store.version - 1:
+            return
+
+        self.tree_cache.repair(
+            self.graph_store.graph, source, target, old_weight, new_weight
+        )
+        self.tree_cache.version = self.graph_store.version
+
     def get_shortest_distance(self, s: str):
         """
         Pass in source (starting node) to return the shortest
@@ -73,38 +2151,192 @@ class CheapestTrainTickets:
         if len(s) == 0:
             return []
 
-        g = get_graph(
-            self.task_directory +
-            "task1_4_railway_network.csv"
+        reached, _ = self.get_shortest_tree(s)
+        return {
+            node: reached.get(node, float('inf'))
+            for node in self.graph_store.get()
+        }
+
+    def get_shortest_tree(self, s: str) -> typing.Tuple[dict, dict]:
+        """
+        Return the shortest path tree rooted at s as a map of
+        distances and a map of predecessors.
+
+        Trees are served from the LRU tree_cache when possible.
+        """
+
+        self.graph_store.refresh()
+        self.tree_cache.check_version(self.graph_store.version)
+        tree = self.tree_cache.get(s)
+        if tree is None:
+            tree = self.build_shortest_tree(s)
+            self.tree_cache.put(s, tree)
+        return tree
+
+    def build_shortest_tree(self, s: str) -> typing.Tuple[dict, dict]:
+        """
+        Build the shortest path tree rooted at s with the
+        configured backend, bypassing the cache.
+        """
+
+        if self.backend == "csr":
+            csr = self.graph_store.get_csr()
+            distances, predecessors = csr_dijkstra(csr, csr.index[s])
+            names = csr.names
+            return (
+                {
+                    names[i]: distance
+                    for i, distance in enumerate(distances)
+                    if distance != float('inf')
+                },
+                {
+                    names[i]: names[node] if node != -1 else None
+                    for i, node in enumerate(predecessors)
+                    if distances[i] != float('inf')
+                }
+            )
+
+        return dijkstra(self.graph_store.get(), s)
+
+    def get_shortest_path(
+        self, s: str, t: str, mode: str = "early_exit"
+    ) -> typing.Tuple:
+        """
+        Return the cheapest cost from s to t and the ordered
+        list of stations on that route.
+
+        The mode picks the search: "full" builds the whole shortest
+        path tree, "early_exit" stops once t is settled and
+        "bidirectional" searches from both ends. The alt, ch and
+        matrix backends always answer with their own lookup.
+        """
+
+        if mode not in self.modes:
+            raise ValueError(f"Unknown mode: {mode}")
+
+        # A cached tree answers any query from its origin directly.
+        self.graph_store.refresh()
+        self.tree_cache.check_version(self.graph_store.version)
+        if self.backend in ("dict", "csr") and (
+            mode == "full" or s in self.tree_cache
+        ):
+            distances, predecessors = self.get_shortest_tree(s)
+            return distances.get(t, float('inf')), get_path(
+                predecessors, s, t
+            )
+
+        if self.backend == "csr":
+            csr = self.graph_store.get_csr()
+            if t not in csr.index:
+                return float('inf'), []
+            source, target = csr.index[s], csr.index[t]
+
+            if mode == "bidirectional":
+                cost, path = bidirectional_dijkstra(
+                    csr.neighbours, source, target
+                )
+            else:
+                distances, predecessors = csr_dijkstra(
+                    csr, source, target if mode == "early_exit" else None
+                )
+                cost = distances[target]
+                path = get_csr_path(predecessors, source, target)
+            return cost, [csr.names[i] for i in path]
+
+        g = self.graph_store.get()
+        if s not in g:
+            raise KeyError(s)
+        if t not in g:
+            return float('inf'), []
+
+        if self.backend == "alt":
+            return alt_search(g, self.get_landmarks(), s, t)
+
+        if self.backend == "ch":
+            return self.get_hierarchy().query(s, t)
+
+        if self.backend == "matrix":
+            return self.get_fare_matrix().query(s, t)
+
+        if mode == "bidirectional":
+            return bidirectional_dijkstra(
+                lambda node: g[node].items(), s, t
+            )
+
+        distances, predecessors = dijkstra(
+            g, s, t if mode == "early_exit" else None
         )
+        path = get_path(predecessors, s, t)
+        return distances.get(t, float('inf')), path
 
-        distances = {node: float('inf') for node in g}
-        distances[s] = 0
-        visited = set()
+    def get_alternative_routes(
+        self, s: str, t: str, k: int = 3
+    ) -> typing.List[typing.Tuple[float, list]]:
+        """
+        Return up to k cheapest loopless routes from s to t as
+        (cost, stations) pairs, cheapest first.
+        """
+
+        return yen_k_shortest_paths(self.graph_store.get(), s, t, k)
 
-        while len(visited) < len(g):
+    def get_pareto_routes(
+        self, s: str, t: str, max_hops: int = None
+    ) -> typing.List[typing.Tuple[int, int, list]]:
+        """
+        Return the Pareto front of (cost, hops, stations) routes
+        from s to t with at most max_hops legs, cheapest first.
+        The first entry is the cheapest route within the budget.
+        """
 
-            min_distance = float('inf')
-            min_node = None
+        return pareto_search(self.graph_store.get(), s, t, max_hops)
 
-            for node in g:
-                if node not in visited and distances[node] < min_distance:
-                    min_distance = distances[node]
-                    min_node = node
+    def get_routes(
+        self, pairs: typing.Iterable[tuple], processes: int = None
+    ) -> typing.Iterator[tuple]:
+        """
+        Answer many (origin, destination) queries at once, yielding
+        (origin, destination, cost, path) tuples as they complete.
 
-            if min_node is None:
-                break
+        Pairs are grouped by origin so each shortest path tree is built
+        only once, and distinct origins are spread across a process
+        pool. Results stream back grouped by origin, not in input
+        order; unknown stations yield (inf, []).
+        """
 
-            visited.add(min_node)
+        csr = self.graph_store.get_csr()
+        jobs = {}
+        for s, t in pairs:
+            source = csr.index.get(s)
+            target = csr.index.get(t)
+            if source is None or target is None:
+                yield s, t, float('inf'), []
+                continue
+            jobs.setdefault(source, []).append(target)
 
-            # For all unvisited neighbour nodes
-            for next_node, weight in g[min_node].items():
-                distance = distances[min_node] + weight
+        if processes is None:
+            processes = min(len(jobs), multiprocessing.cpu_count())
 
-                if distance < distances[next_node]:
-                    distances[next_node] = distance
+        if processes <= 1:
+            _init_csr_worker(csr)
+            results = map(_get_batch_routes, jobs.items())
+            pool = None
+        else:
+            pool = multiprocessing.Pool(
+                processes, initializer=_init_csr_worker, initargs=(csr,)
+            )
+            results = pool.imap_unordered(_get_batch_routes, jobs.items())
 
-        return distances
+        try:
+            names = csr.names
+            for source, routes in results:
+                for target, cost, path in routes:
+                    yield (
+                        names[source], names[target], cost,
+                        [names[i] for i in path]
+                    )
+        finally:
+            if pool is not None:
+                pool.terminate()
 
     def set_route(self, file_name: str, binded_data: tuple, new_data: tuple):
         """
@@ -118,6 +2350,14 @@ class CheapestTrainTickets:
         if len(new_data) != 3:
             return
 
+        # Appending to the resident network merges the new edges
+        # in place rather than forcing a full reload.
+        if os.path.abspath(file_name) == os.path.abspath(
+            self.graph_store.file_name
+        ):
+            self.graph_store.append_rows([binded_data, new_data])
+            return
+
         with open(file_name, 'a', newline='', encoding='utf-8') as csvfile:
             csvfile.write(
                 f"\n{binded_data[0]},{binded_data[1]},{binded_data[2]}"
@@ -128,36 +2368,32 @@ class CheapestTrainTickets:
             )
             csvfile.close()
 
-    def get_route(self, s, t):
+    def get_route(self, s, t, mode: str = "early_exit"):
         """
         Input two station names for departure and destination
         to return all stations for that particular route,
         if available.
+
+        See get_shortest_path for the available search modes.
         """
 
-        dist = {}
         start_time = time.time()
-        shortest_dist = self.get_shortest_distance(s)
+        _, path = self.get_shortest_path(s, t, mode)
         end_time = time.time()
-        for next_node in shortest_dist:
-            dist[next_node] = shortest_dist[next_node]
-            if isinstance(shortest_dist[next_node], float):
-                break
-
-            if next_node == t:
-                break
 
-        updated_dist = {}
-        s_idx = list(dist.keys()).index(s)
-        for i, (k, v) in enumerate(dist.items()):
-            if i >= s_idx:
-                updated_dist[k] = v
+        # The route maps each station on the path, in order,
+        # to the cumulative cost of reaching it from s.
+        g = self.graph_store.get()
+        dist = {}
+        cost = 0
+        for i, station in enumerate(path):
+            if i > 0:
+                cost += g[path[i - 1]][station]
+            dist[station] = cost
 
-        idx = 0
         print("\nIndex | Station | Cost")
-        for k, v in updated_dist.items():
+        for idx, (k, v) in enumerate(dist.items()):
             print(idx, k, v)
-            idx += 1
 
         return dist, start_time, end_time
 
@@ -189,8 +2425,7 @@ if __name__ == '__main__':
                 new_weight = int(new_station[2])
 
                 ctt.set_route(
-                    ctt.task_directory +
-                    "task1_4_railway_network.csv",
+                    ctt.graph_store.file_name,
                     (bind_source, bind_target, bind_weight),
                     (new_source, new_target, new_weight)
                 )
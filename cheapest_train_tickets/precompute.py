@@ -0,0 +1,41 @@
+"""
+Precompute the all-pairs fare matrix of the railway network.
+
+Usage: python cheapest_train_tickets/precompute.py [network.csv]
+       [matrix.bin] [processes]
+
+Writes the V x V fare and next-hop matrices that the "matrix" backend
+of CheapestTrainTickets memory-maps to answer queries without search.
+"""
+
+import os
+import sys
+import time
+
+from main import CheapestTrainTickets, FareMatrix
+
+
+DEFAULT_NETWORK = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "tasks", "Task 1_4", "task1_4_railway_network.csv"
+)
+
+
+if __name__ == "__main__":
+    network = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NETWORK
+    ctt = CheapestTrainTickets(network, "matrix")
+    if len(sys.argv) > 2:
+        ctt.matrix_file = sys.argv[2]
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    start_time = time.time()
+    csr = ctt.graph_store.get_csr()
+    FareMatrix.precompute(
+        csr, ctt.matrix_file, ctt.graph_store.signature, processes
+    )
+    end_time = time.time()
+
+    print(
+        f"[RESULT] Wrote {len(csr)} x {len(csr)} fare matrix to "
+        f"{ctt.matrix_file} in {round(end_time - start_time, 3)} seconds."
+    )
@@ -0,0 +1,222 @@
+"""
+Asynchronous HTTP/JSON fare query service.
+
+Usage: python cheapest_train_tickets/server.py [--network CSV]
+       [--backend BACKEND] [--host HOST] [--port PORT] [--workers N]
+
+Answers GET /route?from=<station>&to=<station> with the cheapest cost
+and the stations on the route. The event loop only parses requests;
+every search runs in a process pool whose workers each load the graph
+once, so a slow query never blocks other connections.
+
+The backend is prepared once in the server process before the pool
+starts: the snapshot, landmark tables, hierarchy or fare matrix are
+written next to the network, and every worker then only loads them.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import typing
+
+from urllib.parse import parse_qs, urlsplit
+
+from main import CheapestTrainTickets
+
+
+DEFAULT_NETWORK = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "tasks", "Task 1_4", "task1_4_railway_network.csv"
+)
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+_worker_ctt = None
+
+
+def _init_worker(file_name: str, backend: str):
+    """
+    Load the graph and the files prepared by the server once in each
+    pool worker.
+    """
+
+    global _worker_ctt
+    _worker_ctt = CheapestTrainTickets(file_name, backend)
+    _worker_ctt.prepare()
+
+
+def _find_route(s: str, t: str) -> typing.Tuple[float, list]:
+    """
+    Run one fare query in a pool worker.
+    """
+
+    return _worker_ctt.get_shortest_path(s, t)
+
+
+class FareServer:
+    """
+    Serve fare queries over HTTP/1.1 with keep-alive connections.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        backend: str = "dict",
+        workers: int = None
+    ):
+        self.file_name = file_name
+        self.backend = backend
+        self.workers = workers or multiprocessing.cpu_count()
+        self.executor = None
+
+        # The stations of the prepared network, see prepare.
+        self.stations = None
+
+    def prepare(self):
+        """
+        Prepare the backend's files and keep the station names, so
+        unknown stations are rejected without a round trip to a worker.
+        """
+
+        ctt = CheapestTrainTickets(self.file_name, self.backend)
+        ctt.prepare()
+        self.stations = frozenset(ctt.graph_store.get())
+
+    async def handle_request(
+        self, method: str, target: str
+    ) -> typing.Tuple[int, dict]:
+        """
+        Return the status code and JSON body of one request.
+        """
+
+        url = urlsplit(target)
+        if url.path != "/route":
+            return 404, {"error": f"Unknown path: {url.path}"}
+        if method != "GET":
+            return 405, {"error": f"Unsupported method: {method}"}
+
+        query = parse_qs(url.query)
+        if "from" not in query or "to" not in query:
+            return 400, {"error": "Both 'from' and 'to' are required."}
+        s, t = query["from"][0], query["to"][0]
+        for station in (s, t):
+            if station not in self.stations:
+                return 404, {"error": f"Unknown station: {station}"}
+
+        loop = asyncio.get_running_loop()
+        cost, path = await loop.run_in_executor(
+            self.executor, _find_route, s, t
+        )
+        if not path:
+            return 404, {"error": f"No route from {s} to {t}"}
+        return 200, {"from": s, "to": t, "cost": cost, "route": path}
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """
+        Serve requests on one connection until the client closes it.
+        """
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, body = 400, {"error": "Malformed request line."}
+                    version = "HTTP/1.0"
+                else:
+                    method, target, version = parts
+                    try:
+                        status, body = await self.handle_request(
+                            method, target
+                        )
+                    except Exception as e:
+                        status, body = 500, {"error": str(e)}
+
+                keep_alive = version == "HTTP/1.1" and \
+                    headers.get("connection", "").lower() != "close"
+                connection = "keep-alive" if keep_alive else "close"
+                payload = json.dumps(body).encode('utf-8')
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        f"Connection: {connection}\r\n\r\n"
+                    ).encode('latin-1') + payload
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080):
+        """
+        Prepare the backend, then start the worker pool and serve
+        until cancelled.
+        """
+
+        # Preparing here, before any worker exists, means workers
+        # never race to build or write the same files.
+        print(f"[SERVER] Preparing the {self.backend} backend...")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.prepare)
+
+        with concurrent.futures.ProcessPoolExecutor(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(self.file_name, self.backend)
+        ) as self.executor:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            print(
+                f"[SERVER] Serving fares on http://{host}:{port}/route "
+                f"with {self.workers} workers."
+            )
+            async with server:
+                await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--network", default=DEFAULT_NETWORK)
+    parser.add_argument(
+        "--backend", default="dict", choices=CheapestTrainTickets.backends
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(
+            FareServer(args.network, args.backend, args.workers).serve(
+                args.host, args.port
+            )
+        )
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,818 @@
+"""
+Tests for the routing backends and repairs in main.py, each checked
+against plain dijkstra on small seeded networks.
+
+Run with: python test.py
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import random
+import tempfile
+import unittest
+
+from unittest import mock
+from main import (
+    alt_search,
+    CheapestTrainTickets,
+    ContractionHierarchy,
+    CSRGraph,
+    dijkstra,
+    FareMatrix,
+    get_file_checksum,
+    get_graph,
+    Landmarks,
+    load_snapshot,
+    pareto_search,
+    read_snapshot,
+    repair_tree_decrease,
+    repair_tree_increase,
+    restricted_dijkstra,
+    ShortestPathTreeCache,
+    yen_k_shortest_paths
+)
+from load_generator import run_client
+from server import _init_worker, FareServer
+
+
+def generate_edges(stations: int, edges: int, seed: int) -> list:
+    """
+    Return (source, target, weight) rows of a random network with a
+    spanning chain, extra random edges and one unreachable pair.
+    """
+
+    rng = random.Random(seed)
+    names = [f"S{i}" for i in range(stations)]
+    rows = [
+        (names[i], names[i + 1], rng.randint(1, 20))
+        for i in range(stations - 1)
+    ]
+    for _ in range(edges):
+        source, target = rng.sample(names, 2)
+        rows.append((source, target, rng.randint(1, 20)))
+    rows.append(("X1", "X2", 4))
+    return rows
+
+
+def write_network(file_name: str, rows: list):
+    with open(file_name, 'w', newline='', encoding='utf-8') as csvfile:
+        csvfile.write("\n".join(f"{s},{t},{w}" for s, t, w in rows))
+
+
+def get_path_cost(graph: dict, path: list) -> float:
+    """
+    Return the cost of walking path, or None if a leg is missing.
+    """
+
+    cost = 0
+    for source, target in zip(path, path[1:]):
+        if target not in graph[source]:
+            return None
+        cost += graph[source][target]
+    return cost
+
+
+def get_simple_paths(graph: dict, s: str, t: str) -> list:
+    """
+    Return (cost, path) for every loopless route from s to t.
+    """
+
+    paths = []
+    stack = [(s, [s], 0)]
+    while stack:
+        node, path, cost = stack.pop()
+        if node == t:
+            paths.append((cost, path))
+            continue
+        for next_node, weight in graph[node].items():
+            if next_node not in path:
+                stack.append((next_node, path + [next_node], cost + weight))
+    return paths
+
+
+class RoutingTestCase(unittest.TestCase):
+
+    stations = 30
+    edges = 40
+    seed = 7
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.directory.name, "network.csv")
+        write_network(
+            self.file_name,
+            generate_edges(self.stations, self.edges, self.seed)
+        )
+        self.graph = get_graph(self.file_name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertRoute(self, graph: dict, s: str, t: str, cost, path: list):
+        """
+        Check a route against dijkstra: the cheapest cost, and a
+        path from s to t along existing edges that costs exactly that.
+        """
+
+        distances, _ = dijkstra(graph, s)
+        expected = distances.get(t, float('inf'))
+        self.assertEqual(cost, expected, (s, t))
+        if expected == float('inf'):
+            self.assertEqual(path, [], (s, t))
+            return
+        self.assertEqual((path[0], path[-1]), (s, t))
+        self.assertEqual(get_path_cost(graph, path), expected, (s, t))
+
+    def get_pairs(self, count: int = 60) -> list:
+        rng = random.Random(self.seed)
+        names = sorted(self.graph)
+        pairs = [("S0", "X1"), ("S3", "S3")]
+        pairs += [tuple(rng.sample(names, 2)) for _ in range(count)]
+        return pairs
+
+    def assertBackend(
+        self, backend: str, modes: tuple = ("early_exit",)
+    ):
+        """
+        Check a backend's routes between the test pairs in each mode,
+        both on the CSV network and after edges are changed in memory.
+        """
+
+        ctt = CheapestTrainTickets(self.file_name, backend)
+        ctt.tree_cache.max_entries = 0
+        try:
+            for mode in modes:
+                for s, t in self.get_pairs():
+                    with self.subTest(backend=backend, mode=mode):
+                        cost, path = ctt.get_shortest_path(s, t, mode)
+                        self.assertRoute(self.graph, s, t, cost, path)
+
+            ctt.graph_store.add_edge("S0", "S29", 1)
+            ctt.graph_store.remove_edge("S1", "S2")
+            graph = ctt.graph_store.get()
+            for mode in modes:
+                for s, t in self.get_pairs(20):
+                    with self.subTest(backend=backend, mode=mode):
+                        cost, path = ctt.get_shortest_path(s, t, mode)
+                        self.assertRoute(graph, s, t, cost, path)
+        finally:
+            self.close_backend(ctt)
+
+    @staticmethod
+    def close_backend(ctt: CheapestTrainTickets):
+        """
+        Release the memory maps a backend holds in the test directory,
+        which could not be removed while mapped on Windows.
+        """
+
+        if ctt.fare_matrix is not None:
+            ctt.fare_matrix.close()
+        if ctt.graph_store.csr is not None:
+            ctt.graph_store.csr.close()
+
+
+class TestGraphStore(RoutingTestCase):
+
+    def test_set_route_merges_rows(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        store = ctt.graph_store
+        graph = store.get()
+        version, file_version = store.version, store.file_version
+
+        with mock.patch("main.get_graph") as parse:
+            ctt.set_route(
+                self.file_name, ("S0", "S29", 1), ("S29", "Y0", 4)
+            )
+            self.assertIs(store.get(), graph)
+        parse.assert_not_called()
+
+        self.assertEqual(store.signature, store.get_signature())
+        self.assertGreater(store.version, version)
+        self.assertGreater(store.file_version, file_version)
+        self.assertEqual(store.file_version, store.version)
+        self.assertTrue(store.is_saved())
+        self.assertEqual(graph, get_graph(self.file_name))
+        self.assertEqual(graph["S0"]["S29"], 1)
+        self.assertEqual(graph["Y0"], {"S29": 4})
+
+
+class TestCSRBackend(RoutingTestCase):
+
+    def test_round_trip(self):
+        csr = CSRGraph.from_graph(self.graph)
+        self.assertEqual(csr.to_graph(), self.graph)
+
+    def test_csr_backend(self):
+        self.assertBackend("csr", ("full",))
+
+
+class TestPointToPoint(RoutingTestCase):
+
+    def test_dict_modes(self):
+        self.assertBackend("dict", CheapestTrainTickets.modes)
+
+    def test_csr_modes(self):
+        self.assertBackend("csr", CheapestTrainTickets.modes)
+
+
+class TestALTBackend(RoutingTestCase):
+
+    def test_alt_backend(self):
+        self.assertBackend("alt")
+
+    def test_landmark_strategies(self):
+        for strategy in Landmarks.strategies + (["S0", "S15", "X1"],):
+            landmarks = Landmarks.from_graph(self.graph, 3, strategy)
+            for s, t in self.get_pairs():
+                with self.subTest(strategy=strategy):
+                    cost, path = alt_search(self.graph, landmarks, s, t)
+                    self.assertRoute(self.graph, s, t, cost, path)
+
+                    # The heuristic never overestimates.
+                    heuristic = landmarks.get_heuristic(t)
+                    distances, _ = dijkstra(self.graph, t)
+                    for node, distance in distances.items():
+                        self.assertLessEqual(heuristic(node), distance)
+
+    def test_landmark_file(self):
+        ctt = CheapestTrainTickets(self.file_name, "alt")
+        self.assertEqual(
+            ctt.landmark_file,
+            os.path.join(self.directory.name, "network_landmarks.json")
+        )
+        saved = ctt.get_landmarks()
+        self.assertTrue(os.path.exists(ctt.landmark_file))
+        self.assertFalse([
+            file_name for file_name in os.listdir(self.directory.name)
+            if file_name.endswith(".tmp")
+        ])
+
+        ctt = CheapestTrainTickets(self.file_name, "alt")
+        with mock.patch.object(Landmarks, "from_graph") as build:
+            loaded = ctt.get_landmarks()
+        build.assert_not_called()
+        self.assertEqual(loaded.landmarks, saved.landmarks)
+        self.assertEqual(loaded.distances, saved.distances)
+
+        # A truncated file is recomputed and rewritten.
+        size = os.path.getsize(ctt.landmark_file)
+        with open(ctt.landmark_file, "r+b") as file:
+            file.truncate(size // 2)
+        loaded = CheapestTrainTickets(self.file_name, "alt").get_landmarks()
+        self.assertEqual(loaded.distances, saved.distances)
+        self.assertEqual(os.path.getsize(ctt.landmark_file), size)
+
+
+class TestContractionHierarchy(RoutingTestCase):
+
+    def test_ch_backend(self):
+        self.assertBackend("ch")
+
+    def test_unpack_shortcuts(self):
+        hierarchy = ContractionHierarchy.from_graph(self.graph)
+        shortcuts = 0
+        for lower, edges in enumerate(hierarchy.upward):
+            for higher, (weight, middle) in edges.items():
+                shortcuts += middle != -1
+                path = [
+                    hierarchy.names[i]
+                    for i in hierarchy.unpack(lower, higher)
+                ]
+                self.assertEqual(
+                    (path[0], path[-1]),
+                    (hierarchy.names[lower], hierarchy.names[higher])
+                )
+                self.assertEqual(get_path_cost(self.graph, path), weight)
+        self.assertGreater(shortcuts, 0)
+
+    def test_hierarchy_file(self):
+        hierarchy_file = os.path.join(self.directory.name, "h.json")
+        ContractionHierarchy.from_graph(self.graph).save(hierarchy_file)
+        hierarchy = ContractionHierarchy.load(hierarchy_file)
+        for s, t in self.get_pairs():
+            cost, path = hierarchy.query(s, t)
+            self.assertRoute(self.graph, s, t, cost, path)
+
+    def test_default_hierarchy_file(self):
+        ctt = CheapestTrainTickets(self.file_name, "ch")
+        self.assertEqual(
+            ctt.hierarchy_file,
+            os.path.join(self.directory.name, "network_hierarchy.json")
+        )
+        ctt.get_hierarchy()
+        size = os.path.getsize(ctt.hierarchy_file)
+
+        ctt = CheapestTrainTickets(self.file_name, "ch")
+        with mock.patch.object(ContractionHierarchy, "from_graph") as build:
+            ctt.get_hierarchy()
+        build.assert_not_called()
+
+        # A truncated file is rebuilt and rewritten.
+        with open(ctt.hierarchy_file, "r+b") as file:
+            file.truncate(size // 2)
+        ctt = CheapestTrainTickets(self.file_name, "ch")
+        for s, t in self.get_pairs(10):
+            cost, path = ctt.get_shortest_path(s, t)
+            self.assertRoute(self.graph, s, t, cost, path)
+        self.assertEqual(os.path.getsize(ctt.hierarchy_file), size)
+
+
+class TestFareMatrix(RoutingTestCase):
+
+    def test_matrix_backend(self):
+        self.assertBackend("matrix")
+
+    def test_next_hops(self):
+        matrix_file = os.path.join(self.directory.name, "fares.bin")
+        FareMatrix.precompute(
+            CSRGraph.from_graph(self.graph), matrix_file, processes=2
+        )
+        fare_matrix = FareMatrix(matrix_file)
+        try:
+            for s in self.graph:
+                for t in self.graph:
+                    cost, path = fare_matrix.query(s, t)
+                    self.assertRoute(self.graph, s, t, cost, path)
+        finally:
+            fare_matrix.close()
+
+    def test_temporary_matrix_after_edge_change(self):
+        ctt = CheapestTrainTickets(self.file_name, "matrix")
+        ctt.prepare()
+        ctt.graph_store.add_edge("S0", "S29", 1)
+        fare_matrix = ctt.get_fare_matrix()
+        self.assertTrue(fare_matrix.temporary)
+        self.assertEqual(fare_matrix.query("S0", "S29"), (1, ["S0", "S29"]))
+        fare_matrix.close()
+        self.assertFalse(os.path.exists(fare_matrix.file_name))
+
+        # The matrix of the CSV itself is left as it was.
+        saved = FareMatrix(ctt.matrix_file)
+        try:
+            self.assertEqual(
+                saved.query("S0", "S29")[0],
+                dijkstra(self.graph, "S0")[0]["S29"]
+            )
+        finally:
+            saved.close()
+
+    def test_damaged_matrix_is_rebuilt(self):
+        ctt = CheapestTrainTickets(self.file_name, "matrix")
+        ctt.prepare()
+        ctt.fare_matrix.close()
+        size = os.path.getsize(ctt.matrix_file)
+
+        for damage in ("truncate", "magic", "empty"):
+            with open(ctt.matrix_file, "r+b") as file:
+                if damage == "truncate":
+                    file.truncate(size - 4)
+                elif damage == "magic":
+                    file.write(b"XXXX")
+                else:
+                    file.truncate(0)
+            with self.assertRaises(ValueError):
+                FareMatrix(ctt.matrix_file)
+
+            ctt.fare_matrix = None
+            fare_matrix = ctt.get_fare_matrix()
+            self.assertEqual(os.path.getsize(ctt.matrix_file), size)
+            for s, t in self.get_pairs(10):
+                cost, path = fare_matrix.query(s, t)
+                self.assertRoute(self.graph, s, t, cost, path)
+            fare_matrix.close()
+
+
+class TestBatchRoutes(RoutingTestCase):
+
+    def test_get_routes(self):
+        pairs = self.get_pairs() + [("S0", "Nowhere"), ("Nowhere", "S0")]
+        for processes in (1, 2):
+            ctt = CheapestTrainTickets(self.file_name)
+            self.addCleanup(self.close_backend, ctt)
+            routes = list(ctt.get_routes(pairs, processes))
+            self.assertEqual(
+                sorted((s, t) for s, t, _, _ in routes), sorted(pairs)
+            )
+            for s, t, cost, path in routes:
+                with self.subTest(processes=processes, s=s, t=t):
+                    if "Nowhere" in (s, t):
+                        self.assertEqual((cost, path), (float('inf'), []))
+                    else:
+                        self.assertRoute(self.graph, s, t, cost, path)
+
+    def test_get_routes_after_edge_change(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        ctt.graph_store.add_edge("S0", "X1", 2)
+        routes = list(ctt.get_routes([("S0", "X2"), ("S5", "X1")], 1))
+        graph = ctt.graph_store.get()
+        for s, t, cost, path in routes:
+            self.assertRoute(graph, s, t, cost, path)
+
+
+class TestTreeCache(RoutingTestCase):
+
+    def test_lru_eviction(self):
+        cache = ShortestPathTreeCache(max_entries=2)
+        for origin in ("S0", "S1"):
+            cache.put(origin, dijkstra(self.graph, origin))
+        self.assertIsNotNone(cache.get("S0"))
+        cache.put("S2", dijkstra(self.graph, "S2"))
+
+        # S1 was the least recently used.
+        self.assertNotIn("S1", cache)
+        self.assertIn("S0", cache)
+        self.assertIn("S2", cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_byte_limit(self):
+        tree = dijkstra(self.graph, "S0")
+        size = ShortestPathTreeCache.get_tree_size(tree)
+        cache = ShortestPathTreeCache(max_bytes=2 * size)
+        for origin in ("S0", "S1", "S2", "S3"):
+            cache.put(origin, dijkstra(self.graph, origin))
+            self.assertLessEqual(cache.total_bytes, 2 * size)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 2)
+        self.assertEqual(
+            cache.total_bytes,
+            sum(cache.get_tree_size(tree) for tree in cache.trees.values())
+        )
+
+        # A single tree over the limit is still kept.
+        cache = ShortestPathTreeCache(max_bytes=1)
+        cache.put("S0", tree)
+        self.assertEqual(len(cache), 1)
+
+    def test_hits_and_misses(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        for s, t in (("S0", "S5"), ("S0", "S9"), ("S1", "S5")):
+            cost, path = ctt.get_shortest_path(s, t, "full")
+            self.assertRoute(self.graph, s, t, cost, path)
+        stats = ctt.tree_cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertEqual(stats["entries"], 2)
+
+    def test_version_change_empties_cache(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        ctt.get_shortest_tree("S0")
+        write_network(self.file_name, [("S0", "S1", 3)])
+        os.utime(self.file_name, ns=(0, 0))
+        self.assertEqual(ctt.get_shortest_path("S0", "S1"), (3, ["S0", "S1"]))
+        self.assertNotIn("S0", ctt.tree_cache)
+
+    def test_disabled_cache(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        ctt.tree_cache.max_entries = 0
+        cost, path = ctt.get_shortest_path("S0", "S5", "full")
+        self.assertRoute(self.graph, "S0", "S5", cost, path)
+        self.assertEqual(len(ctt.tree_cache), 0)
+
+
+class TestTreeRepair(RoutingTestCase):
+
+    def assertTree(self, graph: dict, s: str, tree: tuple):
+        """
+        Check a repaired tree against a fresh dijkstra tree: the same
+        distances, and every predecessor on a cheapest route.
+        """
+
+        distances, predecessors = tree
+        expected, _ = dijkstra(graph, s)
+        self.assertEqual(distances, expected)
+        self.assertEqual(set(predecessors), set(expected))
+        for node, parent in predecessors.items():
+            if parent is None:
+                self.assertEqual(node, s)
+            else:
+                self.assertEqual(
+                    distances[node],
+                    distances[parent] + graph[parent][node]
+                )
+
+    def get_changes(self, count: int = 40) -> list:
+        rng = random.Random(self.seed)
+        edges = sorted(
+            (s, t) for s in self.graph for t in self.graph[s] if s < t
+        )
+        return [rng.choice(edges) for _ in range(count)]
+
+    def test_repair_tree_decrease(self):
+        rng = random.Random(self.seed)
+        names = sorted(self.graph)
+        for s in ("S0", "S15"):
+            tree = dijkstra(self.graph, s)
+            for _ in range(40):
+                u, v = rng.sample(names, 2)
+                weight = rng.randint(1, 10)
+                if weight >= self.graph[u].get(v, float('inf')):
+                    continue
+                self.graph[u][v] = self.graph[v][u] = weight
+                repair_tree_decrease(self.graph, tree, u, v)
+                self.assertTree(self.graph, s, tree)
+
+    def test_repair_tree_increase(self):
+        rng = random.Random(self.seed)
+        for s in ("S0", "S15"):
+            tree = dijkstra(self.graph, s)
+            for u, v in self.get_changes():
+                if v not in self.graph[u]:
+                    continue
+                if rng.random() < 0.5:
+                    del self.graph[u][v], self.graph[v][u]
+                else:
+                    weight = self.graph[u][v] + rng.randint(1, 10)
+                    self.graph[u][v] = self.graph[v][u] = weight
+                repair_tree_increase(self.graph, tree, u, v)
+                self.assertTree(self.graph, s, tree)
+
+    def test_cached_trees_follow_edge_changes(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        origins = ("S0", "S10", "S20")
+        for s in origins:
+            ctt.get_shortest_tree(s)
+
+        rng = random.Random(self.seed)
+        for u, v in self.get_changes(20):
+            if rng.random() < 0.5:
+                ctt.graph_store.remove_edge(u, v)
+            else:
+                ctt.graph_store.add_edge(u, v, rng.randint(1, 20))
+
+        graph = ctt.graph_store.get()
+        for s in origins:
+            self.assertIn(s, ctt.tree_cache)
+            self.assertTree(graph, s, ctt.get_shortest_tree(s))
+
+    def test_remove_self_loop(self):
+        rows = generate_edges(self.stations, self.edges, self.seed)
+        write_network(self.file_name, rows + [("S5", "S5", 3)])
+        ctt = CheapestTrainTickets(self.file_name)
+        ctt.get_shortest_tree("S0")
+
+        self.assertEqual(ctt.graph_store.remove_edge("S5", "S5"), 3)
+        graph = ctt.graph_store.get()
+        self.assertNotIn("S5", graph["S5"])
+        self.assertEqual(graph, self.graph)
+        self.assertTree(graph, "S0", ctt.get_shortest_tree("S0"))
+
+
+class TestAlternativeRoutes(RoutingTestCase):
+
+    stations = 9
+    edges = 8
+
+    def test_yen_matches_every_simple_path(self):
+        for s, t in self.get_pairs(10):
+            if s == t or t.startswith("X"):
+                continue
+            expected = sorted(
+                cost for cost, _ in get_simple_paths(self.graph, s, t)
+            )
+            routes = yen_k_shortest_paths(self.graph, s, t, 8)
+            self.assertEqual(
+                [cost for cost, _ in routes], expected[:8], (s, t)
+            )
+            self.assertEqual(
+                len({tuple(path) for _, path in routes}), len(routes)
+            )
+            for cost, path in routes:
+                self.assertEqual(len(set(path)), len(path))
+                self.assertEqual(get_path_cost(self.graph, path), cost)
+
+    def test_restricted_search_with_heuristic(self):
+        rng = random.Random(self.seed)
+        names = sorted(self.graph)
+        for s, t in self.get_pairs(30):
+            if s == t or t.startswith("X") or s.startswith("X"):
+                continue
+            to_target, next_hops = dijkstra(self.graph, t)
+            blocked_nodes = set(rng.sample(names, 2)) - {s, t}
+            blocked_edges = {
+                (s, next_node) for next_node in self.graph[s]
+                if rng.random() < 0.5
+            }
+            expected, _ = restricted_dijkstra(
+                self.graph, s, t, blocked_nodes, blocked_edges
+            )
+            cost, path = restricted_dijkstra(
+                self.graph, s, t, blocked_nodes, blocked_edges,
+                to_target, next_hops
+            )
+            self.assertEqual(cost, expected, (s, t))
+            if path:
+                self.assertEqual((path[0], path[-1]), (s, t))
+                self.assertEqual(get_path_cost(self.graph, path), cost)
+                self.assertFalse(blocked_nodes & set(path))
+                self.assertFalse(blocked_edges & set(zip(path, path[1:])))
+
+    def test_yen_skips_cached_spur_searches(self):
+        stats = {}
+        routes = yen_k_shortest_paths(self.graph, "S0", "S8", 8, stats)
+        self.assertGreater(stats["spur_skipped"], 0)
+
+        # Skipping searches must not change the routes found.
+        expected = sorted(
+            cost for cost, _ in get_simple_paths(self.graph, "S0", "S8")
+        )
+        self.assertEqual([cost for cost, _ in routes], expected[:8])
+
+
+class TestSnapshot(RoutingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.snapshot_file = os.path.join(
+            self.directory.name, "network.snapshot"
+        )
+
+    def test_round_trip(self):
+        checksum = get_file_checksum(self.file_name)
+        CSRGraph.from_graph(self.graph).save(self.snapshot_file, checksum)
+        csr = read_snapshot(self.file_name, self.snapshot_file)
+        try:
+            self.assertEqual(csr.checksum, checksum)
+            self.assertEqual(csr.to_graph(), self.graph)
+        finally:
+            csr.close()
+
+    def test_stale_snapshot_is_rebuilt(self):
+        load_snapshot(self.file_name, self.snapshot_file).close()
+        with open(self.file_name, 'a', encoding='utf-8') as csvfile:
+            csvfile.write("\nS0,New,2")
+
+        self.assertIsNone(read_snapshot(self.file_name, self.snapshot_file))
+        csr = load_snapshot(self.file_name, self.snapshot_file)
+        csr.close()
+        csr = read_snapshot(self.file_name, self.snapshot_file)
+        try:
+            self.assertEqual(csr.to_graph(), get_graph(self.file_name))
+        finally:
+            csr.close()
+
+    def test_csr_backend_follows_csv_changes(self):
+        ctt = CheapestTrainTickets(self.file_name, "csr")
+        self.addCleanup(self.close_backend, ctt)
+        ctt.prepare()
+        self.assertTrue(os.path.exists(self.snapshot_file))
+
+        # A second instance maps the snapshot the first one wrote.
+        ctt = CheapestTrainTickets(self.file_name, "csr")
+        self.addCleanup(self.close_backend, ctt)
+        ctt.prepare()
+        mapped = ctt.graph_store.csr
+        self.assertIsNotNone(mapped.buffer)
+
+        with open(self.file_name, 'a', encoding='utf-8') as csvfile:
+            csvfile.write("\nS0,New,2")
+        self.assertEqual(
+            ctt.get_shortest_path("S0", "New"), (2, ["S0", "New"])
+        )
+
+        # The map of the stale snapshot is released, not leaked.
+        self.assertIsNone(mapped.buffer)
+        ctt = CheapestTrainTickets(self.file_name, "csr")
+        self.addCleanup(self.close_backend, ctt)
+        self.assertEqual(
+            ctt.get_shortest_path("S0", "New"), (2, ["S0", "New"])
+        )
+
+    def test_dict_backend_does_not_write_snapshot(self):
+        ctt = CheapestTrainTickets(self.file_name)
+        ctt.prepare()
+        self.assertFalse(os.path.exists(self.snapshot_file))
+
+        # But reads one that is up to date.
+        load_snapshot(self.file_name, self.snapshot_file).close()
+        ctt = CheapestTrainTickets(self.file_name)
+        self.addCleanup(self.close_backend, ctt)
+        self.assertEqual(ctt.graph_store.get(), self.graph)
+        self.assertIsNotNone(ctt.graph_store.csr)
+
+    def test_unwritable_snapshot(self):
+        for backend in ("dict", "csr"):
+            ctt = CheapestTrainTickets(self.file_name, backend)
+            ctt.graph_store.snapshot_file = os.path.join(
+                self.directory.name, "missing", "network.snapshot"
+            )
+            cost, path = ctt.get_shortest_path("S0", "S5")
+            self.assertRoute(self.graph, "S0", "S5", cost, path)
+
+    def test_truncated_snapshot_is_rebuilt(self):
+        load_snapshot(self.file_name, self.snapshot_file).close()
+        with open(self.snapshot_file, 'r+b') as file:
+            file.truncate(os.path.getsize(self.snapshot_file) // 2)
+
+        self.assertIsNone(read_snapshot(self.file_name, self.snapshot_file))
+        ctt = CheapestTrainTickets(self.file_name, "csr")
+        self.addCleanup(self.close_backend, ctt)
+        cost, path = ctt.get_shortest_path("S0", "S5")
+        self.assertRoute(self.graph, "S0", "S5", cost, path)
+
+
+class TestParetoRoutes(RoutingTestCase):
+
+    stations = 9
+    edges = 8
+
+    def test_pareto_matches_every_simple_path(self):
+        for s, t in self.get_pairs(10):
+            if s == t or t.startswith("X"):
+                continue
+            for max_hops in (2, 4, None):
+                labels = {
+                    (cost, len(path) - 1)
+                    for cost, path in get_simple_paths(self.graph, s, t)
+                    if max_hops is None or len(path) - 1 <= max_hops
+                }
+                expected = sorted(
+                    (cost, hops) for cost, hops in labels
+                    if not any(
+                        other != (cost, hops) and
+                        other[0] <= cost and other[1] <= hops
+                        for other in labels
+                    )
+                )
+
+                routes = pareto_search(self.graph, s, t, max_hops)
+                self.assertEqual(
+                    [(cost, hops) for cost, hops, _ in routes],
+                    expected, (s, t, max_hops)
+                )
+                for cost, hops, path in routes:
+                    self.assertEqual(len(path) - 1, hops)
+                    self.assertEqual(get_path_cost(self.graph, path), cost)
+
+    def test_unreachable_within_budget(self):
+        self.assertEqual(pareto_search(self.graph, "S0", "S8", 1), [])
+        self.assertEqual(pareto_search(self.graph, "S0", "X1"), [])
+
+
+class TestFareServer(RoutingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = FareServer(self.file_name)
+        self.server.prepare()
+
+        # Workers in threads share the module's instance, which is
+        # enough to exercise the handler without a process pool.
+        self.server.executor = concurrent.futures.ThreadPoolExecutor(
+            1, initializer=_init_worker, initargs=(self.file_name, "dict")
+        )
+        self.addCleanup(self.server.executor.shutdown)
+
+    def request(self, target: str, method: str = "GET") -> tuple:
+        return asyncio.run(self.server.handle_request(method, target))
+
+    def test_route(self):
+        status, body = self.request("/route?from=S0&to=S9")
+        self.assertEqual(status, 200)
+        self.assertEqual((body["from"], body["to"]), ("S0", "S9"))
+        self.assertRoute(
+            self.graph, "S0", "S9", body["cost"], body["route"]
+        )
+
+    def test_bad_requests(self):
+        self.assertEqual(self.request("/route?from=S0")[0], 400)
+        self.assertEqual(self.request("/route?from=S0&to=S1", "POST")[0], 405)
+        self.assertEqual(self.request("/fares?from=S0&to=S1")[0], 404)
+
+    def test_unknown_or_unreachable_stations(self):
+        for target, error in (
+            ("/route?from=Nowhere&to=S1", "Unknown station: Nowhere"),
+            ("/route?from=S0&to=Nowhere", "Unknown station: Nowhere"),
+            ("/route?from=S0&to=X1", "No route from S0 to X1"),
+        ):
+            status, body = self.request(target)
+            self.assertEqual(status, 404, target)
+            self.assertEqual(body, {"error": error})
+
+
+class TestLoadGenerator(unittest.TestCase):
+
+    def test_closed_connection(self):
+        async def handle(reader, writer):
+            # Answer the first query, then close mid keep-alive.
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+            await reader.readuntil(b"\r\n\r\n")
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                await run_client(
+                    "127.0.0.1", port, [("S0", "S1")] * 3,
+                    latencies, statuses
+                )
+
+        latencies, statuses = [], {}
+        asyncio.run(run())
+        self.assertEqual(len(latencies), 1)
+        self.assertEqual(statuses, {200: 1, "closed": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,475 @@
+"""
+Benchmarks for the name frequency counting strategies.
+
+Usage: python search_with_parallelism/benchmark.py [text.txt] [names.txt]
+
+Compares:
+- the per-name scan of get_frequency against the Aho-Corasick
+  automaton and, with NumPy, the vectorized search, on corpora of
+  growing size and vocabulary;
+- the chunked data-parallel mode across worker counts;
+- the wall time and peak memory, children included, of the
+  one-Manager-per-name, worker pool and shared-memory designs;
+- the peak memory of loading the text against streaming it;
+- the build time, size and query latency of the suffix array index;
+- each normalisation mode against raw matching;
+- the exact word histogram against the Space-Saving top-k estimate.
+"""
+
+import os
+import sys
+import multiprocessing
+import tempfile
+import time
+import tracemalloc
+import typing
+
+from main import (
+    AhoCorasick,
+    FrequencyCounter,
+    NORMALISATIONS,
+    SuffixArrayIndex,
+    WorkerPool,
+    _get_frequency,
+    _init_frequency_worker,
+    np,
+)
+from memory_sampler import get_peak_rss, MemorySampler
+
+
+TASK_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "tasks", "Task 1_3"
+)
+DEFAULT_TEXT = os.path.join(TASK_DIRECTORY, "task1_3_text.txt")
+DEFAULT_NAMES = os.path.join(TASK_DIRECTORY, "task1_3_names.txt")
+
+
+def time_call(function: typing.Callable) -> typing.Tuple[object, float]:
+    """
+    Return the result of function() and its wall time in seconds.
+    """
+
+    start_time = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start_time
+
+
+def get_scaled_tokens(
+    tokens: typing.List[str], scale: int
+) -> typing.List[str]:
+    """
+    Return the tokens repeated scale times, with every token of the
+    i-th copy tagged "#i", so the vocabulary grows with the corpus
+    as it would over different texts. A name still matches a tagged
+    token exactly when it matches the original.
+    """
+
+    scaled = list(tokens)
+    for copy in range(1, scale):
+        scaled.extend(f"{token}#{copy}" for token in tokens)
+    return scaled
+
+
+def benchmark_matchers(
+    freq_counter: FrequencyCounter, scales: tuple = (1, 4, 16)
+) -> dict:
+    """
+    Time the per-name scan against the Aho-Corasick automaton and the
+    NumPy vectorized search on corpora scale times the size of the
+    text, and with scale times its vocabulary, checking they all
+    agree. The vectorized search is timed with and without building
+    its token array.
+    """
+
+    names = list(freq_counter.get_names())
+    tokens = freq_counter.text_array
+    results = {}
+    for scale in scales:
+        freq_counter.text_array = get_scaled_tokens(tokens, scale)
+        expected, per_name_time = time_call(
+            lambda: {name: freq_counter.get_frequency(name) for name in names}
+        )
+        counts, automaton_time = time_call(
+            lambda: AhoCorasick(names).count_tokens(freq_counter.text_array)
+        )
+        if counts != expected:
+            raise AssertionError(
+                "Aho-Corasick counts differ from get_frequency"
+            )
+
+        results[scale] = {
+            "tokens": len(freq_counter.text_array),
+            "distinct_tokens": len(set(freq_counter.text_array)),
+            "per_name_seconds": per_name_time,
+            "automaton_seconds": automaton_time,
+        }
+
+        if np is not None:
+            freq_counter.token_array = None
+            for key in ("vectorized_seconds", "vectorized_search_seconds"):
+                counts, results[scale][key] = time_call(
+                    lambda: freq_counter.get_frequencies_vectorized(names)
+                )
+                if counts != expected:
+                    raise AssertionError(
+                        "Vectorized counts differ from get_frequency"
+                    )
+
+    freq_counter.text_array = tokens
+    freq_counter.token_array = None
+    return results
+
+
+def benchmark_workers(
+    freq_counter: FrequencyCounter, worker_counts: tuple = None
+) -> dict:
+    """
+    Time the chunked data-parallel mode for each worker count,
+    checking it agrees with the single-process automaton.
+    """
+
+    if worker_counts is None:
+        worker_counts = sorted({1, 2, 4, multiprocessing.cpu_count()})
+
+    names = list(freq_counter.get_names())
+    expected = freq_counter.get_frequencies(names)
+    results = {}
+    for workers in worker_counts:
+        counts, seconds = time_call(
+            lambda: freq_counter.get_frequencies_parallel(names, workers)
+        )
+        if counts != expected:
+            raise AssertionError("Chunked counts differ from get_frequencies")
+        results[workers] = seconds
+    return results
+
+
+def _store_frequency(
+    freq_counter: FrequencyCounter, name: str, manager_dict: dict
+):
+    """
+    Count one name and store it in a Manager dict.
+    """
+
+    manager_dict["result"] = freq_counter.get_frequency(name)
+
+
+def count_with_managers(
+    freq_counter: FrequencyCounter, names: typing.List[str]
+) -> dict:
+    """
+    The original design, kept as a baseline: one process, each with
+    its own Manager server process, per name, every process scanning
+    the whole inherited text.
+    """
+
+    managers = [multiprocessing.Manager() for _ in names]
+    results = [manager.dict() for manager in managers]
+    processes = [
+        multiprocessing.Process(
+            target=_store_frequency, args=(freq_counter, name, result)
+        )
+        for name, result in zip(names, results)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    counts = {name: result["result"] for name, result in zip(names, results)}
+    for manager in managers:
+        manager.shutdown()
+    return counts
+
+
+def count_with_pool(
+    freq_counter: FrequencyCounter, names: typing.List[str]
+) -> dict:
+    """
+    One task per name on a WorkerPool whose workers hold the text.
+    """
+
+    with WorkerPool(
+        initializer=_init_frequency_worker, initargs=(freq_counter, )
+    ) as pool:
+        return dict(zip(names, pool.map(_get_frequency, names)))
+
+
+DESIGNS = {
+    "manager": count_with_managers,
+    "worker_pool": count_with_pool,
+    "shared_memory": lambda freq_counter, names:
+        freq_counter.get_frequencies_shared(names),
+}
+
+
+def _run_design(
+    design: str,
+    text_file: str,
+    names_file: str,
+    queue: multiprocessing.Queue
+):
+    """
+    Load the text and run one design, then report its counts, wall
+    time, the peak RSS of this process and the peak summed PSS of all
+    the worker and Manager processes it started (None without /proc).
+    """
+
+    freq_counter = FrequencyCounter(text_file, names_file)
+    names = list(freq_counter.get_names())
+    sampler = MemorySampler() if os.path.isdir("/proc") else None
+    if sampler is not None:
+        sampler.start()
+    counts, seconds = time_call(lambda: DESIGNS[design](freq_counter, names))
+    queue.put({
+        "counts": counts,
+        "seconds": seconds,
+        "peak_rss_kb": get_peak_rss(),
+        "children_peak_kb": sampler.stop() if sampler is not None else None,
+    })
+
+
+def benchmark_designs(freq_counter: FrequencyCounter) -> dict:
+    """
+    Run each design in a freshly spawned process, so that its peak
+    RSS does not include memory inherited from this one, checking
+    the designs agree. Memory is in kilobytes.
+    """
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for design in DESIGNS:
+        queue = context.Queue()
+        process = context.Process(
+            target=_run_design,
+            args=(
+                design, freq_counter.text_file, freq_counter.names_file, queue
+            )
+        )
+        process.start()
+        results[design] = queue.get()
+        process.join()
+
+    expected = results["manager"]["counts"]
+    for design, result in results.items():
+        if result.pop("counts") != expected:
+            raise AssertionError(f"{design} counts differ from Manager counts")
+    return results
+
+
+def benchmark_streaming(
+    freq_counter: FrequencyCounter, scale: int = 16
+) -> dict:
+    """
+    Time loading and counting a corpus of the text repeated scale
+    times, and measure its peak Python heap memory, when it is loaded
+    whole and when it is streamed in blocks, checking both agree.
+    """
+
+    names = list(freq_counter.get_names())
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        text_file = os.path.join(directory, "corpus.txt")
+        with open(text_file, "w", encoding="utf-8") as file:
+            for _ in range(scale):
+                file.write(freq_counter.text + "\n")
+
+        for streaming in (False, True):
+            counts, seconds = time_call(
+                lambda: FrequencyCounter(
+                    text_file, freq_counter.names_file, streaming
+                ).get_frequencies(names)
+            )
+
+            # Tracing slows allocation down, so memory is measured
+            # separately.
+            tracemalloc.start()
+            FrequencyCounter(
+                text_file, freq_counter.names_file, streaming
+            ).get_frequencies(names)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results["streaming" if streaming else "in_memory"] = {
+                "counts": counts,
+                "seconds": seconds,
+                "peak_bytes": peak,
+            }
+
+    if results["in_memory"].pop("counts") != \
+            results["streaming"].pop("counts"):
+        raise AssertionError("Streaming counts differ from in-memory counts")
+    return results
+
+
+def benchmark_suffix_index(freq_counter: FrequencyCounter) -> dict:
+    """
+    Build, save and reload the suffix array index of the text, then
+    time occurrence counts and token frequencies of every name,
+    checking the frequencies match get_frequencies.
+    """
+
+    names = list(freq_counter.get_names())
+    with tempfile.TemporaryDirectory() as directory:
+        index_file = os.path.join(directory, "text.sa")
+        suffix_index, build_time = time_call(
+            lambda: SuffixArrayIndex.build(freq_counter.text)
+        )
+        suffix_index.save(index_file)
+        _, load_time = time_call(
+            lambda: SuffixArrayIndex.load(index_file, freq_counter.text)
+        )
+        file_size = os.path.getsize(index_file)
+
+    _, count_time = time_call(
+        lambda: [suffix_index.count(name) for name in names]
+    )
+    # The first call also finds the token boundaries.
+    suffix_index.get_frequency(names[0])
+    counts, frequency_time = time_call(
+        lambda: {name: suffix_index.get_frequency(name) for name in names}
+    )
+    if counts != freq_counter.get_frequencies(names):
+        raise AssertionError("Suffix array counts differ from get_frequencies")
+
+    return {
+        "characters": len(freq_counter.text),
+        "build_seconds": build_time,
+        "load_seconds": load_time,
+        "file_bytes": file_size,
+        "count_ms": count_time / len(names) * 1000,
+        "frequency_ms": frequency_time / len(names) * 1000,
+    }
+
+
+def benchmark_normalisations(freq_counter: FrequencyCounter) -> dict:
+    """
+    Time loading the text and counting every name in each
+    normalisation mode, with the normalisation time on its own, and
+    the slowdown of each mode relative to raw matching.
+    """
+
+    names = list(freq_counter.get_names())
+    results = {}
+    for normalisation in NORMALISATIONS:
+        counter, load_time = time_call(
+            lambda: FrequencyCounter(
+                freq_counter.text_file,
+                freq_counter.names_file,
+                normalisation=normalisation
+            )
+        )
+        _, normalise_time = time_call(
+            lambda: counter.normalise(freq_counter.text)
+        )
+        _, count_time = time_call(lambda: counter.get_frequencies(names))
+        results[normalisation] = {
+            "normalise_seconds": normalise_time,
+            "total_seconds": load_time + count_time,
+        }
+
+    for result in results.values():
+        result["slowdown"] = result["total_seconds"] / \
+            results["raw"]["total_seconds"]
+    return results
+
+
+def benchmark_top_words(
+    freq_counter: FrequencyCounter, k: int = 20, capacities: tuple = None
+) -> dict:
+    """
+    Time the exact capitalised word histogram against the streamed
+    Space-Saving top k for several capacities, reporting how many of
+    the true top k each estimate recovers.
+    """
+
+    histogram, exact_time = time_call(
+        lambda: freq_counter.get_histogram(capitalised_only=True)
+    )
+    true_top = {word for word, _ in histogram.most_common(k)}
+    results = {
+        "exact": {
+            "seconds": exact_time,
+            "counters": len(histogram),
+            "recall": 1.0,
+        }
+    }
+    for capacity in capacities or (2 * k, 5 * k, 10 * k):
+        top, seconds = time_call(
+            lambda: freq_counter.get_top_words(k, capacity)
+        )
+        results[f"space_saving_{capacity}"] = {
+            "seconds": seconds,
+            "counters": capacity,
+            "recall": len(true_top & {word for word, _, _ in top}) / k,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    text_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TEXT
+    names_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_NAMES
+    counter = FrequencyCounter(text_file, names_file)
+
+    print(
+        "Tokens | Distinct tokens | Per-name scan (s) | Aho-Corasick (s) | "
+        "NumPy with encoding (s) | NumPy search only (s)"
+    )
+    for result in benchmark_matchers(counter).values():
+        print(
+            result["tokens"],
+            result["distinct_tokens"],
+            round(result["per_name_seconds"], 4),
+            round(result["automaton_seconds"], 4),
+            round(result.get("vectorized_seconds", float('nan')), 4),
+            round(result.get("vectorized_search_seconds", float('nan')), 4)
+        )
+
+    print(
+        f"\nWorkers | Chunked data-parallel (s) "
+        f"({multiprocessing.cpu_count()} cores)"
+    )
+    for workers, seconds in benchmark_workers(counter).items():
+        print(workers, round(seconds, 4))
+
+    print(
+        "\nDesign | Wall time (s) | Peak RSS (KB) | "
+        "Peak PSS of all child processes (KB)"
+    )
+    for design, result in benchmark_designs(counter).items():
+        print(
+            design,
+            round(result["seconds"], 4),
+            result["peak_rss_kb"],
+            result["children_peak_kb"]
+        )
+
+    print("\nMode | Time (s) | Peak heap (MB)")
+    for mode, result in benchmark_streaming(counter).items():
+        print(
+            mode,
+            round(result["seconds"], 4),
+            round(result["peak_bytes"] / 2 ** 20, 2)
+        )
+
+    print("\nSuffix array index")
+    for key, value in benchmark_suffix_index(counter).items():
+        print(key, round(value, 4))
+
+    print("\nNormalisation | Normalise (s) | Load and count (s) | Slowdown")
+    for normalisation, result in benchmark_normalisations(counter).items():
+        print(
+            normalisation,
+            round(result["normalise_seconds"], 4),
+            round(result["total_seconds"], 4),
+            round(result["slowdown"], 2)
+        )
+
+    print("\nTop words | Time (s) | Counters | Recall of top 20")
+    for method, result in benchmark_top_words(counter).items():
+        print(
+            method,
+            round(result["seconds"], 4),
+            result["counters"],
+            round(result["recall"], 2)
+        )
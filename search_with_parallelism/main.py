@@ -17,91 +17,808 @@ For example, the word like “Harry's talk ...” should be counted
 even if “Harry” is not an independent word.
 """
 
+import bisect
+import codecs
+import functools
+import hashlib
+import heapq
+import itertools
+import json
 import os
+import queue
+import re
+import string
+import struct
+import sys
 import multiprocessing
+import tempfile
+import traceback
 import types
 import typing
+import unicodedata
 
+from array import array
+from collections import Counter
 from datetime import datetime
+from multiprocessing import shared_memory
 
+# NumPy is optional; it only powers get_frequencies_vectorized.
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-class Process(multiprocessing.Process):
+
+class TaskError(Exception):
+    """
+    Raised in the caller when a task failed in a pool worker, with
+    the worker's traceback as its message.
+    """
+
+
+def _run_worker(
+    worker_id: int,
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    initializer: types.FunctionType = None,
+    initargs: tuple = ()
+):
+    """
+    Run tasks from the queue until the None sentinel arrives, putting
+    a timed record of every task, or of its failure, on the results.
+    """
+
+    failure = None
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception:
+            failure = traceback.format_exc()
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        task_id, name, target, args = task
+        record = {
+            "task_id": task_id,
+            "name": name,
+            "worker": worker_id,
+            "pid": os.getpid(),
+            "start_time": datetime.now(),
+        }
+        if failure is not None:
+            record["error"] = failure
+        else:
+            try:
+                record["result"] = target(*args)
+            except Exception:
+                record["error"] = traceback.format_exc()
+        record["end_time"] = datetime.now()
+        results.put(record)
+
+
+class WorkerPool:
     """
-    Spawn a single process to run a worker/task on.
+    A fixed number of long-lived worker processes fed from one task
+    queue. The queue is bounded, so submitting blocks once max_pending
+    tasks are waiting (backpressure) instead of buffering an unbounded
+    backlog. Every task is timed, and a task that raises is re-raised
+    in the caller as a TaskError.
+
+    Targets must be picklable, i.e. module-level functions; state
+    that every task needs (such as the text) is set up once per worker
+    by the initializer rather than sent with each task.
     """
 
     def __init__(
         self,
-        process_id: int,
-        name: str,
-        target: types.FunctionType = None,
-        args: tuple = None,
-        verbose: bool = True
+        workers: int = None,
+        max_pending: int = None,
+        initializer: types.FunctionType = None,
+        initargs: tuple = (),
+        verbose: bool = False
     ):
-        super().__init__(name=name, target=target, args=args)
-        self.process_id = process_id + multiprocessing.current_process().pid
-        self.process_state = ""
-        self.name = name
-        self.start_time = datetime.now()
-        self.target = target
-        self.args = args
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = max_pending or 2 * self.workers
+        self.initializer = initializer
+        self.initargs = initargs
         self.verbose = verbose
 
-        self.manager = multiprocessing.Manager().dict({"process_state": ""})
+        self.tasks = None
+        self.results = None
+        self.processes = []
+        self.task_ids = itertools.count()
+        self.pending = 0
+        self.records = []
 
-    def _process_status(self, state: int = None):
-        try:
-            process_id = f"Process ID: {self.process_id}"
-            end_time = datetime.now()
-            elapsed_time = end_time - self.start_time
-            process_end_time = end_time.strftime(
-                '%H:%M:%S'
-            )
-            processed_start_time = self.start_time.strftime(
-                '%H:%M:%S'
+        # Records that arrived while a map waited for its own tasks,
+        # by task ID, and the IDs of abandoned tasks whose records
+        # are dropped on arrival.
+        self.finished = {}
+        self.discarded = set()
+
+    def start(self):
+        """
+        Spawn the worker processes.
+        """
+
+        self.tasks = multiprocessing.Queue(self.max_pending)
+        self.results = multiprocessing.Queue()
+        self.processes = [
+            multiprocessing.Process(
+                target=_run_worker,
+                args=(
+                    worker_id, self.tasks, self.results,
+                    self.initializer, self.initargs
+                ),
+                daemon=True
             )
-            if state == 1:
-                self.process_state = "complete"
-                finished_at = f" @ {process_end_time}."
+            for worker_id in range(self.workers)
+        ]
+        for process in self.processes:
+            process.start()
+            if self.verbose:
+                print(
+                    f"Spawned Process ID: {process.pid} "
+                    f"@ {datetime.now().strftime('%H:%M:%S')}."
+                )
+
+    def check_workers(self):
+        """
+        Raise if a worker died without reporting, e.g. it was killed,
+        since its tasks would otherwise be waited on forever.
+        """
+
+        for process in self.processes:
+            if process.exitcode is not None:
+                raise RuntimeError(
+                    f"Worker PID {process.pid} exited with code "
+                    f"{process.exitcode}."
+                )
+
+    def submit(
+        self, target: types.FunctionType, *args, name: str = None
+    ) -> int:
+        """
+        Queue target(*args) and return its task ID, blocking while the
+        queue is full.
+        """
 
-                if self.verbose:
-                    s1 = f"PID: {self.process_id} {self.process_state}"
-                    s2 = f"{finished_at} [{elapsed_time}] "
-                    s3 = f"[{self.name} | {self.manager['result']}]"
-                    result = s1 + s2 + s3
+        if not self.processes:
+            self.start()
 
-                    return result
-                return f"PID: {self.process_id} {self.process_state}."
+        task_id = next(self.task_ids)
+        task = (task_id, name or target.__name__, target, args)
+        while True:
+            try:
+                self.tasks.put(task, timeout=0.1)
+                break
+            except queue.Full:
+                self.check_workers()
+        self.pending += 1
+        return task_id
 
-            self.process_state = "spawned"
-            process_spawn = self.process_state.capitalize() + " " + process_id
-            at_time = f" @ {processed_start_time}."
+    def receive(self) -> dict:
+        """
+        Wait for the next record from any worker and log it.
+        Records of discarded tasks are dropped.
+        """
 
+        while True:
+            try:
+                record = self.results.get(timeout=0.1)
+            except queue.Empty:
+                self.check_workers()
+                continue
+
+            self.pending -= 1
+            self.records.append(record)
             if self.verbose:
-                return process_spawn + at_time
+                print(self.get_status(record))
+            if record["task_id"] in self.discarded:
+                self.discarded.remove(record["task_id"])
+                continue
+            return record
+
+    @staticmethod
+    def check_record(record: dict) -> dict:
+        """
+        Return the record, raising TaskError if its task failed.
+        """
+
+        if "error" in record:
+            raise TaskError(
+                f"Task {record['name']} failed in worker PID "
+                f"{record['pid']}:\n{record['error']}"
+            )
+        return record
+
+    def get_record(self) -> dict:
+        """
+        Wait for the next finished task and return its record, raising
+        TaskError if it failed.
+        """
 
-            return f"PID: {self.process_id} {self.process_state}."
+        if self.finished:
+            task_id = next(iter(self.finished))
+            return self.check_record(self.finished.pop(task_id))
+        return self.check_record(self.receive())
 
-        except Exception as e:
-            return f"Unable to evaluate Process ID: {self.process_id}, " + \
-                "terminating... " + f"ERROR: {e}."
+    def get_own_record(self, own: typing.Set[int]) -> dict:
+        """
+        Wait for the next finished task among the IDs in own, remove
+        it from own and return its record, raising TaskError if it
+        failed. Records of other tasks are kept for get_record.
+        """
+
+        record = None
+        for task_id in own:
+            if task_id in self.finished:
+                record = self.finished.pop(task_id)
+                break
+
+        while record is None:
+            received = self.receive()
+            if received["task_id"] in own:
+                record = received
+            else:
+                self.finished[received["task_id"]] = received
 
-    def run(self) -> str:
+        own.remove(record["task_id"])
+        return self.check_record(record)
+
+    @staticmethod
+    def get_task_name(item, index: int) -> str:
+        """
+        Name a mapped task after its item if that is a short string,
+        such as a name to count, or else after its position.
         """
-        Execute a task or computation via this process (worker).
+
+        if isinstance(item, str) and len(item) <= 32:
+            return item
+        return f"task {index}"
+
+    def imap_unordered(
+        self, target: types.FunctionType, iterable: typing.Iterable
+    ) -> typing.Iterator:
+        """
+        Yield target(item) for every item as tasks finish. Items are
+        submitted lazily, at most max_pending ahead of the results.
+        Only this call's tasks are yielded, see imap_with_ids.
+        """
+
+        for _, result in self.imap_with_ids(target, iterable):
+            yield result
+
+    def imap_with_ids(
+        self,
+        target: types.FunctionType,
+        iterable: typing.Iterable,
+        task_ids: typing.List[int] = None
+    ) -> typing.Iterator[typing.Tuple[int, object]]:
         """
+        Yield (task ID, target(item)) for every item as tasks finish,
+        appending each task ID to task_ids when given. Only this
+        call's tasks are yielded; if it stops early, e.g. on a
+        TaskError, the results of its remaining tasks are dropped.
+        """
+
+        own = set()
+        try:
+            for index, item in enumerate(iterable):
+                if len(own) >= self.max_pending:
+                    record = self.get_own_record(own)
+                    yield record["task_id"], record["result"]
+                task_id = self.submit(
+                    target, item, name=self.get_task_name(item, index)
+                )
+                own.add(task_id)
+                if task_ids is not None:
+                    task_ids.append(task_id)
+            while own:
+                record = self.get_own_record(own)
+                yield record["task_id"], record["result"]
+        finally:
+            for task_id in own:
+                if self.finished.pop(task_id, None) is None:
+                    self.discarded.add(task_id)
+
+    def map(
+        self, target: types.FunctionType, iterable: typing.Iterable
+    ) -> list:
+        """
+        Return target(item) for every item, in the order of the items.
+        Tasks submitted outside this call are left for get_record.
+        """
+
+        task_ids = []
+        results = {}
+        for task_id, result in self.imap_with_ids(target, iterable, task_ids):
+            results[task_id] = result
+        return [results[task_id] for task_id in task_ids]
+
+    def get_status(self, record: dict) -> str:
+        """
+        Return a line reporting when and where a task finished, how
+        long it took and its result or error.
+        """
+
+        elapsed_time = record["end_time"] - record["start_time"]
+        finished_at = record["end_time"].strftime('%H:%M:%S')
+        state = "failed" if "error" in record else "complete"
+        outcome = "error" if "error" in record else record["result"]
+        if isinstance(outcome, (dict, list)):
+            outcome = f"{type(outcome).__name__} of {len(outcome)}"
+        return f"PID: {record['pid']} {state} @ {finished_at}. " + \
+            f"[{elapsed_time}] [{record['name']} | {outcome}]"
+
+    def get_stats(self) -> dict:
+        """
+        Return the task count and the total and longest task time in
+        seconds of the tasks finished so far.
+        """
+
+        seconds = [
+            (record["end_time"] - record["start_time"]).total_seconds()
+            for record in self.records
+        ]
+        return {
+            "tasks": len(seconds),
+            "failed": sum("error" in record for record in self.records),
+            "total_seconds": sum(seconds),
+            "max_seconds": max(seconds, default=0.0),
+        }
+
+    def close(self):
+        """
+        Let the workers finish their queued tasks, then stop them.
+        Records of tasks whose results were never fetched are kept.
+        """
+
+        if not self.processes:
+            return
+        for _ in self.processes:
+            self.tasks.put(None)
+
+        # A worker cannot exit while its results sit unread in the
+        # pipe, so keep draining until every worker has stopped.
+        while any(process.is_alive() for process in self.processes):
+            try:
+                self.records.append(self.results.get(timeout=0.1))
+                self.pending -= 1
+            except queue.Empty:
+                pass
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def terminate(self):
+        """
+        Stop the workers at once, abandoning any queued tasks.
+        """
+
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton that finds every one of a set of patterns
+    in a string in a single pass over its characters.
+
+    The patterns are stored in a trie; each state has a failure link
+    to the longest proper suffix that is also a trie path, and carries
+    the patterns ending at it or at any state on its failure chain.
+    """
+
+    def __init__(self, patterns: typing.Iterable[str]):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.outputs[state].append(index)
+
+        # Breadth-first, so every failure target is finished first.
+        order = list(self.goto[0].values())
+        for state in order:
+            for char, next_state in self.goto[state].items():
+                order.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + \
+                    self.outputs[self.fail[next_state]]
+
+        self.outputs = [tuple(output) for output in self.outputs]
+
+    def find(self, string: str) -> typing.Set[int]:
+        """
+        Return the indexes of every pattern occurring in the string.
+        """
+
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        found = set(outputs[0])
+        state = 0
+        for char in string:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+    def count_tokens(self, tokens: typing.Iterable[str]) -> typing.Dict:
+        """
+        Count, for every pattern, the tokens that contain it, the same
+        as summing `pattern in token` over the tokens. Repeated tokens
+        are matched once and weighted by how often they occur.
+        """
+
+        counts = [0] * len(self.patterns)
+        for token, frequency in Counter(tokens).items():
+            for index in self.find(token):
+                counts[index] += frequency
+        return dict(zip(self.patterns, counts))
+
+
+# Typographic apostrophes that NFKC leaves alone, so that "Harry’s"
+# and "Harry's" normalise to the same token.
+APOSTROPHES = ("\u2018", "\u2019", "\u201b", "\u02bc")
+
+
+def normalise_nfkc(text: str) -> str:
+    """
+    Return the NFKC form of the text with apostrophes unified.
+    """
+
+    text = unicodedata.normalize("NFKC", text)
+    # A replace per character is much faster than str.translate
+    # on text that is not pure ASCII.
+    for apostrophe in APOSTROPHES:
+        text = text.replace(apostrophe, "'")
+    return text
+
 
-        # self.process_state = ""
-        result = self.target(*self.args)
-        self.manager["end_time"] = datetime.now()
-        self._process_status(1)
-        self.manager["result"] = result
-        self.manager["process_state"] = "complete"
+def normalise_nfkc_casefold(text: str) -> str:
+    """
+    Return the case-folded NFKC form of the text with apostrophes
+    unified, so "HARRY’S" and "harry's" match.
+    """
+
+    return unicodedata.normalize("NFKC", normalise_nfkc(text).casefold())
+
+
+# Matching modes of FrequencyCounter. Text and names are normalised
+# the same way; "raw" matches them exactly as written.
+NORMALISATIONS = {
+    "raw": None,
+    "casefold": str.casefold,
+    "nfkc": normalise_nfkc,
+    "nfkc_casefold": normalise_nfkc_casefold,
+}
+
+
+def stream_tokens(
+    file_name: str,
+    block_size: int = 1 << 20,
+    normalise: typing.Callable[[str], str] = None
+) -> typing.Iterator[typing.List[str]]:
+    """
+    Read a UTF-8 text file in fixed-size blocks and yield the tokens
+    of each block, so memory stays bounded by the block size however
+    large the file is. A character split across blocks is held by an
+    incremental decoder, and a token split across blocks is carried
+    over into the next one. Each block is normalised before it is
+    split when normalise is given; blocks end at whitespace, which
+    neither composes with nor changes case with its neighbours.
+    """
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    carry = ""
+    with open(file_name, "rb") as file:
+        while True:
+            block = file.read(block_size)
+            text = carry + decoder.decode(block, final=not block)
+            if not block:
+                break
+
+            # Everything after the last whitespace may be the start
+            # of a token that continues in the next block.
+            end = len(text)
+            while end and not text[end - 1].isspace():
+                end -= 1
+            carry = text[end:]
+            text = text[:end]
+            tokens = (normalise(text) if normalise else text).split()
+            if tokens:
+                yield tokens
+
+    tokens = (normalise(text) if normalise else text).split()
+    if tokens:
+        yield tokens
+
+
+def get_chunks(text: str, count: int) -> typing.List[str]:
+    """
+    Split the text into about count chunks of similar size, cutting
+    only at whitespace so that no token spans two chunks.
+    """
+
+    chunks = []
+    start = 0
+    for i in range(1, count + 1):
+        end = len(text) * i // count
+        while end < len(text) and not text[end].isspace():
+            end += 1
+        if end > start:
+            chunks.append(text[start:end])
+            start = end
+    return chunks
+
+
+_worker_automaton = None
+
+
+def _init_counter_worker(names: typing.List[str]):
+    """
+    Build the automaton once in each pool worker.
+    """
+
+    global _worker_automaton
+    _worker_automaton = AhoCorasick(names)
+
+
+def _count_chunk(chunk: str) -> Counter:
+    """
+    Count every name in one chunk of the text.
+    """
+
+    return Counter(_worker_automaton.count_tokens(chunk.split()))
+
+
+# Punctuation stripped from the ends of a token to get its word, so
+# "Harry," and "(Harry" are both counted as "Harry".
+PUNCTUATION = string.punctuation + "‘’“”–—…"
+
+
+def get_words(
+    tokens: typing.Iterable[str], capitalised_only: bool = False
+) -> typing.Iterator[str]:
+    """
+    Yield the word of every token, without surrounding punctuation,
+    skipping tokens that are only punctuation and, if capitalised_only,
+    words that do not start with an upper-case letter.
+    """
+
+    for token in tokens:
+        word = token.strip(PUNCTUATION)
+        if word and (not capitalised_only or word[0].isupper()):
+            yield word
+
+
+def _count_words_chunk(chunk: str, capitalised_only: bool = False) -> Counter:
+    """
+    Count every word in one chunk of the text.
+    """
+
+    return Counter(get_words(chunk.split(), capitalised_only))
+
+
+def _merge_counters(counters: typing.Tuple[Counter, Counter]) -> Counter:
+    """
+    Merge a pair of counters into the first one.
+    """
+
+    merged, other = counters
+    merged.update(other)
+    return merged
+
+
+def reduce_counters(
+    counters: typing.List[Counter], pool: "WorkerPool" = None
+) -> Counter:
+    """
+    Merge counters by tree reduction: each level merges pairs, on the
+    pool when one is given, halving the count until one remains, so
+    no single merge has to absorb every other counter in turn.
+    """
+
+    counters = list(counters)
+    if not counters:
+        return Counter()
+
+    while len(counters) > 1:
+        pairs = list(zip(counters[0::2], counters[1::2]))
+        carry = [counters[-1]] if len(counters) % 2 else []
+        if pool is not None and len(pairs) > 1:
+            counters = pool.map(_merge_counters, pairs) + carry
+        else:
+            counters = [_merge_counters(pair) for pair in pairs] + carry
+    return counters[0]
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary (Metwally, Agrawal and El Abbadi) of the most
+    frequent items of a stream in a fixed number of counters.
+
+    When a new item arrives and every counter is taken, the item with
+    the smallest count is replaced and the new one inherits that count
+    as its possible overestimate (error). Any item occurring more than
+    n / capacity times in a stream of n items is guaranteed to be kept.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1, not {capacity}")
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # Min-heap of (count, item); entries whose count is out of
+        # date are skipped when popped.
+        self.heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def update(self, item: str, count: int = 1):
+        """
+        Add count occurrences of an item.
+        """
+
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            while True:
+                minimum, evicted = heapq.heappop(self.heap)
+                if self.counts.get(evicted) == minimum:
+                    break
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[item] = minimum + count
+            self.errors[item] = minimum
+        heapq.heappush(self.heap, (self.counts[item], item))
+
+        # Rebuild the heap once stale entries dominate it.
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def get_top(self, k: int) -> typing.List[typing.Tuple[str, int, int]]:
+        """
+        Return the k items with the highest counts as (item, count,
+        error) tuples; the true count lies in [count - error, count].
+        """
+
+        return [
+            (item, count, self.errors[item])
+            for item, count in heapq.nlargest(
+                k, self.counts.items(), key=lambda entry: entry[1]
+            )
+        ]
+
+
+_worker_freq_counter = None
+
+
+def _init_frequency_worker(freq_counter: "FrequencyCounter"):
+    """
+    Keep the counter, and so the text, once in each pool worker.
+    """
+
+    global _worker_freq_counter
+    _worker_freq_counter = freq_counter
+
+
+def _get_frequency(name: str) -> int:
+    """
+    Count one name with the worker's counter.
+    """
+
+    return _worker_freq_counter.get_frequency(name)
+
+
+class SharedText:
+    """
+    The text encoded once as UTF-8 into a shared memory block, which
+    worker processes attach to by name instead of receiving a copy.
+    """
+
+    # ASCII whitespace never occurs inside a multi-byte UTF-8
+    # character, so cutting at one of these bytes is always safe.
+    whitespace = frozenset(b" \t\n\r\x0b\x0c")
+
+    def __init__(self, text: str):
+        data = text.encode("utf-8")
+        self.size = len(data)
+        # A block cannot be empty, so an empty text still takes a byte.
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=max(self.size, 1)
+        )
+        self.memory.buf[:self.size] = data
+        self.name = self.memory.name
+
+    def get_chunks(self, count: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Split the buffer into about count byte ranges of similar size,
+        cutting only at whitespace so that no token spans two ranges.
+        """
+
+        buffer = self.memory.buf
+        chunks = []
+        start = 0
+        for i in range(1, count + 1):
+            end = self.size * i // count
+            while end < self.size and buffer[end] not in self.whitespace:
+                end += 1
+            if end > start:
+                chunks.append((start, end))
+                start = end
+        return chunks
+
+    def close(self):
+        """
+        Release and remove the shared memory block.
+        """
+
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _count_shared_chunk(
+    memory_name: str, span: typing.Tuple[int, int]
+) -> typing.List[int]:
+    """
+    Count every name in one byte range of the shared text, returning
+    the counts in the order of the worker's names.
+    """
 
-    def __str__(self):
-        if self.manager["process_state"] == "complete":
-            return self._process_status(1)
-        return self._process_status()
+    start, end = span
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        # Decode straight from the zero-copy slice of the block.
+        with memory.buf[start:end] as view:
+            chunk = str(view, "utf-8")
+    finally:
+        memory.close()
+
+    counts = _worker_automaton.count_tokens(chunk.split())
+    return [counts[name] for name in _worker_automaton.patterns]
 
 
 class FrequencyCounter:
@@ -109,18 +826,40 @@ class FrequencyCounter:
     This algorihtm is an counting sort which incorporates
     parallelism to dynamically allocate workload more efficiently
     taking advantage of the available CPU cores.
-    We use Processes to create subroutines then each routine is executed
-    in parallel on each process to reduce time complexity.
+    We submit tasks to a WorkerPool then each task is executed
+    in parallel on a worker process to reduce time complexity.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        text_file: str = None,
+        names_file: str = None,
+        streaming: bool = False,
+        normalisation: str = "raw"
+    ):
         current_directory = os.path.dirname(os.path.abspath(__name__))
         self.current_directory = current_directory + "\\"
         self.task_directory = self.current_directory + "\\tasks\\Task 1_3\\"
         self.available_workers = multiprocessing.cpu_count()
 
-        self.text = self.get_text()
-        self.text_array = self.get_text_by_arraylist()
+        self.text_file = text_file or \
+            self.task_directory + "task1_3_text.txt"
+        self.names_file = names_file or \
+            self.task_directory + "task1_3_names.txt"
+
+        if normalisation not in NORMALISATIONS:
+            raise ValueError(f"Unknown normalisation: {normalisation}")
+        self.normalisation = normalisation
+
+        # Streaming mode never holds the whole text in memory; it is
+        # read block by block whenever the names are counted.
+        # Otherwise the text is normalised once and kept, and every
+        # counting mode and worker works on that one buffer.
+        self.streaming = streaming
+        self.text = None if streaming else self.normalise(self.get_text())
+        self.text_array = None if streaming else self.get_text_by_arraylist()
+        self.token_array = None
+        self.suffix_index = None
 
     def get_stringfile(self, file_name: str) -> str:
         """
@@ -139,10 +878,7 @@ class FrequencyCounter:
         """
 
         names_map = {}
-        names_file = self.get_stringfile(
-            self.task_directory +
-            "task1_3_names.txt"
-        ).split("\n")
+        names_file = self.get_stringfile(self.names_file).split("\n")
 
         for string_name in names_file:
             names_map[string_name] = 0
@@ -155,13 +891,39 @@ class FrequencyCounter:
         Harry Potter and the Deathly Hallows - J.K. Rowling.
         """
 
-        text = self.get_stringfile(
-            self.task_directory +
-            "task1_3_text.txt"
-        )
+        text = self.get_stringfile(self.text_file)
 
         return text
 
+    def normalise(self, string: str) -> str:
+        """
+        Returns the string in the counter's normalisation mode.
+        """
+
+        normalise = NORMALISATIONS[self.normalisation]
+        return normalise(string) if normalise else string
+
+    def get_patterns(self, names: typing.Iterable[str]) -> dict:
+        """
+        Returns a map of each name to its normalised pattern. The
+        counting methods match the distinct patterns and report the
+        counts under the names as given.
+        """
+
+        return {name: self.normalise(name) for name in names}
+
+    def check_text(self, method: str):
+        """
+        Raises ValueError when a method that needs the whole text in
+        memory is called on a streaming counter.
+        """
+
+        if self.text is None:
+            raise ValueError(
+                f"{method} needs the text in memory; create the "
+                "FrequencyCounter without streaming=True."
+            )
+
     def get_text_by_arraylist(self) -> typing.List[str]:
         """
         Returns an array list of the text.
@@ -175,8 +937,13 @@ class FrequencyCounter:
     def get_frequency(self, string_name) -> int:
         """
         Returns the total frequency of a string.
+        In streaming mode the text is read from the file in blocks.
         """
 
+        if self.streaming:
+            return self.get_frequencies_streaming([string_name])[string_name]
+
+        string_name = self.normalise(string_name)
         counter = 0
         for row in self.text_array:
             if string_name in row:
@@ -185,33 +952,812 @@ class FrequencyCounter:
 
         return counter
 
+    def get_frequencies(self, names: typing.Iterable[str]) -> dict:
+        """
+        Returns the frequency of every name in one sweep of the text
+        with an Aho-Corasick automaton, matching get_frequency for
+        each name (including compound words such as "Harry's").
+        In streaming mode the text is read from the file in blocks.
+        """
+
+        if self.streaming:
+            return self.get_frequencies_streaming(names)
+
+        patterns = self.get_patterns(names)
+        counts = AhoCorasick(set(patterns.values())).count_tokens(
+            self.text_array
+        )
+        return {name: counts[pattern] for name, pattern in patterns.items()}
+
+    def get_token_array(self) -> tuple:
+        """
+        Returns the distinct tokens of the text as a NumPy fixed-width
+        string array, with an array of how often each one occurs.
+        Built once and kept for later calls.
+
+        The tokens are counted before the array is built, so it only
+        holds the distinct ones: a fixed-width array over every token
+        would take tokens x longest token x 4 bytes.
+        """
+
+        if np is None:
+            raise ImportError("get_token_array requires NumPy.")
+        self.check_text("get_token_array")
+
+        if self.token_array is None:
+            counts = Counter(self.text_array)
+            self.token_array = (
+                np.array(list(counts), dtype=str),
+                np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+            )
+        return self.token_array
+
+    def get_frequencies_vectorized(self, names: typing.Iterable[str]) -> dict:
+        """
+        Returns the frequency of every name with one batched NumPy
+        substring search per name over the distinct tokens, instead of
+        the Python loop over every token in get_frequency.
+
+        NumPy strips trailing NUL characters from fixed-width strings,
+        so a text containing any falls back to get_frequencies to keep
+        the counts exact.
+        """
+
+        self.check_text("get_frequencies_vectorized")
+        names = list(names)
+        if "\0" in self.text:
+            return self.get_frequencies(names)
+
+        tokens, frequencies = self.get_token_array()
+        counts = {}
+        for name, pattern in self.get_patterns(names).items():
+            found = np.char.find(tokens, pattern) >= 0
+            counts[name] = int(frequencies[found].sum())
+        return counts
+
+    def get_suffix_index(self, index_file: str = None) -> "SuffixArrayIndex":
+        """
+        Returns the suffix array index of the text, loading it from
+        index_file (by default next to the text file with a .sa
+        extension) or building and saving it there when the file is
+        missing or was built from a different text.
+        """
+
+        if self.suffix_index is not None:
+            return self.suffix_index
+
+        if index_file is None:
+            index_file = os.path.splitext(self.text_file)[0]
+            if self.normalisation != "raw":
+                index_file += "." + self.normalisation
+            index_file += ".sa"
+        text = self.text if self.text is not None else \
+            self.normalise(self.get_text())
+
+        # An index of the normalised text is tagged with the mode too.
+        checksum = get_file_checksum(self.text_file)
+        if self.normalisation != "raw":
+            checksum = hashlib.sha256(
+                (checksum + self.normalisation).encode("utf-8")
+            ).hexdigest()
+        if os.path.exists(index_file):
+            try:
+                suffix_index = SuffixArrayIndex.load(index_file, text)
+                if suffix_index.checksum == checksum:
+                    self.suffix_index = suffix_index
+                    return suffix_index
+            except (ValueError, EOFError, struct.error):
+                pass
+
+        self.suffix_index = SuffixArrayIndex.build(text, checksum)
+        self.suffix_index.save(index_file)
+        return self.suffix_index
+
+    def get_frequencies_indexed(self, names: typing.Iterable[str]) -> dict:
+        """
+        Returns the frequency of every name from the suffix array
+        index, matching get_frequency, so a changing list of names
+        never rescans the text.
+        """
+
+        suffix_index = self.get_suffix_index()
+        return {
+            name: suffix_index.get_frequency(pattern)
+            for name, pattern in self.get_patterns(names).items()
+        }
+
+    def get_frequencies_streaming(
+        self,
+        names: typing.Iterable[str],
+        block_size: int = 1 << 20,
+        max_cached_tokens: int = 1 << 16,
+        file_name: str = None
+    ) -> dict:
+        """
+        Returns the frequency of every name by scanning the text file,
+        or file_name if given, one block at a time, with the same
+        counts as get_frequencies but memory bounded by the block size
+        instead of the file.
+        """
+
+        patterns = self.get_patterns(names)
+        automaton = AhoCorasick(set(patterns.values()))
+        counts = [0] * len(automaton.patterns)
+        # The same words recur in every block, so their matches are
+        # kept between blocks, up to a bounded number of them.
+        matches = {}
+        for tokens in stream_tokens(
+            file_name or self.text_file,
+            block_size,
+            NORMALISATIONS[self.normalisation]
+        ):
+            for token, frequency in Counter(tokens).items():
+                found = matches.get(token)
+                if found is None:
+                    if len(matches) >= max_cached_tokens:
+                        matches.clear()
+                    found = matches[token] = tuple(automaton.find(token))
+                for index in found:
+                    counts[index] += frequency
+
+        counts = dict(zip(automaton.patterns, counts))
+        return {name: counts[pattern] for name, pattern in patterns.items()}
+
+    def get_frequencies_parallel(
+        self, names: typing.Iterable[str], workers: int = None
+    ) -> dict:
+        """
+        Returns the frequency of every name using data parallelism:
+        the text is split into one chunk per worker on token
+        boundaries, a fixed-size pool counts all names in each chunk
+        and the per-chunk counters are summed.
+        """
+
+        self.check_text("get_frequencies_parallel")
+        patterns = self.get_patterns(names)
+        unique_patterns = list(dict.fromkeys(patterns.values()))
+        workers = workers or self.available_workers
+        totals = Counter(dict.fromkeys(unique_patterns, 0))
+        with WorkerPool(
+            workers,
+            initializer=_init_counter_worker,
+            initargs=(unique_patterns, )
+        ) as pool:
+            for counts in pool.imap_unordered(
+                _count_chunk, get_chunks(self.text, workers)
+            ):
+                totals.update(counts)
+
+        return {name: totals[pattern] for name, pattern in patterns.items()}
+
+    def get_frequencies_shared(
+        self, names: typing.Iterable[str], workers: int = None
+    ) -> dict:
+        """
+        Returns the frequency of every name with the text held once in
+        shared memory: each worker process decodes only its own byte
+        range of the block and its counts come back through the
+        WorkerPool, so neither the text nor the results pass through
+        a Manager.
+        """
+
+        self.check_text("get_frequencies_shared")
+        patterns = self.get_patterns(names)
+        unique_patterns = list(dict.fromkeys(patterns.values()))
+        workers = workers or self.available_workers
+        totals = [0] * len(unique_patterns)
+
+        with SharedText(self.text) as shared_text, WorkerPool(
+            workers,
+            initializer=_init_counter_worker,
+            initargs=(unique_patterns, )
+        ) as pool:
+            for counts in pool.imap_unordered(
+                functools.partial(_count_shared_chunk, shared_text.name),
+                shared_text.get_chunks(workers)
+            ):
+                for index, count in enumerate(counts):
+                    totals[index] += count
+
+        totals = dict(zip(unique_patterns, totals))
+        return {name: totals[pattern] for name, pattern in patterns.items()}
+
+    def check_capitalised(self, capitalised_only: bool):
+        """
+        Raises ValueError when capitalised words are asked for in a
+        case-folding mode, where no word is capitalised any more.
+        """
+
+        if capitalised_only and "casefold" in self.normalisation:
+            raise ValueError(
+                "Capitalised words cannot be found after case folding."
+            )
+
+    def get_histogram(
+        self, workers: int = None, capitalised_only: bool = False
+    ) -> Counter:
+        """
+        Returns the exact count of every word in the text: each worker
+        counts one chunk into its own Counter and the counters are
+        merged by tree reduction on the same pool.
+        """
+
+        self.check_text("get_histogram")
+        self.check_capitalised(capitalised_only)
+        workers = workers or self.available_workers
+        with WorkerPool(workers) as pool:
+            counters = list(pool.imap_unordered(
+                functools.partial(
+                    _count_words_chunk, capitalised_only=capitalised_only
+                ),
+                get_chunks(self.text, workers)
+            ))
+            return reduce_counters(counters, pool)
+
+    def get_top_words(
+        self,
+        k: int = 20,
+        capacity: int = None,
+        capitalised_only: bool = True,
+        block_size: int = 1 << 20
+    ) -> typing.List[typing.Tuple[str, int, int]]:
+        """
+        Returns the k most frequent words, by default only capitalised
+        ones to surface character names, as (word, count, error)
+        tuples. The text file is streamed into a Space-Saving summary
+        of capacity counters (10 k by default), so memory is bounded
+        however large the corpus and its vocabulary are.
+        """
+
+        self.check_capitalised(capitalised_only)
+        if k < 1:
+            raise ValueError(f"k must be at least 1, not {k}")
+        summary = SpaceSaving(10 * k if capacity is None else capacity)
+        for tokens in stream_tokens(
+            self.text_file, block_size, NORMALISATIONS[self.normalisation]
+        ):
+            block = Counter(get_words(tokens, capitalised_only))
+            for word, count in block.items():
+                summary.update(word, count)
+        return summary.get_top(k)
+
+    def save_frequencies(self, frequencies: dict, file_name: str):
+        """
+        Saves the frequencies to a new file, most frequent first, one
+        per line in the form of the brief: "Harry" 102.
+        """
+
+        with open(file_name, "w", encoding="utf-8") as file:
+            for word, count in sorted(
+                frequencies.items(), key=lambda entry: -entry[1]
+            ):
+                file.write(f'"{word}" {count}\n')
+
+
+def get_suffix_array(s: typing.List[int], upper: int) -> typing.List[int]:
+    """
+    Return the suffix array of a sequence of integers in [0, upper]
+    with SA-IS (Nong, Zhang and Chan) in linear time.
+
+    Suffixes are classified as S-type (smaller than the next suffix)
+    or L-type; the leftmost S-type (LMS) suffixes are sorted first,
+    recursively on a reduced string when their substrings repeat, and
+    every other suffix is then placed by induced sorting.
+    """
+
+    n = len(s)
+    if n < 2:
+        return list(range(n))
+    if n == 2:
+        return [0, 1] if s[0] < s[1] else [1, 0]
+
+    is_s = [False] * n
+    for i in range(n - 2, -1, -1):
+        is_s[i] = is_s[i + 1] if s[i] == s[i + 1] else s[i] < s[i + 1]
+
+    # Bucket starts for the L-type and the S-type suffixes of every
+    # symbol; L-type suffixes come first within a bucket.
+    sum_l = [0] * (upper + 2)
+    sum_s = [0] * (upper + 2)
+    for i in range(n):
+        if is_s[i]:
+            sum_l[s[i] + 1] += 1
+        else:
+            sum_s[s[i]] += 1
+    for i in range(upper + 1):
+        sum_s[i] += sum_l[i]
+        sum_l[i + 1] += sum_s[i]
+
+    sa = [-1] * n
+
+    def induce(lms: typing.List[int]):
+        for i in range(n):
+            sa[i] = -1
+        bucket = sum_s[:]
+        for i in lms:
+            sa[bucket[s[i]]] = i
+            bucket[s[i]] += 1
+
+        bucket = sum_l[:]
+        sa[bucket[s[n - 1]]] = n - 1
+        bucket[s[n - 1]] += 1
+        for i in range(n):
+            j = sa[i] - 1
+            if j >= 0 and not is_s[j]:
+                sa[bucket[s[j]]] = j
+                bucket[s[j]] += 1
+
+        bucket = sum_l[:]
+        for i in range(n - 1, -1, -1):
+            j = sa[i] - 1
+            if j >= 0 and is_s[j]:
+                bucket[s[j] + 1] -= 1
+                sa[bucket[s[j] + 1]] = j
+
+    lms_index = [-1] * n
+    lms = []
+    for i in range(1, n):
+        if is_s[i] and not is_s[i - 1]:
+            lms_index[i] = len(lms)
+            lms.append(i)
+    induce(lms)
+
+    if lms:
+        # Name each LMS substring by its rank among the distinct ones.
+        sorted_lms = [i for i in sa if lms_index[i] != -1]
+        reduced = [0] * len(lms)
+        rank = 0
+        for k in range(1, len(sorted_lms)):
+            left, right = sorted_lms[k - 1], sorted_lms[k]
+            next_left = lms_index[left] + 1
+            next_right = lms_index[right] + 1
+            end_left = lms[next_left] if next_left < len(lms) else n
+            end_right = lms[next_right] if next_right < len(lms) else n
+            same = end_left - left == end_right - right
+            if same:
+                while left < end_left and s[left] == s[right]:
+                    left += 1
+                    right += 1
+                same = left < n and left == end_left and s[left] == s[right]
+            if not same:
+                rank += 1
+            reduced[lms_index[sorted_lms[k]]] = rank
+
+        reduced_sa = get_suffix_array(reduced, rank)
+        induce([lms[i] for i in reduced_sa])
+
+    return sa
+
+
+def get_lcp_array(
+    s: typing.Sequence, sa: typing.Sequence[int]
+) -> typing.List[int]:
+    """
+    Return the LCP array with Kasai's algorithm in linear time, where
+    lcp[i] is the length of the longest common prefix of the suffixes
+    sa[i] and sa[i + 1], and the last entry is 0.
+    """
+
+    n = len(s)
+    rank = [0] * n
+    for i, suffix in enumerate(sa):
+        rank[suffix] = i
+
+    lcp = [0] * n
+    h = 0
+    for i in range(n):
+        if h:
+            h -= 1
+        if rank[i] == n - 1:
+            h = 0
+            continue
+        j = sa[rank[i] + 1]
+        while i + h < n and j + h < n and s[i + h] == s[j + h]:
+            h += 1
+        lcp[rank[i]] = h
+    return lcp
+
+
+class SuffixArrayIndex:
+    """
+    Suffix array and LCP array over the whole text, persisted to a
+    binary file, that answers how often any substring occurs in
+    O(m log n) by binary search instead of rescanning the text.
+
+    The arrays are int32 arrays holding the start offsets of the
+    suffixes in sorted order and the common prefix lengths of
+    neighbouring suffixes. The file is tagged with the hex checksum
+    of the text it was built from, stored as its 32 raw bytes, see
+    save and load.
+    """
+
+    magic = b"FCSA"
+    header = struct.Struct("<4sIq32s")
+
+    def __init__(
+        self, text: str, sa: array, lcp: array, checksum: str = ""
+    ):
+        self.text = text
+        self.sa = sa
+        self.lcp = lcp
+        self.checksum = checksum
+        self.token_spans = None
+
+    def __len__(self):
+        return len(self.text)
+
+    @classmethod
+    def build(cls, text: str, checksum: str = "") -> "SuffixArrayIndex":
+        """
+        Build the suffix array with SA-IS and the LCP array with Kasai.
+        """
+
+        # Ranking the characters keeps their code point order and
+        # gives SA-IS a dense alphabet.
+        alphabet = {char: i for i, char in enumerate(sorted(set(text)))}
+        sa = get_suffix_array(
+            [alphabet[char] for char in text], max(len(alphabet) - 1, 0)
+        )
+        lcp = get_lcp_array(text, sa)
+        return cls(text, array('i', sa), array('i', lcp), checksum)
+
+    @classmethod
+    def load(cls, file_name: str, text: str) -> "SuffixArrayIndex":
+        """
+        Read an index written by save() for the given text.
+        """
+
+        with open(file_name, "rb") as file:
+            magic, _, length, checksum = cls.header.unpack(
+                file.read(cls.header.size)
+            )
+            if magic != cls.magic:
+                raise ValueError(f"Not a suffix array index file: {file_name}")
+            if length != len(text):
+                raise ValueError(f"Index {file_name} is for another text.")
+            if os.fstat(file.fileno()).st_size != \
+                    cls.header.size + 2 * length * 4:
+                raise ValueError(f"Index {file_name} is truncated.")
+
+            sa, lcp = array('i'), array('i')
+            sa.fromfile(file, length)
+            lcp.fromfile(file, length)
+        return cls(text, sa, lcp, checksum.hex())
+
+    def save(self, file_name: str):
+        """
+        Write the arrays to a binary file tagged with the checksum,
+        through a temporary file moved into place, so an interrupted
+        run never leaves a truncated index behind.
+        """
+
+        handle, temporary_file = tempfile.mkstemp(
+            suffix=".tmp", dir=os.path.dirname(os.path.abspath(file_name))
+        )
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(self.header.pack(
+                    self.magic, 1, len(self.text),
+                    bytes.fromhex(self.checksum).ljust(32, b"\0")
+                ))
+                self.sa.tofile(file)
+                self.lcp.tofile(file)
+            os.replace(temporary_file, file_name)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    def get_range(self, pattern: str) -> typing.Tuple[int, int]:
+        """
+        Return the range [lo, hi) of suffix array entries whose suffix
+        starts with the pattern, by two binary searches that each
+        compare m characters per step.
+        """
+
+        text, sa, m = self.text, self.sa, len(pattern)
+        lo, hi = 0, len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[sa[mid]:sa[mid] + m] < pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        start, hi = lo, len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if text[sa[mid]:sa[mid] + m] <= pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    def count(self, pattern: str) -> int:
+        """
+        Return the number of occurrences of the pattern in the text,
+        overlapping ones included.
+        """
+
+        start, end = self.get_range(pattern)
+        return end - start
+
+    def get_frequency(self, name: str) -> int:
+        """
+        Return the number of whitespace-separated tokens containing the
+        name, the same as FrequencyCounter.get_frequency. Each
+        occurrence is mapped to its token, so this costs an extra
+        O(log t) per occurrence.
+        """
+
+        if self.token_spans is None:
+            starts, ends = array('i'), array('i')
+            for match in re.finditer(r"\S+", self.text):
+                starts.append(match.start())
+                ends.append(match.end())
+            self.token_spans = starts, ends
+
+        starts, ends = self.token_spans
+        if not name:
+            return len(starts)
+
+        start, end = self.get_range(name)
+        tokens = set()
+        for suffix in self.sa[start:end]:
+            token = bisect.bisect_right(starts, suffix) - 1
+            if token >= 0 and suffix + len(name) <= ends[token]:
+                tokens.add(token)
+        return len(tokens)
+
+    def get_stats(self) -> dict:
+        """
+        Return the text length, the size of the arrays in bytes and
+        the length of the longest repeated substring.
+        """
+
+        return {
+            "characters": len(self.text),
+            "bytes": self.header.size + 4 * (len(self.sa) + len(self.lcp)),
+            "longest_repeat": max(self.lcp, default=0),
+        }
+
+
+def get_file_checksum(file_name: str) -> str:
+    """
+    Return the SHA-256 hex digest of a file, read in blocks.
+    """
+
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CorpusIndex:
+    """
+    Per-file name counts for a directory of text files, persisted to
+    a JSON index keyed by path, size, mtime and content hash, so that
+    each run only scans the files that are new or have changed and
+    merges their counts with the stored ones into global totals.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        freq_counter: "FrequencyCounter",
+        index_file: str = None,
+        extensions: typing.Tuple[str] = (".txt", )
+    ):
+        self.directory = directory
+        self.freq_counter = freq_counter
+        self.index_file = index_file or \
+            os.path.join(directory, ".name_counts.json")
+        self.extensions = extensions
+        self.names = list(freq_counter.get_names())
+        self.files = self.load()
+        self.stats = {"reused": 0, "rehashed": 0, "scanned": 0, "removed": 0}
+
+    def load(self) -> dict:
+        """
+        Return the stored file entries, or none if there is no index
+        or it was built for a different set of names or normalisation.
+        """
+
+        if not os.path.exists(self.index_file):
+            return {}
+        with open(self.index_file, "r", encoding="utf-8") as file:
+            index = json.load(file)
+        if index.get("names") != self.names or \
+                index.get("normalisation", "raw") != \
+                self.freq_counter.normalisation:
+            return {}
+        return index["files"]
+
+    def save(self):
+        """
+        Write the index to a temporary file and move it into place, so
+        an interrupted run never leaves a truncated index behind.
+        """
+
+        handle, temporary_file = tempfile.mkstemp(
+            suffix=".tmp",
+            dir=os.path.dirname(os.path.abspath(self.index_file))
+        )
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                json.dump({
+                    "names": self.names,
+                    "normalisation": self.freq_counter.normalisation,
+                    "files": self.files,
+                }, file)
+            os.replace(temporary_file, self.index_file)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    def get_paths(self) -> typing.List[str]:
+        """
+        Return the corpus files under the directory, relative to it.
+        """
+
+        paths = []
+        for root, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith(self.extensions):
+                    path = os.path.join(root, file_name)
+                    paths.append(os.path.relpath(path, self.directory))
+        return sorted(paths)
+
+    def update(self) -> dict:
+        """
+        Bring the index up to date with the directory and return the
+        total frequency of every name over all files.
+
+        A file whose size and mtime are unchanged is trusted as is.
+        Otherwise its hash is compared, so a file that was only
+        touched or copied is not scanned again. The index is saved
+        after every scan, so an interrupted run resumes from there.
+        """
+
+        paths = self.get_paths()
+        for path in set(self.files) - set(paths):
+            del self.files[path]
+            self.stats["removed"] += 1
+
+        for path in paths:
+            file_name = os.path.join(self.directory, path)
+            stat = os.stat(file_name)
+            entry = self.files.get(path)
+            if entry is not None and entry["size"] == stat.st_size and \
+                    entry["mtime_ns"] == stat.st_mtime_ns:
+                self.stats["reused"] += 1
+                continue
+
+            checksum = get_file_checksum(file_name)
+            if entry is not None and entry["sha256"] == checksum:
+                self.stats["rehashed"] += 1
+            else:
+                entry = {
+                    "sha256": checksum,
+                    "counts": self.freq_counter.get_frequencies_streaming(
+                        self.names, file_name=file_name
+                    ),
+                }
+                self.stats["scanned"] += 1
+            entry["size"] = stat.st_size
+            entry["mtime_ns"] = stat.st_mtime_ns
+            self.files[path] = entry
+            self.save()
+
+        if self.stats["removed"] or not os.path.exists(self.index_file):
+            self.save()
+
+        totals = dict.fromkeys(self.names, 0)
+        for entry in self.files.values():
+            for name, count in entry["counts"].items():
+                totals[name] += count
+        return totals
+
 
 if __name__ == "__main__":
-    freq_counter = FrequencyCounter()
+    # Every mode below can match case- or Unicode-insensitively with
+    # --normalise=casefold, nfkc or nfkc_casefold.
+    normalisation = "raw"
+    for argument in sys.argv[1:]:
+        if argument.startswith("--normalise="):
+            normalisation = argument.split("=", 1)[1]
+            sys.argv.remove(argument)
+
+    # Corpus mode: count every text file under a directory, scanning
+    # only the files that changed since the last run.
+    if len(sys.argv) > 2 and sys.argv[1] == "corpus":
+        start_time = datetime.now()
+        corpus_index = CorpusIndex(
+            sys.argv[2],
+            FrequencyCounter(
+                streaming=True, normalisation=normalisation
+            ),
+            sys.argv[3] if len(sys.argv) > 3 else None
+        )
+        name_map = corpus_index.update()
+        print(
+            name_map, corpus_index.stats,
+            f"\n[{datetime.now() - start_time}]"
+        )
+        sys.exit()
+
+    # Index mode: answer names, from the command line or the names
+    # file, from a suffix array index built once and kept on disk.
+    if len(sys.argv) > 1 and sys.argv[1] == "index":
+        freq_counter = FrequencyCounter(normalisation=normalisation)
+        start_time = datetime.now()
+        suffix_index = freq_counter.get_suffix_index()
+        print(suffix_index.get_stats(), f"[{datetime.now() - start_time}]")
+        start_time = datetime.now()
+        name_map = freq_counter.get_frequencies_indexed(
+            sys.argv[2:] or freq_counter.get_names()
+        )
+        print(name_map, f"\n[{datetime.now() - start_time}]")
+        sys.exit()
+
+    # Histogram mode: count every word, or with topk only estimate the
+    # most frequent capitalised ones, and save them to a file.
+    if len(sys.argv) > 1 and sys.argv[1] in ("histogram", "topk"):
+        start_time = datetime.now()
+        if sys.argv[1] == "histogram":
+            freq_counter = FrequencyCounter(normalisation=normalisation)
+            frequencies = freq_counter.get_histogram()
+        else:
+            freq_counter = FrequencyCounter(
+                streaming=True, normalisation=normalisation
+            )
+            frequencies = {
+                word: count for word, count, _ in freq_counter.get_top_words(
+                    int(sys.argv[2]) if len(sys.argv) > 2 else 20
+                )
+            }
+        output_file = f"{sys.argv[1]}_frequencies.txt"
+        freq_counter.save_frequencies(frequencies, output_file)
+        print(
+            f"[RESULT] Wrote {len(frequencies)} words to {output_file} "
+            f"[{datetime.now() - start_time}]"
+        )
+        sys.exit()
+
+    # Streaming mode: scan the file in blocks without loading it.
+    if len(sys.argv) > 1 and sys.argv[1] == "streaming":
+        start_time = datetime.now()
+        freq_counter = FrequencyCounter(
+            streaming=True, normalisation=normalisation
+        )
+        name_map = freq_counter.get_frequencies(freq_counter.get_names())
+        print(name_map, f"\n[{datetime.now() - start_time}]")
+        sys.exit()
+
+    freq_counter = FrequencyCounter(normalisation=normalisation)
     name_map = freq_counter.get_names()
     names = list(name_map.keys())
-    result_queue = multiprocessing.Queue()
-    processes: typing.DefaultDict[str, Process] = {
-        process_id: Process(
-            process_id,
-            names[process_id],
-            target=freq_counter.get_frequency,
-            args=(names[process_id], ),
-        )
-        for process_id in range(len(names))
-    }
-
-    # Start and join the processes seperately
-    # so we can use parallelism.
-    for process in processes.values():
-        process.start()
-        print(process)
-
-    for process in processes.values():
-        process.join()
-        print(process)
-        result = process.manager["result"]
-        name_map[process.name] = process.manager["result"]
+
+    # Data-parallel modes: one chunk of text per core instead of one
+    # process per name, either pickled to a pool or in shared memory.
+    if len(sys.argv) > 1 and sys.argv[1] in ("chunked", "shared"):
+        start_time = datetime.now()
+        if sys.argv[1] == "shared":
+            name_map = freq_counter.get_frequencies_shared(names)
+        else:
+            name_map = freq_counter.get_frequencies_parallel(names)
+        print(name_map, f"\n[{datetime.now() - start_time}]")
+        sys.exit()
+
+    # One task per name on a pool of long-lived workers,
+    # each holding the text once.
+    with WorkerPool(
+        initializer=_init_frequency_worker,
+        initargs=(freq_counter, ),
+        verbose=True
+    ) as pool:
+        for name, count in zip(names, pool.map(_get_frequency, names)):
+            name_map[name] = count
+        print(pool.get_stats())
 
     print(
         name_map, f"\n\033[91m{names[-1]} putting himself " +
@@ -0,0 +1,105 @@
+"""
+Peak memory of a process and of the processes it starts, for the
+benchmarks. Read from /proc where it is available.
+"""
+
+import os
+import threading
+import typing
+
+
+def get_peak_rss() -> int:
+    """
+    Return the peak RSS of this process in kilobytes. On Linux this is
+    read from /proc, because ru_maxrss survives the exec of a spawned
+    process and would report the peak of the process that started it.
+    """
+
+    try:
+        with open("/proc/self/status", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    # Not available on Windows, so only imported where it is needed.
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_descendants(pid: int) -> typing.List[int]:
+    """
+    Return the IDs of every process below pid, read from /proc.
+    """
+
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="utf-8") as file:
+                # The command name may contain spaces, so the fields
+                # are counted from its closing parenthesis.
+                parent = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+
+    descendants = []
+    stack = [pid]
+    while stack:
+        for child in children.get(stack.pop(), ()):
+            descendants.append(child)
+            stack.append(child)
+    return descendants
+
+
+def get_process_memory(pid: int) -> int:
+    """
+    Return the proportional set size (PSS) of a process in kilobytes:
+    its RSS with every shared page divided among the processes that
+    map it, so the PSS of forked workers can be summed without
+    counting the pages they share with their parent again.
+    Returns 0 once the process has exited.
+    """
+
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class MemorySampler(threading.Thread):
+    """
+    Sample the summed PSS of every descendant of this process until
+    stopped, keeping the peak. Only available where /proc is.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        pid = os.getpid()
+        while not self.stopped.is_set():
+            total = sum(
+                get_process_memory(child) for child in get_descendants(pid)
+            )
+            self.peak_kb = max(self.peak_kb, total)
+            self.stopped.wait(self.interval)
+
+    def stop(self) -> int:
+        """
+        Stop sampling and return the peak in kilobytes.
+        """
+
+        self.stopped.set()
+        self.join()
+        return self.peak_kb
@@ -0,0 +1,614 @@
+"""
+Tests for the WorkerPool and the counting paths in main.py, each path
+checked against get_frequency on a small seeded text.
+
+Run with: python test.py
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from collections import Counter
+from unittest import mock
+from main import (
+    AhoCorasick,
+    CorpusIndex,
+    FrequencyCounter,
+    get_chunks,
+    get_words,
+    NORMALISATIONS,
+    np,
+    reduce_counters,
+    SharedText,
+    SpaceSaving,
+    stream_tokens,
+    SuffixArrayIndex,
+    TaskError,
+    WorkerPool
+)
+
+# Tokens of the fixture text: names inside compound words and
+# punctuation, curly apostrophes, other cases, decomposed and
+# compatibility characters, and a long token.
+WORDS = (
+    "Harry", "Harry's", "Harry\u2019s", "HARRY", "harry", "Harrys",
+    "Ron,", "(Ron)", "Ronald", "RON", "\uff32\uff4f\uff4e", "Hermione.",
+    "Hermione\u2019s", "Dumbledore", "caf\u00e9", "cafe\u0301", "\ufb01le",
+    "the", "and", "said", "\u2014", "Potter-Weasley", "x" * 200,
+)
+
+NAMES = [
+    "Harry", "Ron", "Hermione", "Harry's", "caf\u00e9", "file", "Potter",
+    "Nobody", "",
+]
+
+
+def generate_text(tokens: int, seed: int) -> str:
+    """
+    Return a text of random fixture words, separated by spaces and
+    the odd blank line.
+    """
+
+    rng = random.Random(seed)
+    words = [rng.choice(WORDS) for _ in range(tokens)]
+    return "".join(
+        word + rng.choice((" ", " ", " ", "\n", "\n\n  "))
+        for word in words
+    )
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def fail_on_five(x: int) -> int:
+    if x == 5:
+        raise ValueError("five")
+    return x
+
+
+def exit_on_three(x: int) -> int:
+    if x == 3:
+        os._exit(3)
+    return x
+
+
+def fail_to_initialize():
+    raise RuntimeError("initializer")
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_map_keeps_item_order(self):
+        with WorkerPool(3, max_pending=2) as pool:
+            self.assertEqual(
+                pool.map(square, range(50)), [x * x for x in range(50)]
+            )
+
+    def test_map_ignores_earlier_submits(self):
+        with WorkerPool(2) as pool:
+            pool.submit(square, 100)
+            self.assertEqual(pool.map(square, range(3)), [0, 1, 4])
+            self.assertEqual(pool.get_record()["result"], 10000)
+
+    def test_imap_unordered_yields_every_result(self):
+        with WorkerPool(3, max_pending=2) as pool:
+            self.assertEqual(
+                sorted(pool.imap_unordered(square, range(20))),
+                [x * x for x in range(20)]
+            )
+
+    def test_abandoned_imap_does_not_leak_into_map(self):
+        with WorkerPool(2, max_pending=4) as pool:
+            results = pool.imap_unordered(square, range(100, 110))
+            next(results)
+            results.close()
+            self.assertEqual(pool.map(square, range(5)), [0, 1, 4, 9, 16])
+
+    def test_failed_task_raises_task_error(self):
+        with WorkerPool(2) as pool:
+            with self.assertRaisesRegex(TaskError, "five"):
+                pool.map(fail_on_five, range(10))
+            self.assertEqual(pool.map(square, range(3)), [0, 1, 4])
+
+    def test_failed_initializer_raises_task_error(self):
+        with WorkerPool(2, initializer=fail_to_initialize) as pool:
+            with self.assertRaisesRegex(TaskError, "initializer"):
+                pool.map(square, range(3))
+
+    def test_dead_worker_raises(self):
+        with WorkerPool(2) as pool:
+            with self.assertRaisesRegex(RuntimeError, "exited with code 3"):
+                pool.map(exit_on_three, range(10))
+
+    def test_pending_is_bounded(self):
+        with WorkerPool(2, max_pending=3) as pool:
+            for result in pool.imap_unordered(square, range(30)):
+                self.assertLessEqual(pool.pending, pool.max_pending)
+            self.assertEqual(pool.get_stats()["tasks"], 30)
+
+
+class CountingTestCase(unittest.TestCase):
+    """
+    Writes the fixture text to a temporary file shared by the tests.
+    """
+
+    tokens = 1500
+    seed = 3
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.text_file = os.path.join(cls.directory.name, "text.txt")
+        cls.names_file = os.path.join(cls.directory.name, "names.txt")
+        with open(cls.text_file, "w", encoding="utf-8") as file:
+            file.write(generate_text(cls.tokens, cls.seed))
+        with open(cls.names_file, "w", encoding="utf-8") as file:
+            file.write("\n".join(NAMES))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def get_counter(self, **options) -> FrequencyCounter:
+        return FrequencyCounter(self.text_file, self.names_file, **options)
+
+    def get_expected(self, freq_counter: FrequencyCounter) -> dict:
+        return {
+            name: freq_counter.get_frequency(name) for name in NAMES
+        }
+
+
+class TestAhoCorasick(CountingTestCase):
+
+    def test_find(self):
+        patterns = ["he", "she", "his", "hers", "", "s"]
+        automaton = AhoCorasick(patterns)
+        for string in ("ushers", "his", "", "hershe", "xyz"):
+            self.assertEqual(
+                automaton.find(string),
+                {i for i, pattern in enumerate(patterns)
+                 if pattern in string}
+            )
+
+    def test_count_tokens(self):
+        tokens = generate_text(300, 1).split()
+        counts = AhoCorasick(NAMES).count_tokens(tokens)
+        for name in NAMES:
+            self.assertEqual(
+                counts[name], sum(name in token for token in tokens)
+            )
+
+    def test_get_frequencies(self):
+        freq_counter = self.get_counter()
+        frequencies = freq_counter.get_frequencies(NAMES)
+        self.assertEqual(frequencies, self.get_expected(freq_counter))
+
+        # The empty name is in every token.
+        self.assertEqual(frequencies[""], len(freq_counter.text_array))
+        self.assertEqual(frequencies["Nobody"], 0)
+        self.assertGreater(frequencies["Harry"], frequencies["Harry's"])
+
+
+class TestChunkedCounting(CountingTestCase):
+
+    def test_get_chunks(self):
+        text = generate_text(200, 2)
+        for count in (1, 3, 7, 1000):
+            chunks = get_chunks(text, count)
+            self.assertEqual("".join(chunks), text)
+            self.assertEqual(
+                [token for chunk in chunks for token in chunk.split()],
+                text.split()
+            )
+
+    def test_get_frequencies_parallel(self):
+        freq_counter = self.get_counter()
+        expected = self.get_expected(freq_counter)
+        for workers in (1, 3):
+            self.assertEqual(
+                freq_counter.get_frequencies_parallel(NAMES, workers),
+                expected
+            )
+
+
+class TestSharedCounting(CountingTestCase):
+
+    def test_shared_chunks(self):
+        text = generate_text(200, 2)
+        with SharedText(text) as shared_text:
+            for count in (1, 3, 7, 1000):
+                chunks = [
+                    bytes(shared_text.memory.buf[start:end]).decode("utf-8")
+                    for start, end in shared_text.get_chunks(count)
+                ]
+                self.assertEqual("".join(chunks), text)
+                self.assertEqual(
+                    [token for chunk in chunks for token in chunk.split()],
+                    text.split()
+                )
+
+    def test_get_frequencies_shared(self):
+        freq_counter = self.get_counter()
+        expected = self.get_expected(freq_counter)
+        for workers in (1, 3):
+            self.assertEqual(
+                freq_counter.get_frequencies_shared(NAMES, workers),
+                expected
+            )
+
+    def test_empty_text(self):
+        with SharedText("") as shared_text:
+            self.assertEqual(shared_text.get_chunks(3), [])
+
+
+class TestStreaming(CountingTestCase):
+
+    def test_stream_tokens(self):
+        with open(self.text_file, encoding="utf-8") as file:
+            expected = file.read().split()
+        for block_size in (1, 37, 1 << 20):
+            tokens = [
+                token
+                for block in stream_tokens(self.text_file, block_size)
+                for token in block
+            ]
+            self.assertEqual(tokens, expected)
+
+    def test_get_frequencies_streaming(self):
+        expected = self.get_expected(self.get_counter())
+        freq_counter = self.get_counter(streaming=True)
+        for block_size in (37, 1 << 20):
+            for max_cached_tokens in (4, 1 << 16):
+                self.assertEqual(
+                    freq_counter.get_frequencies_streaming(
+                        NAMES, block_size, max_cached_tokens
+                    ),
+                    expected
+                )
+        self.assertEqual(freq_counter.get_frequencies(NAMES), expected)
+        self.assertEqual(freq_counter.get_frequency("Ron"), expected["Ron"])
+
+    def test_in_memory_methods_need_text(self):
+        freq_counter = self.get_counter(streaming=True)
+        with self.assertRaises(ValueError):
+            freq_counter.get_frequencies_parallel(NAMES)
+        with self.assertRaises(ValueError):
+            freq_counter.get_histogram()
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestVectorizedCounting(CountingTestCase):
+
+    def test_get_frequencies_vectorized(self):
+        freq_counter = self.get_counter()
+        self.assertEqual(
+            freq_counter.get_frequencies_vectorized(NAMES),
+            self.get_expected(freq_counter)
+        )
+
+    def test_token_array_holds_distinct_tokens(self):
+        freq_counter = self.get_counter()
+        tokens, frequencies = freq_counter.get_token_array()
+        self.assertEqual(len(set(tokens.tolist())), len(tokens))
+        self.assertEqual(
+            dict(zip(tokens.tolist(), frequencies.tolist())),
+            dict(Counter(freq_counter.text_array))
+        )
+
+    def test_nul_characters(self):
+        freq_counter = self.get_counter()
+        freq_counter.text = "Harry\0 Harry Ron\0\0"
+        freq_counter.text_array = freq_counter.get_text_by_arraylist()
+        self.assertEqual(
+            freq_counter.get_frequencies_vectorized(["Harry\0", "Ron"]),
+            {"Harry\0": 1, "Ron": 1}
+        )
+
+
+class TestCorpusIndex(CountingTestCase):
+
+    def setUp(self):
+        self.corpus = tempfile.TemporaryDirectory()
+        self.addCleanup(self.corpus.cleanup)
+        self.index_file = os.path.join(self.corpus.name, "index.json")
+        for seed in range(3):
+            self.write_file(f"part{seed}.txt", generate_text(300, seed))
+
+    def write_file(self, path: str, text: str):
+        file_name = os.path.join(self.corpus.name, path)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def get_index(self, **options) -> CorpusIndex:
+        return CorpusIndex(
+            self.corpus.name,
+            FrequencyCounter(
+                names_file=self.names_file, streaming=True, **options
+            ),
+            self.index_file
+        )
+
+    def get_expected(self) -> dict:
+        totals = Counter()
+        for path in CorpusIndex(
+            self.corpus.name, self.get_counter(streaming=True)
+        ).get_paths():
+            totals.update(FrequencyCounter(
+                os.path.join(self.corpus.name, path), self.names_file
+            ).get_frequencies(NAMES))
+        return {name: totals[name] for name in NAMES}
+
+    def test_totals_match_get_frequencies(self):
+        self.write_file(os.path.join("nested", "part3.txt"), "Harry Ron")
+        corpus_index = self.get_index()
+        self.assertEqual(corpus_index.update(), self.get_expected())
+        self.assertEqual(corpus_index.stats["scanned"], 4)
+        self.assertFalse([
+            file_name for file_name in os.listdir(self.corpus.name)
+            if file_name.endswith(".tmp")
+        ])
+
+    def test_unchanged_corpus_reads_no_files(self):
+        expected = self.get_index().update()
+        corpus_index = self.get_index()
+        with mock.patch("main.get_file_checksum") as checksum, \
+                mock.patch.object(
+                    FrequencyCounter, "get_frequencies_streaming"
+                ) as count:
+            self.assertEqual(corpus_index.update(), expected)
+        checksum.assert_not_called()
+        count.assert_not_called()
+        self.assertEqual(corpus_index.stats["reused"], 3)
+
+    def test_touched_file_is_rehashed(self):
+        expected = self.get_index().update()
+        file_name = os.path.join(self.corpus.name, "part1.txt")
+        stat = os.stat(file_name)
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        corpus_index = self.get_index()
+        with mock.patch.object(
+            FrequencyCounter, "get_frequencies_streaming"
+        ) as count:
+            self.assertEqual(corpus_index.update(), expected)
+        count.assert_not_called()
+        self.assertEqual(
+            corpus_index.stats,
+            {"reused": 2, "rehashed": 1, "scanned": 0, "removed": 0}
+        )
+
+    def test_changed_file_is_rescanned(self):
+        self.get_index().update()
+        self.write_file("part1.txt", "Harry Harry Hermione " * 50)
+
+        corpus_index = self.get_index()
+        self.assertEqual(corpus_index.update(), self.get_expected())
+        self.assertEqual(
+            corpus_index.stats,
+            {"reused": 2, "rehashed": 0, "scanned": 1, "removed": 0}
+        )
+
+    def test_removed_file_is_dropped(self):
+        self.get_index().update()
+        os.remove(os.path.join(self.corpus.name, "part2.txt"))
+
+        corpus_index = self.get_index()
+        self.assertEqual(corpus_index.update(), self.get_expected())
+        self.assertEqual(corpus_index.stats["removed"], 1)
+        self.assertNotIn("part2.txt", self.get_index().files)
+
+    def test_index_is_dropped_for_other_names_or_normalisation(self):
+        self.get_index().update()
+        self.assertEqual(len(self.get_index().files), 3)
+        self.assertEqual(self.get_index(normalisation="casefold").files, {})
+
+        other_names = os.path.join(self.corpus.name, "names.lst")
+        with open(other_names, "w", encoding="utf-8") as file:
+            file.write("Harry\nRon")
+        corpus_index = CorpusIndex(
+            self.corpus.name,
+            FrequencyCounter(names_file=other_names, streaming=True),
+            self.index_file
+        )
+        self.assertEqual(corpus_index.files, {})
+        self.assertEqual(
+            corpus_index.update(),
+            {name: self.get_expected()[name] for name in ("Harry", "Ron")}
+        )
+        self.assertEqual(corpus_index.stats["scanned"], 3)
+
+
+class TestSuffixIndex(CountingTestCase):
+
+    def setUp(self):
+        self.index_file = os.path.join(self.directory.name, "text.sa")
+        if os.path.exists(self.index_file):
+            os.remove(self.index_file)
+
+    def get_indexed(self) -> dict:
+        freq_counter = self.get_counter()
+        freq_counter.get_suffix_index(self.index_file)
+        return freq_counter.get_frequencies_indexed(NAMES)
+
+    def test_count(self):
+        text = generate_text(100, 4)
+        suffix_index = SuffixArrayIndex.build(text)
+        for pattern in ("Harry", "r", "Ron", "aa", " ", "Nobody"):
+            expected = sum(
+                text.startswith(pattern, i) for i in range(len(text))
+            )
+            self.assertEqual(suffix_index.count(pattern), expected)
+
+    def test_get_frequencies_indexed(self):
+        expected = self.get_expected(self.get_counter())
+        self.assertEqual(self.get_indexed(), expected)
+        modified = os.stat(self.index_file).st_mtime_ns
+
+        # The saved index is loaded, not rebuilt.
+        self.assertEqual(self.get_indexed(), expected)
+        self.assertEqual(os.stat(self.index_file).st_mtime_ns, modified)
+        self.assertFalse([
+            file_name for file_name in os.listdir(self.directory.name)
+            if file_name.endswith(".tmp")
+        ])
+
+    def test_damaged_index_is_rebuilt(self):
+        expected = self.get_expected(self.get_counter())
+        self.get_indexed()
+        size = os.path.getsize(self.index_file)
+
+        with open(self.index_file, "r+b") as file:
+            file.truncate(size // 2)
+        self.assertEqual(self.get_indexed(), expected)
+        self.assertEqual(os.path.getsize(self.index_file), size)
+
+        with open(self.index_file, "r+b") as file:
+            file.write(b"XXXX")
+        self.assertEqual(self.get_indexed(), expected)
+        self.assertEqual(os.path.getsize(self.index_file), size)
+
+
+class TestNormalisation(CountingTestCase):
+
+    def test_every_path_in_every_mode(self):
+        for normalisation in NORMALISATIONS:
+            freq_counter = self.get_counter(normalisation=normalisation)
+            expected = self.get_expected(freq_counter)
+            streaming = self.get_counter(
+                streaming=True, normalisation=normalisation
+            )
+            freq_counter.get_suffix_index(os.path.join(
+                self.directory.name, f"text.{normalisation}.sa"
+            ))
+
+            results = {
+                "aho-corasick": freq_counter.get_frequencies(NAMES),
+                "streaming": streaming.get_frequencies_streaming(
+                    NAMES, block_size=37
+                ),
+                "parallel": freq_counter.get_frequencies_parallel(NAMES, 3),
+                "shared": freq_counter.get_frequencies_shared(NAMES, 3),
+                "indexed": freq_counter.get_frequencies_indexed(NAMES),
+            }
+            if np is not None:
+                results["vectorized"] = \
+                    freq_counter.get_frequencies_vectorized(NAMES)
+            for path, frequencies in results.items():
+                with self.subTest(normalisation=normalisation, path=path):
+                    self.assertEqual(frequencies, expected)
+
+    def test_modes_match_variants(self):
+        counts = {
+            normalisation: self.get_counter(
+                normalisation=normalisation
+            ).get_frequencies(NAMES)
+            for normalisation in NORMALISATIONS
+        }
+        raw, casefold = counts["raw"], counts["casefold"]
+        nfkc, nfkc_casefold = counts["nfkc"], counts["nfkc_casefold"]
+
+        # Case folding matches "HARRY" and "harry"; NFKC matches
+        # "Harry’s" and the full-width "Ｒｏｎ".
+        self.assertGreater(casefold["Harry"], raw["Harry"])
+        self.assertGreater(nfkc["Harry's"], raw["Harry's"])
+        self.assertGreater(nfkc["Ron"], raw["Ron"])
+        self.assertGreater(nfkc_casefold["Ron"], casefold["Ron"])
+
+        # The ligature "ﬁle" and the decomposed "café".
+        self.assertEqual(raw["file"], 0)
+        self.assertGreater(nfkc["file"], 0)
+        self.assertGreater(nfkc["café"], raw["café"])
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            self.get_counter(normalisation="upper")
+        with self.assertRaises(ValueError):
+            self.get_counter(normalisation="casefold").get_top_words()
+
+
+class TestHistogram(CountingTestCase):
+
+    def get_counters(self) -> list:
+        rng = random.Random(self.seed)
+        return [
+            Counter(rng.choice(WORDS[:8]) for _ in range(rng.randint(0, 50)))
+            for _ in range(7)
+        ]
+
+    def test_reduce_counters(self):
+        expected = sum(self.get_counters(), Counter())
+        self.assertEqual(reduce_counters(self.get_counters()), expected)
+        with WorkerPool(2) as pool:
+            self.assertEqual(
+                reduce_counters(self.get_counters(), pool), expected
+            )
+            self.assertEqual(
+                reduce_counters([Counter(a=1)], pool), Counter(a=1)
+            )
+        self.assertEqual(reduce_counters([]), Counter())
+
+    def test_space_saving(self):
+        rng = random.Random(self.seed)
+        stream = [
+            f"w{min(int(rng.paretovariate(1.2)), 200)}"
+            for _ in range(5000)
+        ]
+        capacity = 20
+        summary = SpaceSaving(capacity)
+        for item in stream:
+            summary.update(item)
+        self.assertLessEqual(len(summary), capacity)
+
+        counts = Counter(stream)
+        top = {item: (count, error) for item, count, error in
+               summary.get_top(capacity)}
+        for item, true_count in counts.items():
+            if true_count > len(stream) / capacity:
+                self.assertIn(item, top)
+        for item, (count, error) in top.items():
+            self.assertLessEqual(count - error, counts[item])
+            self.assertLessEqual(counts[item], count)
+
+        # Counts come back highest first.
+        ranked = [count for _, count, _ in summary.get_top(capacity)]
+        self.assertEqual(ranked, sorted(ranked, reverse=True))
+
+        with self.assertRaises(ValueError):
+            SpaceSaving(0)
+
+    def test_get_histogram(self):
+        freq_counter = self.get_counter()
+        tokens = freq_counter.text.split()
+        for capitalised_only in (False, True):
+            self.assertEqual(
+                freq_counter.get_histogram(3, capitalised_only),
+                Counter(get_words(tokens, capitalised_only))
+            )
+
+    def test_get_top_words(self):
+        freq_counter = self.get_counter()
+        histogram = Counter(get_words(freq_counter.text.split(), True))
+        for capacity in (4, 1000):
+            top = freq_counter.get_top_words(3, capacity, block_size=37)
+            self.assertEqual(len(top), 3)
+            for word, count, error in top:
+                self.assertLessEqual(count - error, histogram[word])
+                self.assertLessEqual(histogram[word], count)
+
+        # With room for every word the counts are exact.
+        self.assertEqual(
+            [(count, error) for _, count, error in top],
+            [(count, 0) for _, count in histogram.most_common(3)]
+        )
+
+        for k, capacity in ((0, None), (3, 0)):
+            with self.assertRaises(ValueError):
+                freq_counter.get_top_words(k, capacity)
+
+
+if __name__ == "__main__":
+    unittest.main()